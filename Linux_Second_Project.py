@@ -26,11 +26,503 @@ Importing 'json' library:
     - The 'json' library is a built-in Python library that provides functions to work with JSON (JavaScript Object Notation) data. 
     - It allows us to parse JSON strings, convert Python objects to JSON format, and read/write JSON data from/to files. 
     - JSON is a lightweight data interchange format that is easy to read and write for humans, and easy to parse and generate for machines. 
-Importing 'csv' library: # 
-    - The 'csv' library is a built-in Python library that provides functions to work with CSV (Comma-Separated Values) files. 
+Importing 'csv' library: #
+    - The 'csv' library is a built-in Python library that provides functions to work with CSV (Comma-Separated Values) files.
+Importing 'sys', 'time', 'argparse' and 'multiprocessing' libraries:
+    - Used by the non-interactive batch mode to parse command line options, measure throughput, spread the verification of many
+      gNMI paths across worker processes and return a meaningful exit status.
+Importing 'os', 'mmap' and 're' libraries:
+    - Used by the indexed gNMI loader to check the data file size/modification time, memory-map very large dumps and scan them
+      for the byte offsets of every top-level gNMI path.
+Importing 'gzip' and 'shutil' libraries:
+    - Used to compress rotated history files and to read compressed history files back.
+Importing 'hashlib' library:
+    - Used to hash the content of gNMI and CLI subtrees, so unchanged subtrees are not compared again.
+Importing 'asyncio', 'random' and 'threading' libraries:
+    - Used by the asynchronous CLI executor to keep many CLI commands in flight at the same time and to simulate network latency,
+      and by the CLI output cache to deduplicate concurrent requests for the same command.
+Importing 'functools' and 'collections' libraries:
+    - Used to cache the parsed form of gNMI paths and the compiled comparison plans (OrderedDict based LRU cache), so repeated
+      lookups and comparisons of the same path do not redo the same work.
+Importing 'heapq', 'itertools', 'tempfile' and 'pickle' libraries:
+    - Used to compare very large tables by a sorted merge: sorted runs of rows are spilled to temporary files and merged back.
+Importing 'queue' and 'socket' libraries:
+    - Used by the streaming mode to read gNMI notifications from a local socket in a background thread.
+Importing 'struct' and 'gc' libraries:
+    - Used to read and write the fixed-size header of the binary gNMI snapshots, and to pause the garbage collector while a
+      snapshot is unpickled.
+Importing 'io' library:
+    - Used to render reports into an in-memory stream instead of joining strings.
+Importing 'shlex' library:
+    - Used to split the command line of the command CLI transport (e.g. 'ssh admin@r1 {command}') like a shell would.
+Importing 'numpy' library (optional):
+    - Used to convert the units of large columns of values in one vectorized pass, without it every value is converted one by one.
 '''
 import json
 import csv
+import sys
+import time
+import argparse
+import multiprocessing
+import os
+import mmap
+import re
+import functools
+import collections
+import asyncio
+import random
+import threading
+import hashlib
+import gzip
+import shutil
+import heapq
+import itertools
+import tempfile
+import pickle
+import queue
+import socket
+import shlex
+import struct
+import gc
+import io
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+########################################################################################################################################
+#                                                            Instrumentation                                                           #
+########################################################################################################################################
+
+'''
+ --> Declare the Metrics class which collects the time spent in every stage of a verification run and a few counters.
+        - stage(name, gnmi_path, command) times a block of code ("fetch", "cli", "compare", "report"), tagged by gNMI path and CLI
+          command. While the metrics are disabled it returns a shared do-nothing timer, so the hooks cost one method call.
+        - count(name, **labels) increments a counter.
+     The timings are aggregated as they arrive (durations per stage, total per path and per command), they can be exported as a
+     Prometheus text-format file or as a JSON profile listing the slowest paths. Worker processes send their metrics back with
+     drain() and the parent process adds them with merge().
+'''
+class Metrics:
+
+    class _NullTimer:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+    class _Timer:
+        __slots__ = ("metrics", "stage", "gnmi_path", "command", "start")
+
+        def __init__(self, metrics, stage, gnmi_path, command):
+            self.metrics = metrics
+            self.stage = stage
+            self.gnmi_path = gnmi_path
+            self.command = command
+
+        def __enter__(self):
+            self.start = time.perf_counter()
+            return self
+
+        def __exit__(self, *exc_info):
+            self.metrics.record(self.stage, time.perf_counter() - self.start, self.gnmi_path, self.command)
+            return False
+
+    _NULL_TIMER = _NullTimer()
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.stages = {}  # stage -> [seconds, ...]
+        self.paths = {}  # gnmi path -> {stage: seconds}
+        self.commands = {}  # command -> [count, seconds]
+        self.counters = {}  # (name, ((label, value), ...)) -> value
+
+    def stage(self, stage, gnmi_path=None, command=None):
+        if not self.enabled:
+            return Metrics._NULL_TIMER
+        return Metrics._Timer(self, stage, gnmi_path, command)
+
+    def record(self, stage, seconds, gnmi_path=None, command=None):
+        self.stages.setdefault(stage, []).append(seconds)
+        if gnmi_path is not None:
+            path_stages = self.paths.setdefault(gnmi_path, {})
+            path_stages[stage] = path_stages.get(stage, 0.0) + seconds
+        if command is not None:
+            entry = self.commands.setdefault(command, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def count(self, name, value=1, **labels):
+        if self.enabled:
+            key = (name, tuple(sorted(labels.items())))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    '''
+    This method returns the collected metrics as plain data (to send them to another process) and starts again from zero.
+    '''
+    def drain(self):
+        snapshot = {"stages": self.stages, "paths": self.paths, "commands": self.commands,
+                    "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()]}
+        self.reset()
+        return snapshot
+
+    '''
+    This method adds metrics returned by drain() (e.g. in a worker process) to these metrics.
+    '''
+    def merge(self, snapshot):
+        for stage, durations in snapshot["stages"].items():
+            self.stages.setdefault(stage, []).extend(durations)
+        for gnmi_path, stages in snapshot["paths"].items():
+            path_stages = self.paths.setdefault(gnmi_path, {})
+            for stage, seconds in stages.items():
+                path_stages[stage] = path_stages.get(stage, 0.0) + seconds
+        for command, (count, seconds) in snapshot["commands"].items():
+            entry = self.commands.setdefault(command, [0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(label) for label in labels))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    '''
+    This method returns the summary of every stage: count, total, mean, p50, p95, p99 and max (in seconds).
+    '''
+    def stage_summary(self):
+        summary = {}
+        for stage, durations in self.stages.items():
+            ordered = sorted(durations)
+            quantile = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            summary[stage] = {"count": len(ordered), "total": sum(ordered), "mean": sum(ordered) / len(ordered),
+                              "p50": quantile(0.50), "p95": quantile(0.95), "p99": quantile(0.99), "max": ordered[-1]}
+        return summary
+
+    '''
+    This method returns the `limit` gNMI paths that took the most time over all stages.
+    '''
+    def slowest_paths(self, limit=10):
+        totals = sorted(self.paths.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        return [{"path": gnmi_path, "seconds": sum(stages.values()), "stages": stages} for gnmi_path, stages in totals[:limit]]
+
+    @staticmethod
+    def _labels(**labels):
+        escape = lambda value: str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        return "{" + ",".join('{}="{}"'.format(key, escape(value)) for key, value in labels.items()) + "}"
+
+    '''
+    This method writes the metrics in the Prometheus text exposition format.
+    '''
+    def export_prometheus(self, file_name):
+        lines = ["# HELP gnmi_cli_stage_seconds Time spent in each verification stage.",
+                 "# TYPE gnmi_cli_stage_seconds summary"]
+        for stage, summary in self.stage_summary().items():
+            for quantile in ("0.5", "0.95", "0.99"):
+                value = summary["p" + quantile[2:].ljust(2, "0")]
+                lines.append("gnmi_cli_stage_seconds{} {}".format(self._labels(stage=stage, quantile=quantile), value))
+            lines.append("gnmi_cli_stage_seconds_sum{} {}".format(self._labels(stage=stage), summary["total"]))
+            lines.append("gnmi_cli_stage_seconds_count{} {}".format(self._labels(stage=stage), summary["count"]))
+
+        lines += ["# HELP gnmi_cli_command_seconds Time spent running each CLI command.",
+                  "# TYPE gnmi_cli_command_seconds summary"]
+        for command, (count, seconds) in self.commands.items():
+            lines.append("gnmi_cli_command_seconds_sum{} {}".format(self._labels(command=command), seconds))
+            lines.append("gnmi_cli_command_seconds_count{} {}".format(self._labels(command=command), count))
+
+        lines += ["# HELP gnmi_cli_events_total Verification events (results by status, CLI commands ...).",
+                  "# TYPE gnmi_cli_events_total counter"]
+        for (name, labels), value in self.counters.items():
+            lines.append("gnmi_cli_events_total{} {}".format(self._labels(name=name, **dict(labels)), value))
+
+        with open(file_name, "w") as file:
+            file.write("\n".join(lines) + "\n")
+
+    '''
+    This method writes the per-run JSON profile: stage summaries, CLI command totals, counters and the slowest paths.
+    '''
+    def export_profile(self, file_name, slowest=10):
+        profile = {
+            "stages": self.stage_summary(),
+            "commands": {command: {"count": count, "total": seconds} for command, (count, seconds) in self.commands.items()},
+            "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self.counters.items()],
+            "slowest_paths": self.slowest_paths(slowest)
+        }
+        with open(file_name, "w") as file:
+            json.dump(profile, file, indent=4)
+
+METRICS = Metrics()
+
+########################################################################################################################################
+#                                                            gNMI Path Trie                                                            #
+########################################################################################################################################
+
+'''
+ --> Declare the PathTrie class which stores values (gNMI data, CLI commands ...) under parsed gNMI paths.
+     A path like '/interfaces/interface[name=eth0]/state' is parsed into elements ('interfaces', ()), ('interface', (('name',
+     'eth0'),)), ('state', ()), and every element is one level of the trie, so all lookups cost O(path depth).
+     Paths may contain wildcards:
+        - '[name=*]' matches any value of the key 'name' (and binds it, see match).
+        - '*' as an element name matches any element.
+        - '...' matches any number of levels (zero or more), e.g. '/interfaces/...' returns everything under '/interfaces'.
+'''
+class PathTrie:
+
+    WILDCARD = "*"
+    DESCENDANTS = "..."
+
+    class _Node:
+        __slots__ = ("children", "path", "value", "has_value")
+
+        def __init__(self):
+            self.children = {}  # element name -> {element keys: child node}
+            self.path = None
+            self.value = None
+            self.has_value = False
+
+    '''
+    The constructor creates an empty trie, optionally filled with (path, value) pairs.
+    '''
+    def __init__(self, items=None):
+        self.root = PathTrie._Node()
+        self.size = 0
+        for path, value in (items or []):
+            self.insert(path, value)
+
+    '''
+    This method splits a gNMI path into (name, keys) elements, '/' inside key predicates (e.g. prefixes) does not split.
+    The keys are sorted so '[a=1][b=2]' and '[b=2][a=1]' are the same element, a predicate without '=' like 'protocol[ospf]'
+    is stored with an empty key name.
+    '''
+    @staticmethod
+    @functools.lru_cache(maxsize=8192)
+    def parse_path(path):
+        elements = []
+        name, keys, predicate, in_predicate = [], [], [], False
+        for char in path + "/":
+            if in_predicate:
+                if char == "]":
+                    key, sep, value = "".join(predicate).partition("=")
+                    keys.append((key.strip(), value.strip()) if sep else ("", key.strip()))
+                    in_predicate = False
+                else:
+                    predicate.append(char)
+            elif char == "[":
+                predicate, in_predicate = [], True
+            elif char == "/":
+                if name or keys:
+                    elements.append(("".join(name), tuple(sorted(keys))))
+                name, keys = [], []
+            else:
+                name.append(char)
+        if in_predicate:
+            raise ValueError(f"Invalid gNMI path '{path}': unclosed '['.")
+        return tuple(elements)
+
+    '''
+    This method checks if a gNMI path contains a wildcard ('*' or '...').
+    '''
+    @staticmethod
+    def is_pattern(path):
+        return any(PathTrie._is_wildcard(element) for element in PathTrie.parse_path(path))
+
+    @staticmethod
+    def _is_wildcard(element):
+        name, keys = element
+        return name in (PathTrie.WILDCARD, PathTrie.DESCENDANTS) or any(value == PathTrie.WILDCARD for _, value in keys)
+
+    '''
+    This method matches the keys of a pattern element against the keys of a concrete element.
+    It returns the updated bindings ({key name: value} for every '*' value), or None if they do not match.
+    '''
+    @staticmethod
+    def _bind(pattern_keys, keys, bindings):
+        if len(pattern_keys) != len(keys):
+            return None
+        bound = None
+        for (pattern_key, pattern_value), (key, value) in zip(pattern_keys, keys):
+            if pattern_key != key:
+                return None
+            if pattern_value == PathTrie.WILDCARD:
+                if bound is None:
+                    bound = dict(bindings)
+                bound[key] = value
+            elif pattern_value != value:
+                return None
+        return bindings if bound is None else bound
+
+    def insert(self, path, value):
+        self._insert_elements(path, self.parse_path(path), value)
+
+    def _insert_elements(self, path, elements, value):
+        node = self.root
+        for name, keys in elements:
+            node = node.children.setdefault(name, {}).setdefault(keys, PathTrie._Node())
+        if not node.has_value:
+            self.size += 1
+        node.path, node.value, node.has_value = path, value, True
+
+    '''
+    This method returns the trie as a flat list of (path, parsed elements, value) entries (see from_entries), plain data that a
+    snapshot can store without any node object.
+    '''
+    def entries(self):
+        entries = []
+        stack = [(self.root, ())]
+        while stack:
+            node, elements = stack.pop()
+            if node.has_value:
+                entries.append((node.path, elements, node.value))
+            children = [(child, elements + ((name, keys),)) for name, group in node.children.items() for keys, child in group.items()]
+            stack.extend(reversed(children))  # Pre-order, so the restored levels keep the order of their children
+        return entries
+
+    '''
+    This method rebuilds a trie from the entries of PathTrie.entries, only the parsed elements are inserted again (no path is
+    parsed again).
+    '''
+    @staticmethod
+    def from_entries(entries):
+        trie = PathTrie()
+        for path, elements, value in entries:
+            trie._insert_elements(path, elements, value)
+        return trie
+
+    '''
+    This method removes a path (and prunes the empty levels above it), it returns False if the path was not stored.
+    '''
+    def remove(self, path):
+        trail = [(None, None, self.root)]
+        for name, keys in self.parse_path(path):
+            child = trail[-1][2].children.get(name, {}).get(keys)
+            if child is None:
+                return False
+            trail.append((name, keys, child))
+        node = trail[-1][2]
+        if not node.has_value:
+            return False
+        node.path, node.value, node.has_value = None, None, False
+        self.size -= 1
+
+        for index in range(len(trail) - 1, 0, -1):
+            name, keys, child = trail[index]
+            if child.has_value or child.children:
+                break
+            group = trail[index - 1][2].children[name]
+            del group[keys]
+            if not group:
+                del trail[index - 1][2].children[name]
+        return True
+
+    '''
+    This method returns the value stored under an exact path, or default.
+    '''
+    def get(self, path, default=None):
+        node = self.root
+        for name, keys in self.parse_path(path):
+            node = node.children.get(name, {}).get(keys)
+            if node is None:
+                return default
+        return node.value if node.has_value else default
+
+    def __contains__(self, path):
+        return self.get(path, self) is not self
+
+    def __len__(self):
+        return self.size
+
+    '''
+    This method finds the stored pattern that matches a concrete path (exact entries win over wildcard entries).
+    It returns (value, bindings) where bindings maps the key names of the '*' values to the concrete values, for example the
+    pattern '/interfaces/interface[name=*]/state' matches '/interfaces/interface[name=eth3]/state' with {'name': 'eth3'}.
+    It returns None when no stored path matches.
+    '''
+    def match(self, path):
+        return self._match(self.root, self.parse_path(path), 0, {})
+
+    def _match(self, node, elements, index, bindings):
+        if index == len(elements):
+            return (node.value, bindings) if node.has_value else None
+        name, keys = elements[index]
+        for candidate in ((name, PathTrie.WILDCARD) if name != PathTrie.WILDCARD else (name,)):
+            group = node.children.get(candidate)
+            if not group:
+                continue
+            exact = group.get(keys) if candidate == name else None
+            if exact is not None:
+                found = self._match(exact, elements, index + 1, bindings)
+                if found is not None:
+                    return found
+            for pattern_keys, child in group.items():
+                if child is exact:
+                    continue
+                bound = self._bind(pattern_keys, keys, bindings)
+                if bound is not None:
+                    found = self._match(child, elements, index + 1, bound)
+                    if found is not None:
+                        return found
+        return None
+
+    '''
+    This method finds the longest stored path which is a prefix of a concrete path, in O(path depth).
+    It returns (stored path, value, remaining elements), or None when no stored path is a prefix of the path.
+    '''
+    def longest_prefix(self, path):
+        elements = self.parse_path(path)
+        node = self.root
+        found = (node, 0) if node.has_value else None
+        for index, (name, keys) in enumerate(elements):
+            node = node.children.get(name, {}).get(keys)
+            if node is None:
+                break
+            if node.has_value:
+                found = (node, index + 1)
+        if found is None:
+            return None
+        node, depth = found
+        return node.path, node.value, elements[depth:]
+
+    '''
+    This method expands a query that may contain wildcards into all the stored concrete paths it matches.
+    It returns a list of (path, value) pairs in insertion order of the trie levels.
+    '''
+    def expand(self, query):
+        found = {}
+        self._expand(self.root, self.parse_path(query), 0, found)
+        return list(found.values())
+
+    def _expand(self, node, elements, index, found):
+        if index == len(elements):
+            if node.has_value:
+                found[id(node)] = (node.path, node.value)
+            return
+        name, keys = elements[index]
+        if name == PathTrie.DESCENDANTS:
+            self._expand(node, elements, index + 1, found)
+            for group in node.children.values():
+                for child in group.values():
+                    self._expand(child, elements, index, found)
+            return
+
+        groups = node.children.values() if name == PathTrie.WILDCARD else [node.children.get(name, {})]
+        has_wildcard_keys = any(value == PathTrie.WILDCARD for _, value in keys)
+        for group in groups:
+            if not has_wildcard_keys:
+                child = group.get(keys)
+                if child is not None:
+                    self._expand(child, elements, index + 1, found)
+                continue
+            for child_keys, child in group.items():
+                if self._bind(keys, child_keys, {}) is not None:
+                    self._expand(child, elements, index + 1, found)
+
+    '''
+    This method returns every stored (path, value) at or below a path prefix.
+    '''
+    def prefix(self, query):
+        return self.expand(query.rstrip("/") + "/" + PathTrie.DESCENDANTS)
 
 ########################################################################################################################################
 #                                                         gNMI Query Execution                                                         #
@@ -47,6 +539,8 @@ class GNMI:
     '''
     def __init__(self, json_file):
         self.data = self.load_data(json_file)
+        self._trie = None
+        self._tables = {}  # id(rows) -> (rows, {key names: [{key values: row}, has duplicate keys]}), see _find_row
 
     '''
     This method attempts to open and load the JSON file:
@@ -65,393 +559,3659 @@ class GNMI:
 
     '''
     This method retrieves data from the loaded GNMI dictionary based on the provided path.
-        If the path is found, it returns the data as a formatted JSON string.
+        If the path is found, it returns the data as native Python objects (dict, list, int, float, str ...).
+        If the path is not found, it returns None.
+    '''
+    def fetch_tree(self, gnmi_path):
+        with METRICS.stage("fetch", gnmi_path):
+            return self.data.get(gnmi_path, None)
+
+    '''
+    This method retrieves data from the loaded GNMI dictionary based on the provided path.
+        If the path is found, it returns the data as a formatted JSON string (for display, use fetch_tree to compare).
         If the path is not found, it returns None.
-    '''  
+    '''
     def fetch_data(self, gnmi_path):
-        data = self.data.get(gnmi_path, None)
+        data = self.fetch_tree(gnmi_path)
         if data is not None:
-            return json.dumps(data, indent=4)  # Return data as a JSON string
+            return GNMI.format_tree(data)  # Return data as a JSON string
         return None
 
-########################################################################################################################################
-#                                                         CLI Command Mapping                                                          #
-########################################################################################################################################
-'''
- --> Declare the CLI class which is responsible for simulating the execution of CLI commands based on provided gNMI paths.
-     This class maintains two types of command mappings:
-        1. Single command mappings for gNMI paths that correspond to a single CLI command.
-        2. Multi-command mappings for gNMI paths that correspond to multiple CLI commands.
-'''
-class CLI:
+    '''
+    This method returns a PathTrie of every gNMI path in the data, it is built on first use.
+    '''
+    def path_trie(self):
+        if self._trie is None:
+            self._trie = PathTrie((gnmi_path, None) for gnmi_path in self.data.keys())
+        return self._trie
 
     '''
-    The constructor initializes two dictionaries:
-        1. single_command: Maps gNMI paths to a single CLI command.
-        2. multi_commands: Maps gNMI paths to a list of multiple CLI commands.
+    This method expands a gNMI path query into the concrete gNMI paths found in the data:
+        - A query without wildcards returns [query] if the path exists, otherwise [].
+        - A query with wildcards ('[name=*]', '*', '...') returns every matching path, e.g. '/interfaces/interface[name=*]/state'.
     '''
-    def __init__(self):
-        self.single_command = {
-            "/interfaces/interface[name=eth0]/state/counters": "show interfaces eth0 counters",
-            "/system/memory/state": "show memory",
-            "/interfaces/interface[name=eth1]/state/counters": "show interfaces eth1 counters",
-            "/system/cpu/state/usage": "show cpu",
-            "/routing/protocols/protocol[ospf]/ospf/state": "show ospf status"
-        }
-        
-        self.multi_commands = {
-            "/interfaces/interface[name=eth0]/state": [
-                "show interfaces eth0 status",
-                "show interfaces eth0 mac-address",
-                "show interfaces eth0 mtu",
-                "show interfaces eth0 speed"
-            ],
-            "/bgp/neighbors/neighbor[neighbor_address=10.0.0.1]/state": [
-                "show bgp neighbors 10.0.0.1",
-                "show bgp neighbors 10.0.0.1 received-routes",
-                "show bgp neighbors 10.0.0.1 advertised-routes"
-            ],
-            "/system/cpu/state": [
-                "show cpu usage",
-                "show cpu user",
-                "show cpu system",
-                "show cpu idle"
-            ],
-            "/ospf/areas/area[id=0.0.0.0]/state": [
-                "show ospf area 0.0.0.0",
-                "show ospf neighbors"
-            ],
-            "/system/disk/state": [
-                "show disk space",
-                "show disk health"
-            ]
-        }
+    def expand_paths(self, query):
+        if not PathTrie.is_pattern(query):
+            return [query] if query in self.data else []
+        return [gnmi_path for gnmi_path, _ in self.path_trie().expand(query)]
 
     '''
-    This method checks if the provided GNMI path is mapped to a single CLI command or multiple CLI commands.
-    It then simulates the execution of the corresponding CLI command(s) and returns their outputs.
+    This method applies a gNMI update (the new value of a path) to the data and returns the gNMI paths of the data it changed.
+    The gNMI path holding the updated path is found in the path trie, then the path is followed inside its subtree (a key like
+    'neighbor[neighbor_id=1.1.1.1]' selects the row of a table through the key index of the table, see _find_row), so an update
+    costs O(path depth). Missing levels are created, a path outside every stored gNMI path is stored as a new gNMI path.
+    Every change is recorded in `undo` (a list, see rollback) when it is given.
     '''
-    def execute_command(self, gnmi_path):
-        """Simulate execution of CLI commands based on GNMI path."""
-        if gnmi_path in self.single_command:
-            command = self.single_command[gnmi_path]
-            output = self.get_cli_output(command)
-            return command, "\n".join([f"{key}: {output[key]}" for key in output])
-        elif gnmi_path in self.multi_commands:
-            commands = self.multi_commands[gnmi_path]
-            outputs = {}
-            for command in commands:
-                out = self.get_cli_output(command)
-                if isinstance(out, list):
-                    for index, item in out:
-                        if isinstance(item, dict):
-                            for key, value in item.items():
-                                outputs[key] = value
-                if isinstance(out, dict):
-                    for key, value in out.items():
-                        outputs[key] = value
-            return commands, "\n".join([f"{key}: {outputs[key]}" for key in outputs])
-        return None, None
+    def apply_update(self, gnmi_path, value, undo=None):
+        found = self.path_trie().longest_prefix(gnmi_path)
+        if found is None:
+            self.data[gnmi_path] = value
+            self._trie.insert(gnmi_path, None)
+            if undo is not None:
+                undo.append(functools.partial(self._remove_path, gnmi_path))
+            return [gnmi_path]
+        stored_path, _, elements = found
+        if not elements:
+            self._set(self.data, stored_path, value, undo)
+            return [stored_path]
+
+        node, rows = self.data[stored_path], None
+        for element in elements[:-1]:
+            node, rows = self._child(node, element, True, undo)
+        name, keys = elements[-1]
+        if keys:
+            if not isinstance(value, dict):
+                raise ValueError(f"The row '{gnmi_path}' can only be updated with a dictionary.")
+            row, rows = self._child(node, elements[-1], True, undo)
+            for field, field_value in value.items():
+                self._set(row, field, field_value, undo, rows)
+        elif isinstance(node, dict):
+            self._set(node, name, value, undo, rows)
+        else:
+            raise ValueError(f"'{gnmi_path}' is not inside a container.")
+        return [stored_path]
 
     '''
-    This method returns a predefined output for each CLI command.
+    This method applies a gNMI delete and returns the gNMI paths of the data it changed. Deleting a stored gNMI path (or a path
+    above several of them, e.g. '/system') removes them from the data, deleting a path inside a subtree removes that element.
+    Finding a row costs O(path depth) like an update, removing it still shifts the rows after it (a C-level move of the list).
     '''
-    def get_cli_output(self, cli_command):
-        """Simulate CLI command outputs."""
-        cli_outputs = {
-            "show interfaces eth0 counters": {
-                "in_octets": 1500000,
-                "out_octets": 1400000,
-                "in_errors": 10,
-                "out_errors": 2
-            },
-            "show memory": {
-                "total_memory": 4096000,
-                "available_memory": 1000000
-            },
-            "show interfaces eth1 counters": {
-                "in_octets": 200000,
-                "out_octets": 100000
-            },
-            "show cpu": {
-                "cpu_usage": 65
-            },
-            "show ospf status": {
-                "ospf_area": "0.0.0.0",
-                "ospf_state": "down"
-            },
-            "show interfaces eth0 status": {
-                "admin_status": "up",
-                "oper_status": "up"
-            },
-            "show interfaces eth0 mac-address": {
-                "mac_address": "00:1C:42:2B:60:5A"
-            },
-            "show interfaces eth0 mtu": {
-                "mtu": 1500
-            },
-            "show interfaces eth0 speed": {
-                "speed": 1000
-            },
-            "show bgp neighbors 10.0.0.1": {
-                "peer_as": 65001,
-                "connection_state": "Established"
-            },
-            "show bgp neighbors 10.0.0.1 received-routes": {
-                "received_prefix_count": 120
-            },
-            "show bgp neighbors 10.0.0.1 advertised-routes": {
-                "sent_prefix_count": 95
-            },
-            "show cpu usage": {
-                "cpu_usage": 75
-            },
-            "show cpu user": {
-                "user_usage": 45
-            },
-            "show cpu system": {
-                "system_usage": 20
-            },
-            "show cpu idle": {
-                "idle_percentage": 25
-            },
-            "show ospf area 0.0.0.0": {
-                "area_id": "0.0.0.0",
-                "active_interfaces": 4,
-                "lsdb_entries": 200
-            },
-            "show ospf neighbors": [
-                {"neighbor_id": "1.1.1.1","state": "full"},
-                {"neighbor_id": "2.2.2.2","state": "full"}
-            ],
-            "show disk space": {
-                "total_space": 1024000,
-                "used_space": 500000,
-                "available_space": 524000
-            },
-            "show disk health": {
-                "disk_health": "good"
-            }
-        }
-        
-        output = cli_outputs.get(cli_command, None)
-        if output is not None:
-            return output
-        return None
+    def apply_delete(self, gnmi_path, undo=None):
+        trie = self.path_trie()
+        found = trie.longest_prefix(gnmi_path)
+        if found is None or not found[2]:
+            removed = [stored_path for stored_path, _ in trie.prefix(gnmi_path)]
+            for stored_path in removed:
+                value = self.data.pop(stored_path)
+                trie.remove(stored_path)
+                if undo is not None:
+                    undo.append(functools.partial(self._restore_path, stored_path, value))
+            if removed:
+                self._tables.clear()
+            return removed
 
-########################################################################################################################################
-#                                                           Data Comparison                                                            #
-########################################################################################################################################
+        stored_path, _, elements = found
+        node, rows = self.data[stored_path], None
+        for element in elements[:-1]:
+            node, rows = self._child(node, element, False, undo)
+            if node is None:
+                return []
+        name, keys = elements[-1]
+        if keys:
+            row, rows = self._child(node, elements[-1], False, undo)
+            if row is None:
+                return []
+            self._remove_row(rows, row, undo)
+        elif isinstance(node, dict) and name in node:
+            self._set(node, name, GNMI._MISSING, undo, rows)
+        else:
+            return []
+        return [stored_path]
 
-'''
- --> Declare the Comparator class which provides static methods to normalize keys, convert units, adjust precision, and compare nested 
-     data structures. These methods ensure uniformity and accuracy when comparing gNMI data with CLI outputs.
-'''
-class Comparator:
+    '''
+    This method undoes the changes recorded in `undo` by apply_update and apply_delete, the last change first, so a notification
+    which fails halfway leaves the data as it was. The key indexes are rebuilt on their next use.
+    '''
+    def rollback(self, undo):
+        for action in reversed(undo):
+            action()
+        undo.clear()
+        self._tables.clear()
+
+    def _remove_path(self, gnmi_path):
+        del self.data[gnmi_path]
+        self._trie.remove(gnmi_path)
+
+    def _restore_path(self, gnmi_path, value):
+        self.data[gnmi_path] = value
+        self._trie.insert(gnmi_path, None)
 
     '''
-    Normalize key by converting to lowercase and removing special characters.
+    This method returns the child of a container for one path element and the table holding it: (node[name], None), or
+    (the row of the table node[name] whose key fields have the values of the element keys, the table). With create=True a missing
+    child (or row) is added, else (None, None) is returned.
     '''
-    @staticmethod
-    def normalize_key(key):
-        return key.lower().replace(" ", "").replace("-", "").replace("_", "")
+    def _child(self, node, element, create, undo):
+        name, keys = element
+        if not isinstance(node, dict):
+            if create:
+                raise ValueError(f"'{name}' is not inside a container.")
+            return None, None
+        if not keys:
+            child = node.get(name)
+            if child is None and create:
+                child = {}
+                self._set(node, name, child, undo)
+            return child, None
+
+        rows = node.get(name)
+        if rows is None and create:
+            rows = []
+            self._set(node, name, rows, undo)
+        if not isinstance(rows, list):
+            if create:
+                raise ValueError(f"'{name}' is not a table.")
+            return None, None
+        row = self._find_row(rows, keys)
+        if row is None and create:
+            row = dict(keys)
+            rows.append(row)
+            for key_names, (index, _) in self._indexes(rows).items():
+                index.setdefault(GNMI._row_key(row, key_names), row)
+            if undo is not None:
+                undo.append(rows.pop)
+        return row, rows
 
     '''
-    Convert units like K, KB, M, MB, G, GB, T, TB, ms, s, m, h, and % to base values.
+    This method returns the first row of a table whose key fields have the values of `keys`, or None. The rows are looked up in a
+    key index of the table (one per set of key names) built on first use and kept up to date by the changes of this class.
     '''
+    def _find_row(self, rows, keys):
+        key_names = tuple(key for key, _ in keys)
+        indexes = self._indexes(rows)
+        if key_names not in indexes:
+            index, duplicates = {}, False
+            for row in rows:
+                if isinstance(row, dict):
+                    key = GNMI._row_key(row, key_names)
+                    duplicates = duplicates or key in index
+                    index.setdefault(key, row)
+            indexes[key_names] = [index, duplicates]
+        return indexes[key_names][0].get(tuple(value for _, value in keys))
+
+    def _indexes(self, rows):
+        entry = self._tables.get(id(rows))
+        if entry is None or entry[0] is not rows:
+            entry = self._tables[id(rows)] = (rows, {})
+        return entry[1]
+
     @staticmethod
-    def convert_units(value):
-        if isinstance(value, str):
-            if value.endswith("K"):
-                return int(float(value.replace("K", "")) * 1000)
-            elif value.endswith("KB"):
-                return int(float(value.replace("KB", "")) * 1024)
-            elif value.endswith("M"):
-                return int(float(value.replace("M", "")) * 1000000)
-            elif value.endswith("MB"):
-                return int(float(value.replace("MB", "")) * 000000)
-            elif value.endswith("G"):
-                return int(float(value.replace("G", "")) * 1000000000)
-            elif value.endswith("GB"):
-                return int(float(value.replace("GB", "")) * 1000000000)
-            elif value.endswith("T"):
-                return int(float(value.replace("T", "")) * 1000000000000)
-            elif value.endswith("TB"):
-                return int(float(value.replace("TB", "")) * 1000000000000)
-            elif value.endswith("ms"):
-                return int(float(value.replace("ms", "")))
-            elif value.endswith("s"):
-                return int(float(value.replace("s", "")) * 1000)  # Convert seconds to milliseconds
-            elif value.endswith("m"):
-                return int(float(value.replace("m", "")) * 1000 * 60)  # Convert minutes to milliseconds
-            elif value.endswith("h"):
-                return int(float(value.replace("h", "")) * 1000 * 60 * 60)  # Convert hours to milliseconds
-            elif value.endswith("%"):
-                return float(value.replace("%", ""))
-        return value
+    def _row_key(row, key_names):
+        return tuple(str(row.get(key)) for key in key_names)
+
+    def _remove_row(self, rows, row, undo):
+        position = rows.index(row)
+        del rows[position]
+        indexes = self._indexes(rows)
+        for key_names, (index, duplicates) in list(indexes.items()):
+            if duplicates:
+                del indexes[key_names]  # Another row may have the same key, the index is rebuilt on its next use
+            else:
+                index.pop(GNMI._row_key(row, key_names), None)
+        if GNMI._has_tables(row):
+            self._tables.clear()
+        if undo is not None:
+            undo.append(functools.partial(rows.insert, position, row))
 
     '''
-    Round or adjust precision of numerical values.
+    This method sets (or with value=_MISSING deletes) container[field] and records the change in `undo`. When the container is a
+    row of `rows`, changing one of its key fields drops the key indexes of that table, replacing a value which holds tables drops
+    every key index (they are rebuilt on their next use).
     '''
+    _MISSING = object()
+
+    def _set(self, container, field, value, undo, rows=None):
+        old = container.get(field, GNMI._MISSING)
+        if value is GNMI._MISSING:
+            del container[field]
+        else:
+            container[field] = value
+        if undo is not None:
+            undo.append(functools.partial(GNMI._restore, container, field, old))
+        entry = self._tables.get(id(rows)) if rows is not None else None
+        if entry is not None and entry[0] is rows and any(field in key_names for key_names in entry[1]):
+            del self._tables[id(rows)]
+        if GNMI._has_tables(old):
+            self._tables.clear()
+
     @staticmethod
-    def adjust_precision(value):
-        if isinstance(value, float):
-            return round(value, 2)  # Round to 2 decimal places
-        elif isinstance(value, int):
-            return float(value)  # Convert integers to float for uniformity
-        elif isinstance(value, str) and value.isdigit():
-            return float(value)
-        return value
+    def _restore(container, field, old):
+        if old is GNMI._MISSING:
+            container.pop(field, None)
+        else:
+            container[field] = old
+
+    @staticmethod
+    def _has_tables(value):
+        if isinstance(value, list):
+            return True
+        return isinstance(value, dict) and any(GNMI._has_tables(child) for child in value.values())
 
     '''
-    Recursively compare nested structures.
+    This method formats gNMI data as a pretty printed JSON string.
     '''
     @staticmethod
-    def compare_nested(gnmi_data, cli_data):
-        
-        differences = {}  # Dictionary to store differences
-        
-        # Normalize GNMI data keys
-        normalized_gnmi_data = {}
-        for key, value in gnmi_data.items():
-            normalized_key = Comparator.normalize_key(key)
-            normalized_gnmi_data[normalized_key] = value
-        
-        # Normalize CLI data keys
-        normalized_cli_data = {}
-        for key, value in cli_data.items():
-            normalized_key = Comparator.normalize_key(key)
-            normalized_cli_data[normalized_key] = value
-        
-        # Compare normalized GNMI data with normalized CLI data
-        for key, gnmi_value in normalized_gnmi_data.items():
-            if key not in normalized_cli_data:
-                differences[key] = {"GNMI": gnmi_value, "CLI": None, "explaine": "{} found in gNMI Output but missing in CLI Command Output".format(key)}
-            else:
-                cli_value = normalized_cli_data[key]
-                if isinstance(gnmi_value, dict) and isinstance(cli_value, dict):
-                    # Recursive comparison for nested dictionaries
-                    nested_diff = Comparator.compare_nested(gnmi_value, cli_value)
-                    differences.update(nested_diff)
-                else:
-                    # Normalize and adjust precision
-                    gnmi_value = Comparator.convert_units(gnmi_value)
-                    cli_value = Comparator.convert_units(cli_value)
+    def format_tree(data):
+        return json.dumps(data, indent=4)
 
-                    gnmi_value = Comparator.adjust_precision(gnmi_value)
-                    cli_value = Comparator.adjust_precision(cli_value)
+'''
+ --> Declare the GNMIIndex class which gives dictionary-like read access to a very large gNMI dump without loading it.
+     The file is memory-mapped and a side index maps every top-level gNMI path to the byte offset and length of its subtree, so
+     only the subtrees that are actually requested are parsed. The index is saved next to the data file ('<file>.idx') and is
+     rebuilt automatically when the size or the modification time of the data file changes.
+'''
+class GNMIIndex:
 
-                    if gnmi_value != cli_value:
-                        differences[key] = {"GNMI": gnmi_value, "CLI": cli_value, "explaine": "{} found in both gNMI Output and CLI Command Output but have different values".format(key)}
-        
-        # Check for extra keys in CLI data
-        for key in normalized_cli_data:
-            if key not in normalized_gnmi_data:
-                differences[key] = {"GNMI": None, "CLI": normalized_cli_data[key], "explaine": "{} found in CLI Command Output but missing in gNMI Output".format(key)}
-        
-        return differences
+    INDEX_VERSION = 1
+    WINDOW_BYTES = 4 * 1024 * 1024
+
+    _DECODER = json.JSONDecoder()
+    _SPACE = re.compile(r'\s*')
 
     '''
-    Compare GNMI data and CLI output for mismatches.
+    The constructor memory-maps the data file and loads (or builds) its offset index.
     '''
-    @staticmethod
-    def compare_data(gnmi_output, cli_output):
+    def __init__(self, json_file, index_file=None):
+        self.json_file = json_file
+        self.index_file = index_file or json_file + ".idx"
         try:
-            gnmi_data = json.loads(gnmi_output)
-        except json.JSONDecodeError:
-            return {"Error": "Invalid GNMI JSON format."}
+            with open(json_file, "rb") as file:
+                stat = os.fstat(file.fileno())
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File '{json_file}' not found.")
+        self.offsets = self.load_index(stat)
 
-        cli_data = {}
-        for line in cli_output.split("\n"):
-            if ":" in line:
-                key, value = line.split(":", 1)
-                cli_data[key.strip()] = value.strip()
+    '''
+    This method returns the saved index when it still matches the data file, otherwise it scans the file and saves a new index.
+    '''
+    def load_index(self, stat):
+        try:
+            with open(self.index_file, "r") as file:
+                saved = json.load(file)
+            if (saved.get("version") == self.INDEX_VERSION and saved.get("size") == stat.st_size
+                    and saved.get("mtime_ns") == stat.st_mtime_ns):
+                return {path: tuple(entry) for path, entry in saved["offsets"].items()}
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
 
-        if isinstance(gnmi_data, dict) and isinstance(cli_data, dict):
-            return Comparator.compare_nested(gnmi_data, cli_data)
-        return {"Error": "Invalid input formats; expected dictionaries."}
+        offsets = self.build_index(self._map)
+        try:
+            with open(self.index_file, "w") as file:
+                json.dump({"version": self.INDEX_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                           "offsets": offsets}, file)
+        except OSError:
+            pass  # A read-only directory only costs a rescan on the next start
+        return offsets
 
-########################################################################################################################################
-#                                                              Make the Report                                                         #
-########################################################################################################################################
+    '''
+    This method scans the top-level JSON object and returns {gnmi_path: (offset, length)} for every member.
+    Each member is run through the C JSON scanner and dropped straight away, so the scan never holds more than one subtree.
+    The file is decoded in windows of `window` bytes (a window grows to twice the size of a member that does not fit in it), so
+    the scan of a dump of hundreds of MB never holds it as one string. Offsets are byte offsets in the file.
+    '''
+    @classmethod
+    def build_index(cls, buffer, window=WINDOW_BYTES):
+        offsets = {}
+        text, base, end = cls._decode_window(buffer, 0, window)
+        ascii_only = len(text) == end - base
+        pos = cls._SPACE.match(text, 0).end()
+        if text[pos:pos + 1] != "{":
+            raise ValueError("Invalid JSON format: the gNMI data must be a JSON object.")
+        pos += 1
+        char_pos, byte_pos = pos, base + pos  # byte_pos is the byte offset of text[char_pos]
 
-'''
- --> Declare a class to generate the output report
-'''
-class ReportGenerator:
-    @staticmethod
-    def generate_report(differences):
-        """Generate a discrepancy report in the specified format."""
-        if not differences:
-            return "No discrepancies found, all values match."
-        else:
-            report = "" 
-            for key, diff in differences.items(): 
-                report += f"\nField: {key}\n GNMI: {diff['GNMI']}\n CLI: {diff['CLI']}\nExplaine the difference: {diff['explaine']}" 
-                return report
-            
-    def save_history(output_history):
-        """Ask user if they want to save the history and in which format."""
         while True:
-            save_option = input("Do you want to save your test history? [y/n]: ")
-            if save_option.lower() == "y":
-                file_format = input("Choose a file format to save (txt/csv/json): ")
-                file_name = input("Enter the file name (without extension): ")
+            member = pos
+            try:
+                pos = cls._SPACE.match(text, pos).end()
+                char = text[pos:pos + 1]
+                if char == ",":
+                    pos += 1
+                    continue
+                if char == "}":
+                    return offsets
 
-                if file_format.lower() == "txt":
-                    with open(f"{file_name}.txt", "w") as file:
-                        for entry in output_history:
-                            file.write(json.dumps(entry, indent=4) + "\n")
-                    print(f"History saved as {file_name}.txt")
-                    break
+                key, pos = cls._DECODER.raw_decode(text, pos)
+                pos = cls._SPACE.match(text, pos).end()
+                if text[pos:pos + 1] != ":" or not isinstance(key, str):
+                    raise ValueError
+                start = cls._SPACE.match(text, pos + 1).end()
+                pos = cls._DECODER.raw_decode(text, start)[1]
+                after = cls._SPACE.match(text, pos).end()
+                if text[after:after + 1] not in (",", "}"):
+                    raise ValueError  # Incomplete, e.g. a number cut by the end of the window ('12.' of '12.5')
+            except ValueError:
+                member_byte = byte_pos + len(text[char_pos:member].encode("utf-8")) if not ascii_only else base + member
+                if end >= len(buffer):
+                    raise ValueError(f"Invalid JSON format near byte {member_byte}.")
+                # The member does not fit in the rest of the window: decode a new window starting with it
+                if member == 0:
+                    window *= 2
+                text, base, end = cls._decode_window(buffer, member_byte, window)
+                ascii_only = len(text) == end - base
+                pos = char_pos = 0
+                byte_pos = base
+                continue
 
-                elif file_format == "csv":
-                    with open(f"{file_name}.csv", "w", newline="") as csvfile:
-                        writer = csv.writer(csvfile)
-                        writer.writerow(["Path", "Comparison Report"])
-                        for entry in output_history:
-                            for path, report in entry.items():
-                                writer.writerow([path, report])
-                    print(f"History saved as {file_name}.csv")
+            if ascii_only:
+                offsets[key] = (base + start, pos - start)
+            else:
+                byte_pos += len(text[char_pos:start].encode("utf-8"))
+                length = len(text[start:pos].encode("utf-8"))
+                offsets[key] = (byte_pos, length)
+                byte_pos, char_pos = byte_pos + length, pos
+
+    '''
+    This method decodes `window` bytes of the buffer from `start` and returns (text, start, end byte), a character cut in two by
+    the end of the window is left for the next window.
+    '''
+    @staticmethod
+    def _decode_window(buffer, start, window):
+        chunk = buffer[start:start + window]
+        try:
+            return chunk.decode("utf-8"), start, start + len(chunk)
+        except UnicodeDecodeError as error:
+            if error.start < len(chunk) - 3 or start + len(chunk) >= len(buffer):
+                raise ValueError("Invalid JSON format: the gNMI data is not UTF-8 encoded.") from None
+            return chunk[:error.start].decode("utf-8"), start, start + error.start
+
+    '''
+    Dictionary-like access: only the requested subtree is parsed.
+    '''
+    def get(self, gnmi_path, default=None):
+        entry = self.offsets.get(gnmi_path)
+        if entry is None:
+            return default
+        offset, length = entry
+        return json.loads(self._map[offset:offset + length])
+
+    def __getitem__(self, gnmi_path):
+        if gnmi_path not in self.offsets:
+            raise KeyError(gnmi_path)
+        return self.get(gnmi_path)
+
+    def __contains__(self, gnmi_path):
+        return gnmi_path in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def keys(self):
+        return self.offsets.keys()
+
+    def items(self):
+        for gnmi_path in self.offsets:
+            yield gnmi_path, self.get(gnmi_path)
+
+'''
+ --> Declare the IndexedGNMI class, a GNMI object backed by a GNMIIndex instead of a fully parsed dictionary.
+     It is a drop-in replacement for GNMI (same fetch_data) meant for very large dumps where only a few paths are checked.
+'''
+class IndexedGNMI(GNMI):
+
+    def load_data(self, json_file):
+        return GNMIIndex(json_file)
+
+'''
+ --> Declare the GNMISnapshot class which keeps a binary snapshot of a parsed gNMI data file ('<file>.snap' next to it), so the
+     next runs on the same file skip the JSON parsing. The snapshot holds the parsed tree, the PathTrie of its gNMI paths and the
+     normalized form of every key of the tree (to prime Comparator.normalize_key), pickled with protocol 5.
+     The file starts with a fixed header: magic, format version, pickle protocol, size, modification time and BLAKE2 hash of the
+     data file, and the length of the pickled payload. The file is memory-mapped and the payload is unpickled straight from the
+     mapping (no copy of the payload is made before unpickling). A snapshot is used when:
+        - the size and the modification time of the data file match the header (no need to read the data file), or
+        - the size matches and the hash of the data file matches (the file was touched or copied), the header is then updated.
+     Otherwise the data file is parsed and a new snapshot is written (to a temporary file first, so readers never see a partial
+     snapshot). Snapshots are trusted like the data file itself, do not load snapshots from untrusted directories.
+'''
+class GNMISnapshot:
+
+    MAGIC = b"GNMISNAP"
+    VERSION = 2
+    PROTOCOL = 5
+    HEADER = struct.Struct("<8sHHQQ16sQ")  # magic, version, protocol, size, mtime_ns, hash, payload length
+
+    def __init__(self, json_file, snapshot_file=None):
+        self.json_file = json_file
+        self.snapshot_file = snapshot_file or json_file + ".snap"
+        self.status = None  # "loaded", "revalidated" or "rebuilt"
+
+    @staticmethod
+    def hash_file(file_name):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_name, "rb") as file:
+            if os.fstat(file.fileno()).st_size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+        return digest.digest()
+
+    '''
+    This method returns the payload of the snapshot ({"data", "trie", "keys"}), or None when there is no valid snapshot.
+    The payload only holds plain data (the trie as its PathTrie.entries), so any process can read the snapshot of another one.
+    '''
+    def load(self):
+        try:
+            stat = os.stat(self.json_file)
+            with open(self.snapshot_file, "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if len(mapped) < self.HEADER.size:
+                        return None
+                    magic, version, protocol, size, mtime_ns, digest, length = self.HEADER.unpack_from(mapped, 0)
+                    if (magic != self.MAGIC or version != self.VERSION or protocol != self.PROTOCOL or size != stat.st_size
+                            or len(mapped) != self.HEADER.size + length):
+                        return None
+                    revalidated = mtime_ns != stat.st_mtime_ns
+                    if revalidated and self.hash_file(self.json_file) != digest:
+                        return None
+                    with memoryview(mapped) as view:
+                        # The payload is millions of small containers, a garbage collection pass every few thousand of them
+                        # would only find nothing to collect
+                        collecting = gc.isenabled()
+                        gc.disable()
+                        try:
+                            payload = pickle.loads(view[self.HEADER.size:])
+                        finally:
+                            if collecting:
+                                gc.enable()
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError, AttributeError, struct.error):
+            return None
+
+        if revalidated:
+            self.write_header(stat, digest, length)
+        self.status = "revalidated" if revalidated else "loaded"
+        return payload
+
+    def write_header(self, stat, digest, length):
+        try:
+            with open(self.snapshot_file, "r+b") as file:
+                file.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.PROTOCOL, stat.st_size, stat.st_mtime_ns, digest, length))
+        except OSError:
+            pass
+
+    '''
+    This method builds the payload of a parsed tree, saves it as the new snapshot and returns it.
+    '''
+    def save(self, data):
+        payload = {"data": data, "trie": PathTrie((gnmi_path, None) for gnmi_path in data.keys()).entries(),
+                   "keys": GNMISnapshot.normalized_keys(data)}
+        self.status = "rebuilt"
+        try:
+            stat = os.stat(self.json_file)
+            digest = self.hash_file(self.json_file)
+            pickled = pickle.dumps(payload, protocol=self.PROTOCOL)
+            temporary = self.snapshot_file + ".tmp"
+            with open(temporary, "wb") as file:
+                file.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.PROTOCOL, stat.st_size, stat.st_mtime_ns, digest,
+                                            len(pickled)))
+                file.write(pickled)
+            os.replace(temporary, self.snapshot_file)
+        except OSError:
+            pass  # A read-only directory only costs a parse on the next start
+        return payload
+
+    '''
+    This method returns {key: normalized key} for the keys of every level of the tree (at most NORMALIZED_KEYS_LIMIT keys).
+    '''
+    @staticmethod
+    def normalized_keys(data):
+        keys = {}
+        levels = [subtree for subtree in data.values()]
+        while levels and len(keys) < Comparator.NORMALIZED_KEYS_LIMIT:
+            level = levels.pop()
+            if isinstance(level, dict):
+                for key, value in level.items():
+                    if key not in keys:
+                        keys[key] = Comparator.normalize_key(key)
+                    if isinstance(value, (dict, list)):
+                        levels.append(value)
+            elif isinstance(level, list):
+                levels.extend(item for item in level if isinstance(item, (dict, list)))
+        return keys
+
+'''
+ --> Declare the SnapshotGNMI class, a GNMI object loaded from its GNMISnapshot when the data file did not change.
+     The path trie and the normalized keys come with the snapshot, so nothing has to be rebuilt on a warm start.
+'''
+class SnapshotGNMI(GNMI):
+
+    def __init__(self, json_file, snapshot_file=None):
+        self.snapshot = GNMISnapshot(json_file, snapshot_file)
+        self._snapshot_trie = None
+        super().__init__(json_file)
+        self._trie = self._snapshot_trie
+
+    def load_data(self, json_file):
+        payload = self.snapshot.load()
+        if payload is None:
+            payload = self.snapshot.save(super().load_data(json_file))
+        Comparator.prime_keys(payload["keys"])
+        self._snapshot_trie = PathTrie.from_entries(payload["trie"])
+        return payload["data"]
+
+'''
+This function opens a gNMI data file with the loader selected on the command line: IndexedGNMI (lazy), SnapshotGNMI (snapshot)
+or GNMI.
+'''
+def open_gnmi(json_file, lazy=False, snapshot=False):
+    if lazy:
+        return IndexedGNMI(json_file)
+    if snapshot:
+        return SnapshotGNMI(json_file)
+    return GNMI(json_file)
+
+########################################################################################################################################
+#                                                         CLI Command Mapping                                                          #
+########################################################################################################################################
+'''
+ --> Declare the CLI class which is responsible for simulating the execution of CLI commands based on provided gNMI paths.
+     This class maintains two types of command mappings:
+        1. Single command mappings for gNMI paths that correspond to a single CLI command.
+        2. Multi-command mappings for gNMI paths that correspond to multiple CLI commands.
+'''
+class CLI:
+
+    '''
+    The predefined output of each simulated CLI command, built once for all CLI objects.
+    '''
+    CLI_OUTPUTS = {
+        "show interfaces eth0 counters": {
+            "in_octets": 1500000,
+            "out_octets": 1400000,
+            "in_errors": 10,
+            "out_errors": 2
+        },
+        "show memory": {
+            "total_memory": 4096000,
+            "available_memory": 1000000
+        },
+        "show interfaces eth1 counters": {
+            "in_octets": 200000,
+            "out_octets": 100000
+        },
+        "show cpu": {
+            "cpu_usage": 65
+        },
+        "show ospf status": {
+            "ospf_area": "0.0.0.0",
+            "ospf_state": "down"
+        },
+        "show interfaces eth0 status": {
+            "admin_status": "up",
+            "oper_status": "up"
+        },
+        "show interfaces eth0 mac-address": {
+            "mac_address": "00:1C:42:2B:60:5A"
+        },
+        "show interfaces eth0 mtu": {
+            "mtu": 1500
+        },
+        "show interfaces eth0 speed": {
+            "speed": 1000
+        },
+        "show bgp neighbors 10.0.0.1": {
+            "peer_as": 65001,
+            "connection_state": "Established"
+        },
+        "show bgp neighbors 10.0.0.1 received-routes": {
+            "received_prefix_count": 120
+        },
+        "show bgp neighbors 10.0.0.1 advertised-routes": {
+            "sent_prefix_count": 95
+        },
+        "show cpu usage": {
+            "cpu_usage": 75
+        },
+        "show cpu user": {
+            "user_usage": 45
+        },
+        "show cpu system": {
+            "system_usage": 20
+        },
+        "show cpu idle": {
+            "idle_percentage": 25
+        },
+        "show ospf area 0.0.0.0": {
+            "area_id": "0.0.0.0",
+            "active_interfaces": 4,
+            "lsdb_entries": 200
+        },
+        "show ospf neighbors": [
+            {"neighbor_id": "1.1.1.1","state": "full"},
+            {"neighbor_id": "2.2.2.2","state": "full"}
+        ],
+        "show disk space": {
+            "total_space": 1024000,
+            "used_space": 500000,
+            "available_space": 524000
+        },
+        "show disk health": {
+            "disk_health": "good"
+        }
+    }
+
+    '''
+    The TextFSM template (file of the 'templates' folder) used to parse the raw text output of each command, see CLITemplate.
+    '{name}' fields match any word, so one entry covers every interface, neighbor ...
+    '''
+    TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+    STREAM_BYTES = 1024 * 1024  # Larger outputs of table commands are parsed on demand (see read_output)
+    CLI_TEMPLATES = {
+        "show memory": "show_memory.textfsm",
+        "show cpu": "show_cpu.textfsm",
+        "show cpu usage": "show_cpu.textfsm",
+        "show cpu user": "show_cpu.textfsm",
+        "show cpu system": "show_cpu.textfsm",
+        "show cpu idle": "show_cpu.textfsm",
+        "show ospf status": "show_ospf_status.textfsm",
+        "show ospf area {id}": "show_ospf_area.textfsm",
+        "show ospf neighbors": "show_ospf_neighbors.textfsm",
+        "show disk space": "show_disk.textfsm",
+        "show disk health": "show_disk.textfsm",
+        "show interfaces {name} counters": "show_interfaces_counters.textfsm",
+        "show interfaces {name} status": "show_interfaces_status.textfsm",
+        "show interfaces {name} mac-address": "show_interfaces_properties.textfsm",
+        "show interfaces {name} mtu": "show_interfaces_properties.textfsm",
+        "show interfaces {name} speed": "show_interfaces_properties.textfsm",
+        "show bgp neighbors {neighbor_address}": "show_bgp_neighbor.textfsm",
+        "show bgp neighbors {neighbor_address} received-routes": "show_bgp_routes.textfsm",
+        "show bgp neighbors {neighbor_address} advertised-routes": "show_bgp_routes.textfsm"
+    }
+
+    '''
+    The constructor initializes four dictionaries:
+        1. single_command: Maps gNMI paths to a single CLI command.
+        2. multi_commands: Maps gNMI paths to a list of multiple CLI commands.
+        3. command_templates: Maps gNMI path patterns with keys like '[name=*]' to one or more CLI command templates, the
+           matched key values fill the '{name}' fields of the templates (one entry covers every interface, neighbor ...).
+        4. list_fields: Maps CLI commands whose output is a table (a list of rows) to the field that holds the table.
+    The command templates are stored in a PathTrie (command_trie) so that matching a path costs O(path depth).
+    Optional arguments:
+        - outputs: the command outputs of this device (default: CLI_OUTPUTS), an output given as raw text (a string) is parsed
+          with the template of its command.
+        - templates: the template file of each command (default: CLI_TEMPLATES), relative paths are read from TEMPLATE_DIR.
+        - cache: a CLIOutputCache shared between the CLI objects, so a command is only run once per freshness window.
+        - device: the name of the device, used as part of the cache key.
+    '''
+    def __init__(self, outputs=None, cache=None, device="local", templates=None):
+        self.cli_outputs = CLI.CLI_OUTPUTS if outputs is None else outputs
+        self.templates = CLI.CLI_TEMPLATES if templates is None else templates
+        self._parsers = {}  # command -> CLITemplate (or None)
+        self.cache = cache
+        self.device = device
+
+        self.single_command = {
+            "/system/memory/state": "show memory",
+            "/system/cpu/state/usage": "show cpu",
+            "/routing/protocols/protocol[ospf]/ospf/state": "show ospf status"
+        }
+        
+        self.multi_commands = {
+            "/system/cpu/state": [
+                "show cpu usage",
+                "show cpu user",
+                "show cpu system",
+                "show cpu idle"
+            ],
+            "/system/disk/state": [
+                "show disk space",
+                "show disk health"
+            ]
+        }
+
+        self.command_templates = {
+            "/interfaces/interface[name=*]/state/counters": "show interfaces {name} counters",
+            "/interfaces/interface[name=*]/state": [
+                "show interfaces {name} status",
+                "show interfaces {name} mac-address",
+                "show interfaces {name} mtu",
+                "show interfaces {name} speed"
+            ],
+            "/bgp/neighbors/neighbor[neighbor_address=*]/state": [
+                "show bgp neighbors {neighbor_address}",
+                "show bgp neighbors {neighbor_address} received-routes",
+                "show bgp neighbors {neighbor_address} advertised-routes"
+            ],
+            "/ospf/areas/area[id=*]/state": [
+                "show ospf area {id}",
+                "show ospf neighbors"
+            ]
+        }
+        self.command_trie = PathTrie(self.command_templates.items())
+
+        self.list_fields = {
+            "show ospf neighbors": "adjacencies"
+        }
+
+    '''
+    This method returns the CLI command (a string) or commands (a list) mapped to a gNMI path, or None if it is not mapped.
+    Exact mappings are checked first, then the command templates are filled with the key values of the matching pattern.
+    '''
+    def resolve_commands(self, gnmi_path):
+        if gnmi_path in self.single_command:
+            return self.single_command[gnmi_path]
+        elif gnmi_path in self.multi_commands:
+            return self.multi_commands[gnmi_path]
+
+        try:
+            found = self.command_trie.match(gnmi_path)
+        except ValueError:
+            return None
+        if found is None:
+            return None
+        template, bindings = found
+        if isinstance(template, list):
+            return [command.format(**bindings) for command in template]
+        return template.format(**bindings)
+
+    '''
+    This method checks if the provided GNMI path is mapped to a single CLI command or multiple CLI commands.
+    It then simulates the execution of the corresponding CLI command(s) and returns the command(s) together with their merged
+    outputs as one dictionary of native Python values (nested dictionaries and tables are kept as they are).
+    '''
+    def execute_structured(self, gnmi_path):
+        """Simulate execution of CLI commands based on GNMI path."""
+        commands = self.resolve_commands(gnmi_path)
+        if commands is None:
+            return None, None
+        command_list = commands if isinstance(commands, list) else [commands]
+        outputs = []
+        for command in command_list:
+            with METRICS.stage("cli", gnmi_path, command):
+                outputs.append(self.run_command(command))
+        METRICS.count("cli_commands", len(command_list))
+        return commands, self.merge_outputs(command_list, outputs)
+
+    '''
+    This method returns the output of one CLI command, from the cache when it is fresh there.
+    '''
+    def run_command(self, command):
+        if self.cache is None:
+            return self.get_cli_output(command)
+        return self.cache.get(self.device, command, lambda: self.get_cli_output(command))
+
+    '''
+    This method merges the outputs of the CLI commands of one gNMI path into a single dictionary:
+        - Dictionary outputs are merged key by key.
+        - Table outputs (lists) are stored under their field from list_fields, or merged row by row when the command has none.
+    '''
+    def merge_outputs(self, commands, outputs):
+        merged = {}
+        for command, out in zip(commands, outputs):
+            if isinstance(out, dict):
+                merged.update(out)
+            elif isinstance(out, CLIRecords):
+                merged[self.list_fields[command]] = out
+            elif isinstance(out, list):
+                if command in self.list_fields:
+                    merged[self.list_fields[command]] = out
+                else:
+                    for item in out:
+                        if isinstance(item, dict):
+                            merged.update(item)
+        return merged
+
+    '''
+    This method returns the CLI command(s) and their outputs as "key: value" lines (for display, use execute_structured to
+    compare).
+    '''
+    def execute_command(self, gnmi_path):
+        commands, outputs = self.execute_structured(gnmi_path)
+        if outputs is None:
+            return None, None
+        return commands, CLI.format_output(outputs)
+
+    '''
+    This method formats merged CLI outputs as "key: value" lines.
+    '''
+    @staticmethod
+    def format_output(outputs):
+        return "\n".join([f"{key}: {outputs[key]}" for key in outputs])
+
+    '''
+    This method returns the output of a CLI command (from cli_outputs), or None if the command is unknown.
+    '''
+    def get_cli_output(self, cli_command):
+        """Simulate CLI command outputs."""
+        output = self.cli_outputs.get(cli_command, None)
+        if isinstance(output, str):
+            return self.read_output(cli_command, output, len(output))
+        return output
+
+    '''
+    This method returns the compiled template of a CLI command, or None if no template is bound to it. The lookup is done once
+    per command, the template files are compiled once for all commands and CLI objects (see CLITemplate.load).
+    '''
+    def template_for(self, cli_command):
+        if cli_command not in self._parsers:
+            file_name = self.templates.get(cli_command)
+            if file_name is None:
+                for pattern, pattern_file in self.templates.items():
+                    if "{" in pattern and CLI.command_pattern(pattern).fullmatch(cli_command):
+                        file_name = pattern_file
+                        break
+            self._parsers[cli_command] = None if file_name is None else CLITemplate.load(os.path.join(CLI.TEMPLATE_DIR, file_name))
+        return self._parsers[cli_command]
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def command_pattern(pattern):
+        return re.compile(re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>\\S+)", re.escape(pattern)))
+
+    '''
+    This method parses the raw text output of a CLI command (a string or an iterable of lines) into a list of records.
+    Use stream_output to handle the records one at a time.
+    '''
+    def parse_output(self, cli_command, text):
+        return list(self.stream_output(cli_command, text))
+
+    '''
+    This method returns the records of the raw output of a CLI command (a string or a binary file of `size` bytes): a list, or
+    for an output of a table command larger than STREAM_BYTES a CLIRecords, which is parsed again every time the table is read.
+    The Key values of the template of a table command become the default key of its table (see ListComparator.set_default_key).
+    '''
+    def read_output(self, cli_command, source, size):
+        field = self.list_fields.get(cli_command)
+        if field is not None:
+            template = self.template_for(cli_command)
+            if template is not None and template.keys:
+                Comparator.lists.set_default_key(field, template.keys)
+            if template is not None and size > CLI.STREAM_BYTES:
+                return CLIRecords(template, source)
+        if not isinstance(source, str):
+            source.seek(0)
+            source = source.read().decode(errors="replace")
+        return self.parse_output(cli_command, source)
+
+    def stream_output(self, cli_command, lines):
+        template = self.template_for(cli_command)
+        if template is None:
+            raise CLITemplate.Error(f"No template is bound to the CLI command '{cli_command}'")
+        return template.parse(lines)
+
+########################################################################################################################################
+#                                                           CLI Output Parser                                                          #
+########################################################################################################################################
+
+'''
+ --> Declare the CLITemplate class which turns the raw text printed by a CLI command into records (dictionaries), using templates
+     written in the TextFSM format (one '.textfsm' file per command family in the 'templates' folder):
+        - "Value [Options] name (regex)" lines declare the fields of a record, the options are Filldown (the value is kept for the
+          next records), Required (records without it are dropped), List (every match is appended) and Key (the row key).
+        - Every state ("Start" first) is a list of rules "^regex -> Action": ${name} in the regex captures the value `name`, the
+          action is [Next|Continue][.Record|.NoRecord|.Clear|.Clearall] [NewState] or Error. "End" stops the parsing.
+        - Like TextFSM, the current record is saved at the end of the text unless the template has an "EOF" state.
+     A template is compiled once (every ${name} is replaced by a named group and every rule regex is compiled) and shared by all
+     the commands using it. parse() reads the text line by line and yields every record as soon as it is complete, so very large
+     outputs (route tables ...) can be streamed from a file. Unlike TextFSM, values that never matched are left out of the record
+     (so the comparator does not see empty fields) and numbers are returned as int/float.
+'''
+class CLITemplate:
+
+    class Error(ValueError):
+        """Raised for a template that can not be compiled, or when an Error rule matches a line."""
+
+    OPTIONS = ("Filldown", "Required", "List", "Key")
+    LINE_ACTIONS = ("Next", "Continue")
+    RECORD_ACTIONS = ("Record", "NoRecord", "Clear", "Clearall")
+
+    _VALUE = re.compile(r"^Value\s+(?:([A-Za-z,]+)\s+)?(\w+)\s+(\(.*\))\s*$")
+    _RULE = re.compile(r"^\s+(\^.*?)(?:\s+->\s*(.*?))?\s*$")
+    _STATE = re.compile(r"^(\w+)\s*$")
+    _SUBSTITUTION = re.compile(r"\$(?:\{(\w+)\}|(\w+)|(\$))")
+    _INTEGER = re.compile(r"-?\d+")
+    _FLOAT = re.compile(r"-?\d+\.\d+")
+
+    def __init__(self, text, name="<template>"):
+        self.name = name
+        self.values = {}  # value name -> (options, regex)
+        self.states = {}  # state name -> [(compiled regex, line action, record action, new state), ...]
+
+        state = None
+        for number, line in enumerate(text.splitlines(), 1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            if line.startswith("Value ") and state is None:
+                self._add_value(line, number)
+            elif not line[0].isspace():
+                match = CLITemplate._STATE.match(line)
+                if match is None:
+                    raise CLITemplate.Error(f"{name}:{number}: invalid state name '{line}'")
+                state = match.group(1)
+                self.states[state] = []
+            elif state is not None:
+                self.states[state].append(self._compile_rule(line, number))
+            else:
+                raise CLITemplate.Error(f"{name}:{number}: rule outside of a state")
+
+        if "Start" not in self.states:
+            raise CLITemplate.Error(f"{name}: missing 'Start' state")
+        for rules in self.states.values():
+            for _, _, _, new_state in rules:
+                if new_state is not None and new_state not in self.states and new_state not in ("End", "EOF"):
+                    raise CLITemplate.Error(f"{name}: unknown state '{new_state}'")
+        self.filldown = {value for value, (options, _) in self.values.items() if "Filldown" in options}
+        self.required = [value for value, (options, _) in self.values.items() if "Required" in options]
+        self.lists = {value for value, (options, _) in self.values.items() if "List" in options}
+        self.keys = [value for value, (options, _) in self.values.items() if "Key" in options]
+
+    def _add_value(self, line, number):
+        match = CLITemplate._VALUE.match(line)
+        if match is None:
+            raise CLITemplate.Error(f"{self.name}:{number}: invalid Value line '{line}'")
+        options = tuple(match.group(1).split(",")) if match.group(1) else ()
+        for option in options:
+            if option not in CLITemplate.OPTIONS:
+                raise CLITemplate.Error(f"{self.name}:{number}: unknown option '{option}'")
+        self.values[match.group(2)] = (options, match.group(3))
+
+    def _compile_rule(self, line, number):
+        match = CLITemplate._RULE.match(line)
+        if match is None:
+            raise CLITemplate.Error(f"{self.name}:{number}: a rule must start with '^'")
+        pattern, action = match.groups()
+
+        def substitute(found):
+            value = found.group(1) or found.group(2)
+            if value is None:
+                return "$"
+            if value not in self.values:
+                raise CLITemplate.Error(f"{self.name}:{number}: unknown value '{value}'")
+            return "(?P<{}>{})".format(value, self.values[value][1])
+
+        try:
+            regex = re.compile(CLITemplate._SUBSTITUTION.sub(substitute, pattern))
+        except re.error as error:
+            raise CLITemplate.Error(f"{self.name}:{number}: {error}") from None
+
+        line_action, record_action, new_state = "Next", None, None
+        for word in (action or "").split():
+            first, _, second = word.partition(".")
+            if first in CLITemplate.LINE_ACTIONS and (not second or second in CLITemplate.RECORD_ACTIONS):
+                line_action, record_action = first, second or None
+            elif first in CLITemplate.RECORD_ACTIONS and not second:
+                record_action = first
+            elif word == "Error":
+                line_action = "Error"
+            else:
+                new_state = word
+        if line_action == "Continue" and new_state is not None:
+            raise CLITemplate.Error(f"{self.name}:{number}: 'Continue' can not change the state")
+        return regex, line_action, record_action, new_state
+
+    '''
+    This method compiles the template of a file once, every later call returns the same CLITemplate.
+    '''
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def load(file_name):
+        with open(file_name, "r") as file:
+            return CLITemplate(file.read(), os.path.basename(file_name))
+
+    @staticmethod
+    def coerce(value):
+        if CLITemplate._INTEGER.fullmatch(value):
+            return int(value)
+        if CLITemplate._FLOAT.fullmatch(value):
+            return float(value)
+        return value
+
+    '''
+    This method returns the current record (or None if it has to be dropped) and clears the values that are not Filldown.
+    '''
+    def _record(self, current):
+        record = None
+        if any(value not in self.filldown for value in current) and all(value in current for value in self.required):
+            record = {value: [CLITemplate.coerce(item) for item in found] if value in self.lists else CLITemplate.coerce(found)
+                      for value, found in current.items()}
+        for value in list(current):
+            if value not in self.filldown:
+                del current[value]
+        return record
+
+    '''
+    This method parses CLI output (a string or any iterable of lines, e.g. an open file) and yields its records one at a time.
+    '''
+    def parse(self, lines):
+        if isinstance(lines, str):
+            lines = lines.splitlines()
+        current = {}  # value name -> matched text (list of texts for List values)
+        state = self.states["Start"]
+        for line in lines:
+            line = line.rstrip("\r\n")
+            for regex, line_action, record_action, new_state in state:
+                match = regex.match(line)
+                if match is None:
+                    continue
+                if line_action == "Error":
+                    raise CLITemplate.Error(f"{self.name}: unexpected line '{line}'")
+                for value, found in match.groupdict().items():
+                    if found is not None:
+                        if value in self.lists:
+                            current.setdefault(value, []).append(found)
+                        else:
+                            current[value] = found
+
+                if record_action == "Record":
+                    record = self._record(current)
+                    if record is not None:
+                        yield record
+                elif record_action == "Clear":
+                    for value in [value for value in current if value not in self.filldown]:
+                        del current[value]
+                elif record_action == "Clearall":
+                    current.clear()
+
+                if new_state in ("End", "EOF"):
+                    if new_state == "EOF" and "EOF" not in self.states:
+                        record = self._record(current)
+                        if record is not None:
+                            yield record
+                    return
+                if new_state is not None:
+                    state = self.states[new_state]
+                if line_action == "Next":
+                    break
+
+        if "EOF" not in self.states:
+            record = self._record(current)
+            if record is not None:
+                yield record
+
+'''
+ --> Declare the CLIRecords class, the records of a large table output parsed on demand: every iteration reads the raw text (a
+     string or a binary file, e.g. the spooled stdout of a CommandTransport) again with the template of its command and yields the
+     records one at a time, so a table of millions of rows is joined by ListComparator.merge_join without being held as a list.
+     Its repr() is a hash of the raw text, so the result cache and the IncrementalComparator see a changed output as changed.
+'''
+class CLIRecords:
+
+    def __init__(self, template, source):
+        self.template = template
+        self.source = source
+        self._digest = None
+
+    def lines(self):
+        if isinstance(self.source, str):
+            return io.StringIO(self.source)
+        self.source.seek(0)
+        return (line.decode(errors="replace") for line in self.source)
+
+    def __iter__(self):
+        return self.template.parse(self.lines())
+
+    def __repr__(self):
+        if self._digest is None:
+            digest = hashlib.blake2b(self.template.name.encode(), digest_size=16)
+            for line in self.lines():
+                digest.update(line.encode())
+            self._digest = digest.hexdigest()
+        return "CLIRecords({})".format(self._digest)
+
+########################################################################################################################################
+#                                                           CLI Output Cache                                                           #
+########################################################################################################################################
+
+'''
+ --> Declare the CLIOutputCache class which keeps the outputs of CLI commands keyed by (device, command).
+     Several gNMI paths map to the same or overlapping commands, with the cache a batch run sends each distinct command to a device
+     at most once per freshness window:
+        - Every entry expires after the TTL of its command: the TTL of the longest matching prefix in `ttls`, else `default_ttl`.
+        - When more than `maxsize` outputs are kept the least recently used one is dropped.
+        - Concurrent requests for the same command are deduplicated (single-flight): the first one runs the command, the others
+          wait for its output (or its error), cached or not. This works for threads (get) and for asyncio tasks (get_async).
+     The outputs are shared, callers must not modify them.
+'''
+class CLIOutputCache:
+
+    COUNTERS = ("hits", "misses", "deduplicated", "evictions", "expirations")
+
+    def __init__(self, default_ttl=10.0, ttls=None, maxsize=4096, clock=time.monotonic):
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.maxsize = maxsize
+        self.clock = clock
+        self._prefixes = sorted(self.ttls, key=len, reverse=True)
+        self._entries = collections.OrderedDict()  # (device, command) -> (expiry time, output)
+        self._inflight = {}  # (device, command) -> {"event": threading.Event, "output" or "error" once the fetch is done}
+        self._inflight_async = {}  # (device, command) -> asyncio.Future
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    '''
+    This method returns the TTL (in seconds) of a command.
+    '''
+    def ttl_for(self, command):
+        for prefix in self._prefixes:
+            if command.startswith(prefix):
+                return self.ttls[prefix]
+        return self.default_ttl
+
+    '''
+    This method returns (True, output) when a fresh output is cached, otherwise (False, None). The caller holds the lock.
+    '''
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[1]
+
+    def _store(self, key, output):
+        ttl = self.ttl_for(key[1])
+        if ttl <= 0:
+            return
+        self._entries[key] = (self.clock() + ttl, output)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    '''
+    This method returns the output of a command on a device, calling fetch() only when no fresh output is cached and no other
+    thread is already fetching it.
+    '''
+    def get(self, device, command, fetch):
+        key = (device, command)
+        with self._lock:
+            found, output = self._lookup(key)
+            if found:
+                self.hits += 1
+                return output
+            inflight = self._inflight.get(key)
+            waiting = inflight is not None
+            if waiting:
+                self.deduplicated += 1
+            else:
+                inflight = self._inflight[key] = {"event": threading.Event()}
+                self.misses += 1
+
+        if waiting:
+            # The output (or the error) of the fetch in flight is shared, even when it is not cached (TTL <= 0)
+            inflight["event"].wait()
+            if "error" in inflight:
+                raise inflight["error"]
+            return inflight["output"]
+
+        try:
+            output = inflight["output"] = fetch()
+            with self._lock:
+                self._store(key, output)
+            return output
+        except BaseException as error:
+            inflight["error"] = error
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            inflight["event"].set()
+
+    '''
+    Same as get for asyncio tasks, fetch() returns an awaitable.
+    '''
+    async def get_async(self, device, command, fetch):
+        key = (device, command)
+        with self._lock:
+            found, output = self._lookup(key)
+            if found:
+                self.hits += 1
+                return output
+        future = self._inflight_async.get(key)
+        if future is not None:
+            self.deduplicated += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = self._inflight_async[key] = asyncio.get_running_loop().create_future()
+        try:
+            output = await fetch()
+        except BaseException as error:
+            future.set_exception(error)
+            future.exception()  # Mark it as retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._inflight_async[key]
+        with self._lock:
+            self._store(key, output)
+        future.set_result(output)
+        return output
+
+    '''
+    This method drops every cached output (of one device, or of all devices).
+    '''
+    def invalidate(self, device=None):
+        with self._lock:
+            if device is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == device]:
+                    del self._entries[key]
+
+    def counters(self):
+        with self._lock:
+            return {name: getattr(self, name) for name in CLIOutputCache.COUNTERS}
+
+    '''
+    This method adds the counters of another cache (e.g. of a worker process, see BatchRunner.run) to the statistics.
+    '''
+    def merge(self, counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    '''
+    This method returns the cache statistics.
+    '''
+    def stats(self):
+        requests = self.hits + self.misses + self.deduplicated
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "deduplicated": self.deduplicated,
+                "evictions": self.evictions, "expirations": self.expirations,
+                "hit_ratio": (self.hits + self.deduplicated) / requests if requests else 0.0}
+
+########################################################################################################################################
+#                                                      Asynchronous CLI Execution                                                      #
+########################################################################################################################################
+
+'''
+ --> Declare the CLITransport class, the interface every way of reaching a device's CLI implements (SSH, telnet, a lab simulator ...).
+     A transport is one session with the device: it is opened once, runs commands one at a time and is closed when the pool is
+     closed. run() returns the command output (a dictionary, a table or the raw text) or None for an unknown command.
+'''
+class CLITransport:
+
+    async def open(self):
+        pass
+
+    async def run(self, command):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+'''
+ --> Declare the LocalTransport class, a stand-in transport that answers from the simulated outputs of a CLI object after a
+     simulated network latency (latency seconds plus a random jitter), it is meant for testing the concurrent executor.
+'''
+class LocalTransport(CLITransport):
+
+    def __init__(self, cli, latency=0.0, jitter=0.0):
+        self.cli = cli
+        self.latency = latency
+        self.jitter = jitter
+
+    async def run(self, command):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self.cli.get_cli_output(command)
+
+'''
+ --> Declare the CommandTransport class which runs every CLI command through a local program, for example
+     'ssh admin@r1 {command}' ({command} is replaced by the CLI command, the line is split like a shell would split it but no
+     shell is used). The raw text printed by the program is parsed with the template of the command (see CLI.read_output).
+'''
+class CommandTransport(CLITransport):
+
+    CHUNK_BYTES = 64 * 1024
+
+    def __init__(self, cli, command_line):
+        self.cli = cli
+        self.arguments = shlex.split(command_line)
+
+    async def run(self, command):
+        arguments = [argument.replace("{command}", command) for argument in self.arguments]
+        process = await asyncio.create_subprocess_exec(*arguments, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        # The output is spooled: kept in memory up to STREAM_BYTES, written to a temporary file beyond (see CLI.read_output)
+        stdout = tempfile.SpooledTemporaryFile(max_size=CLI.STREAM_BYTES)
+        try:
+            stderr = asyncio.ensure_future(process.stderr.read())
+            while True:
+                chunk = await process.stdout.read(CommandTransport.CHUNK_BYTES)
+                if not chunk:
                     break
+                stdout.write(chunk)
+            stderr = await stderr
+            await process.wait()
+        except asyncio.CancelledError:
+            process.kill()
+            stdout.close()
+            raise
+        if process.returncode != 0:
+            stdout.close()
+            raise RuntimeError("'{}' failed with exit status {}: {}".format(
+                command, process.returncode, stderr.decode(errors="replace").strip()[:200]))
+        return self.cli.read_output(command, stdout, stdout.tell())
+
+'''
+ --> Declare the SessionPool class which keeps the sessions (transports) of one device.
+     At most `max_sessions` commands run at the same time on the device, idle sessions are reused and every command is cancelled
+     after `timeout` seconds (the session that timed out is closed and not reused).
+'''
+class SessionPool:
+
+    def __init__(self, transport_factory, max_sessions=4, timeout=10.0):
+        self.transport_factory = transport_factory
+        self.max_sessions = max_sessions
+        self.timeout = timeout
+        self._idle = []
+        self._semaphore = asyncio.Semaphore(max_sessions)
+
+    '''
+    This method runs one command on a free session of the device and returns its output.
+    It raises asyncio.TimeoutError when the command takes longer than the pool timeout.
+    '''
+    async def run(self, command):
+        async with self._semaphore:
+            if self._idle:
+                session = self._idle.pop()
+            else:
+                session = self.transport_factory()
+                await session.open()
+            try:
+                output = await asyncio.wait_for(session.run(command), self.timeout)
+            except BaseException:
+                await session.close()
+                raise
+            self._idle.append(session)
+            return output
+
+    async def close(self):
+        while self._idle:
+            await self._idle.pop().close()
+
+'''
+ --> Declare the AsyncCLIExecutor class which runs the CLI commands of gNMI paths concurrently.
+     The command mapping and the merging of the outputs are the ones of the CLI object, only the execution changes: all the commands
+     of a path, and of all the paths given to execute_many, are sent at the same time through the session pool of their device.
+'''
+class AsyncCLIExecutor:
+
+    '''
+    The constructor takes the CLI object (command mapping) and optionally the pool of the default device, by default a pool of
+    LocalTransport sessions without latency. The CLIOutputCache of the CLI object (if any) is used for every device.
+    '''
+    def __init__(self, cli, pool=None, device=None):
+        self.cli = cli
+        self.device = device or cli.device
+        self.pools = {self.device: pool or SessionPool(lambda: LocalTransport(cli))}
+
+    '''
+    This method registers the session pool of another device.
+    '''
+    def add_device(self, device, transport_factory, max_sessions=4, timeout=10.0):
+        self.pools[device] = SessionPool(transport_factory, max_sessions, timeout)
+
+    '''
+    Same as CLI.execute_structured, with all the commands of the path running concurrently.
+    '''
+    async def execute_structured(self, gnmi_path, device=None):
+        commands = self.cli.resolve_commands(gnmi_path)
+        if commands is None:
+            return None, None
+        command_list = commands if isinstance(commands, list) else [commands]
+        device = device or self.device
+
+        async def timed(command):
+            with METRICS.stage("cli", gnmi_path, command):
+                return await self.run_command(command, device)
+
+        # Every command is awaited even when one fails, so no command is left running behind the caller
+        outputs = await asyncio.gather(*(timed(command) for command in command_list), return_exceptions=True)
+        for output in outputs:
+            if isinstance(output, BaseException):
+                raise output
+        METRICS.count("cli_commands", len(command_list))
+        return commands, self.cli.merge_outputs(command_list, outputs)
+
+    '''
+    This method runs one command on a device through its session pool, or returns its cached output.
+    '''
+    async def run_command(self, command, device=None):
+        device = device or self.device
+        pool = self.pools[device]
+        if self.cli.cache is None:
+            return await pool.run(command)
+        return await self.cli.cache.get_async(device, command, lambda: pool.run(command))
+
+    '''
+    This method runs execute_structured for every gNMI path concurrently and returns the results in the same order.
+    A path whose commands failed (e.g. timed out) gets the exception instead of its (commands, outputs) result.
+    '''
+    async def execute_many(self, gnmi_paths, device=None):
+        return await asyncio.gather(*(self.execute_structured(gnmi_path, device) for gnmi_path in gnmi_paths),
+                                    return_exceptions=True)
+
+    async def close(self):
+        for pool in self.pools.values():
+            await pool.close()
+
+########################################################################################################################################
+#                                                           Data Comparison                                                            #
+########################################################################################################################################
+
+'''
+ --> Declare the UnitConverter class which converts values with a unit suffix (e.g. "100K", "2.5GB", "30s", "2.00%") to base values.
+     The suffixes are kept in a table compiled once into a single regular expression, tried longest suffix first, so "KB" is never
+     read as "K" and "ms" never as "s". Sizes become plain numbers, times become milliseconds and percentages become floats.
+     The byte suffixes follow the selected mode: "si" (KB = 1000) or "iec" (KB = 1024), KiB/MiB/GiB/TiB are always IEC.
+'''
+class UnitConverter:
+
+    SI = "si"
+    IEC = "iec"
+
+    # Columns shorter than this are converted one value at a time, NumPy only pays off on large columns
+    BATCH_THRESHOLD = 256
+
+    '''
+    The constructor builds the suffix table for the selected mode and compiles it.
+    '''
+    def __init__(self, mode=IEC):
+        if mode not in (UnitConverter.SI, UnitConverter.IEC):
+            raise ValueError(f"Invalid unit mode '{mode}', expected '{UnitConverter.SI}' or '{UnitConverter.IEC}'.")
+        self.mode = mode
+        byte = 1024 if mode == UnitConverter.IEC else 1000
+
+        # suffix -> (multiplier, is_percentage)
+        self.table = {
+            "K": (10 ** 3, False), "M": (10 ** 6, False), "G": (10 ** 9, False), "T": (10 ** 12, False),
+            "KB": (byte, False), "MB": (byte ** 2, False), "GB": (byte ** 3, False), "TB": (byte ** 4, False),
+            "KiB": (1024, False), "MiB": (1024 ** 2, False), "GiB": (1024 ** 3, False), "TiB": (1024 ** 4, False),
+            "ms": (1, False), "s": (1000, False), "m": (1000 * 60, False), "h": (1000 * 60 * 60, False),
+            "%": (1, True)
+        }
+        self.suffixes = sorted(self.table, key=len, reverse=True)
+        self.pattern = re.compile(r"\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*("
+                                  + "|".join(re.escape(suffix) for suffix in self.suffixes) + r")\s*\Z")
+
+    '''
+    Convert one value, values without a known unit suffix are returned unchanged.
+    '''
+    def convert(self, value):
+        if isinstance(value, str):
+            match = self.pattern.match(value)
+            if match:
+                multiplier, is_percentage = self.table[match.group(2)]
+                if is_percentage:
+                    return float(match.group(1))
+                return int(float(match.group(1)) * multiplier)
+        return value
+
+    '''
+    Convert a column of values and return them as a list (same result as calling convert on every value).
+    Large columns are converted with NumPy when it is installed: one vectorized endswith/parse/multiply pass per suffix instead of
+    one regular expression per value.
+    '''
+    def convert_many(self, values):
+        values = list(values)
+        if numpy is None or len(values) < UnitConverter.BATCH_THRESHOLD:
+            return [self.convert(value) for value in values]
+
+        is_string = numpy.fromiter((isinstance(value, str) for value in values), dtype=bool, count=len(values))
+        if not is_string.any():
+            return values
+        result = numpy.fromiter(values, dtype=object, count=len(values))
+        positions = numpy.flatnonzero(is_string)
+        strings = numpy.char.strip(result[positions].astype(str))
+        remaining = numpy.ones(len(strings), dtype=bool)
+
+        for suffix in self.suffixes:
+            mask = remaining & numpy.char.endswith(strings, suffix)
+            if not mask.any():
+                continue
+            remaining &= ~mask
+            targets = positions[mask]
+            # Only the trailing suffix is cut off ("1KK" keeps "1K", which is not a number)
+            numbers = numpy.char.strip(numpy.char.rpartition(strings[mask], suffix)[:, 0])
+            try:
+                numbers = numbers.astype(numpy.float64)
+            except ValueError:
+                # Some values only end like a unit ("items", "5ss"), they are read as NaN and left to convert below
+                numbers = numpy.array([UnitConverter._float(number) for number in numbers.tolist()], dtype=numpy.float64)
+            # float() also reads "nan", "inf" and "1_000", which are not numbers for convert: leave them to convert as well
+            other = ~numpy.isfinite(numbers) | (numpy.char.find(strings[mask], "_") >= 0)
+            if other.any():
+                for index in targets[other].tolist():
+                    result[index] = self.convert(values[index])
+                targets, numbers = targets[~other], numbers[~other]
+
+            multiplier, is_percentage = self.table[suffix]
+            if not is_percentage:
+                numbers = numpy.trunc(numbers * multiplier)
+                if numpy.all(numpy.abs(numbers) < 2 ** 63):
+                    numbers = numbers.astype(numpy.int64)
+            result[targets] = numpy.fromiter(numbers.tolist(), dtype=object, count=len(numbers))
+        return result.tolist()
+
+    @staticmethod
+    def _float(text):
+        try:
+            return float(text)
+        except ValueError:
+            return float("nan")
+
+'''
+ --> Declare the Comparator class which provides static methods to normalize keys, convert units, adjust precision, and compare nested 
+     data structures. These methods ensure uniformity and accuracy when comparing gNMI data with CLI outputs.
+'''
+class Comparator:
+
+    '''
+    Normalize key by converting to lowercase and removing special characters.
+    The keys of a device rarely change, so every normalized key is remembered (the memo is cleared when it grows too large).
+    '''
+    NORMALIZED_KEYS_LIMIT = 65536
+    _normalized_keys = {}
+
+    @staticmethod
+    def normalize_key(key):
+        normalized = Comparator._normalized_keys.get(key)
+        if normalized is None:
+            if len(Comparator._normalized_keys) >= Comparator.NORMALIZED_KEYS_LIMIT:
+                Comparator._normalized_keys.clear()
+            normalized = key.lower().replace(" ", "").replace("-", "").replace("_", "")
+            Comparator._normalized_keys[key] = normalized
+        return normalized
+
+    '''
+    Add normalized keys computed in advance (e.g. loaded with a GNMISnapshot) to the memo, as long as it stays under its limit.
+    '''
+    @staticmethod
+    def prime_keys(normalized_keys):
+        if len(Comparator._normalized_keys) + len(normalized_keys) <= Comparator.NORMALIZED_KEYS_LIMIT:
+            Comparator._normalized_keys.update(normalized_keys)
+
+    '''
+    Convert units like K, KB, KiB, M, MB, G, GB, T, TB, ms, s, m, h, and % to base values (see UnitConverter).
+    '''
+    units = None  # The UnitConverter used by convert_units, created below the class
+
+    @staticmethod
+    def convert_units(value):
+        return Comparator.units.convert(value)
+
+    '''
+    Convert a whole column of values at once (see UnitConverter.convert_many).
+    '''
+    @staticmethod
+    def convert_units_many(values):
+        return Comparator.units.convert_many(values)
+
+    '''
+    Select how the byte suffixes (KB, MB, GB, TB) are converted: "si" (powers of 1000) or "iec" (powers of 1024).
+    '''
+    @staticmethod
+    def set_unit_mode(mode):
+        Comparator.units = UnitConverter(mode)
+
+    '''
+    Compare tables (lists of rows) row by row, matching the rows by key (see ListComparator).
+    '''
+    lists = None  # The ListComparator used by compare_nested, created below the class
+
+    @staticmethod
+    def is_table(gnmi_value, cli_value):
+        return isinstance(gnmi_value, list) and isinstance(cli_value, (list, CLIRecords))
+
+    '''
+    Round or adjust precision of numerical values.
+    '''
+    @staticmethod
+    def adjust_precision(value):
+        if isinstance(value, float):
+            return round(value, 2)  # Round to 2 decimal places
+        elif isinstance(value, int):
+            return float(value)  # Convert integers to float for uniformity
+        elif isinstance(value, str) and value.isdigit():
+            return float(value)
+        return value
+
+    '''
+    Convert units and adjust precision of a column of leaf values.
+    '''
+    @staticmethod
+    def normalize_values(values):
+        return [Comparator.adjust_precision(value) for value in Comparator.convert_units_many(values)]
+
+    '''
+    Recursively compare nested structures.
+    '''
+    @staticmethod
+    def compare_nested(gnmi_data, cli_data):
+        return Comparator.compare_many([(gnmi_data, cli_data)])[0]
+
+    '''
+    Compare several pairs of levels (e.g. the matched rows of a table) and return the differences of every pair, the same as
+    calling compare_nested on each pair. The leaf values of all the pairs are normalized together (one column per side) and their
+    nested levels are compared together one depth at a time, so the rows of a large table are converted in one vectorized pass
+    (see UnitConverter.convert_many) instead of one small row at a time.
+    '''
+    @staticmethod
+    def compare_many(pairs):
+
+        # Align the keys of both sides of every pair, collect their leaf values and their nested levels
+        levels = []
+        gnmi_column, cli_column, nested_pairs = [], [], []
+        for gnmi_data, cli_data in pairs:
+            entries, extras = Comparator.align(gnmi_data, cli_data)
+            for _, gnmi_key, cli_key, kind in entries:
+                if kind == Comparator.LEAF:
+                    gnmi_column.append(gnmi_data[gnmi_key])
+                    cli_column.append(cli_data[cli_key])
+                elif kind == Comparator.NESTED:
+                    nested_pairs.append((gnmi_data[gnmi_key], cli_data[cli_key]))
+            levels.append((gnmi_data, cli_data, entries, extras))
+
+        # Normalize and adjust precision of all the leaf values at once, compare all the nested levels at once
+        leaves = zip(Comparator.normalize_values(gnmi_column), Comparator.normalize_values(cli_column))
+        nested_differences = iter(Comparator.compare_many(nested_pairs) if nested_pairs else ())
+        nested = lambda key, gnmi_key, cli_key: next(nested_differences)
+        return [Comparator.level_differences(gnmi_data, cli_data, entries, extras, leaves, nested)
+                for gnmi_data, cli_data, entries, extras in levels]
+
+    '''
+    Align the keys of one level. It returns the entries [(normalized key, gNMI key, CLI key, kind)] of every gNMI key (kind is
+    MISSING and the CLI key None when the CLI has no such key, else LEAF, NESTED or TABLE, see kind) and the extras
+    [(normalized key, CLI key)] of the CLI keys missing in gNMI. With duplicate normalized keys the last raw key wins, at the
+    position of the first one (like the keys of a dictionary).
+    '''
+    MISSING, LEAF, NESTED, TABLE = 0, 1, 2, 3
+
+    @staticmethod
+    def align(gnmi_data, cli_data):
+        normalized_gnmi = {Comparator.normalize_key(key): key for key in gnmi_data}
+        normalized_cli = {Comparator.normalize_key(key): key for key in cli_data}
+        entries = []
+        for key, gnmi_key in normalized_gnmi.items():
+            if key in normalized_cli:
+                cli_key = normalized_cli[key]
+                entries.append((key, gnmi_key, cli_key, Comparator.kind(gnmi_data[gnmi_key], cli_data[cli_key])))
+            else:
+                entries.append((key, gnmi_key, None, Comparator.MISSING))
+        extras = [(key, cli_key) for key, cli_key in normalized_cli.items() if key not in normalized_gnmi]
+        return entries, extras
+
+    @staticmethod
+    def kind(gnmi_value, cli_value):
+        if isinstance(gnmi_value, dict) and isinstance(cli_value, dict):
+            return Comparator.NESTED
+        if Comparator.is_table(gnmi_value, cli_value):
+            return Comparator.TABLE
+        return Comparator.LEAF
+
+    '''
+    Build the differences of one aligned level (see align): `leaves` yields the normalized (gNMI value, CLI value) of the LEAF
+    entries in order and nested(key, gnmi_key, cli_key) returns the differences of a NESTED entry. Tables are compared row by row.
+    '''
+    @staticmethod
+    def level_differences(gnmi_data, cli_data, entries, extras, leaves, nested):
+        differences = {}  # Dictionary to store differences
+        for key, gnmi_key, cli_key, kind in entries:
+            if kind == Comparator.LEAF:
+                gnmi_value, cli_value = next(leaves)
+                if gnmi_value != cli_value:
+                    differences[key] = Comparator.different_values(key, gnmi_value, cli_value)
+            elif kind == Comparator.MISSING:
+                differences[key] = Comparator.missing_in_cli(key, gnmi_data[gnmi_key])
+            elif kind == Comparator.TABLE:
+                # Row by row comparison for tables
+                differences.update(Comparator.lists.diff(key, gnmi_data[gnmi_key], cli_data[cli_key]))
+            else:
+                # Recursive comparison for nested dictionaries
+                differences.update(nested(key, gnmi_key, cli_key))
+
+        # Check for extra keys in CLI data
+        for key, cli_key in extras:
+            differences[key] = Comparator.missing_in_gnmi(key, cli_data[cli_key])
+        return differences
+
+    '''
+    The difference entries: a key (or a row) found on one side only, or found on both sides with different values.
+    '''
+    @staticmethod
+    def missing_in_cli(key, gnmi_value):
+        return {"GNMI": gnmi_value, "CLI": None, "explaine": "{} found in gNMI Output but missing in CLI Command Output".format(key)}
+
+    @staticmethod
+    def missing_in_gnmi(key, cli_value):
+        return {"GNMI": None, "CLI": Comparator.plain(cli_value), "explaine": "{} found in CLI Command Output but missing in gNMI Output".format(key)}
+
+    @staticmethod
+    def different_values(key, gnmi_value, cli_value):
+        return {"GNMI": gnmi_value, "CLI": Comparator.plain(cli_value), "explaine": "{} found in both gNMI Output and CLI Command Output but have different values".format(key)}
+
+    '''
+    The value of a difference as plain data: a streamed table (CLIRecords, which reads a file) becomes the list of its records, so
+    the differences can be saved to JSON (IncrementalComparator) and pickled (result cache, worker processes) like any other.
+    '''
+    @staticmethod
+    def plain(value):
+        return list(value) if isinstance(value, CLIRecords) else value
+
+    '''
+    Compare the GNMI data and CLI output of a gNMI path using the compiled comparison plan of that path (see ComparisonPlan).
+    The result is the same as compare_trees, but polling the same path again only costs the value comparisons.
+    '''
+    plans = None  # The ComparisonPlanCache used by compare_path, created below the class
+    results = None  # The ComparisonCache used by compare_data and the verification of paths, None when disabled
+
+    @staticmethod
+    def compare_path(gnmi_path, gnmi_data, cli_data):
+        if not (isinstance(gnmi_data, dict) and isinstance(cli_data, dict)):
+            return {"Error": "Invalid input formats; expected dictionaries."}
+        with METRICS.stage("compare", gnmi_path):
+            return Comparator.plans.compare(gnmi_path, gnmi_data, cli_data)
+
+    '''
+    Compare GNMI data and CLI output (native Python objects, see GNMI.fetch_tree and CLI.execute_structured) for mismatches.
+    '''
+    @staticmethod
+    def compare_trees(gnmi_data, cli_data):
+        if isinstance(gnmi_data, dict) and isinstance(cli_data, dict):
+            return Comparator.compare_nested(gnmi_data, cli_data)
+        return {"Error": "Invalid input formats; expected dictionaries."}
+
+    '''
+    Compare GNMI data and CLI output given as display strings (see GNMI.fetch_data and CLI.execute_command) for mismatches.
+    Raw device output is parsed with `template` (a CLITemplate, see CLI.template_for), the records are merged like the outputs
+    of several commands. Without a template every "key: value" line is read back as a string, compare_trees should be preferred
+    when the native objects are available.
+    '''
+    @staticmethod
+    def compare_data(gnmi_output, cli_output, template=None):
+        try:
+            gnmi_data = json.loads(gnmi_output)
+        except json.JSONDecodeError:
+            return {"Error": "Invalid GNMI JSON format."}
+
+        cli_data = {}
+        if template is not None:
+            for record in template.parse(cli_output):
+                cli_data.update(record)
+        else:
+            for line in cli_output.split("\n"):
+                if ":" in line:
+                    key, value = line.split(":", 1)
+                    cli_data[key.strip()] = value.strip()
+
+        if Comparator.results is not None and isinstance(gnmi_data, dict):
+            return Comparator.results.compare(None, gnmi_data, cli_data)[0]
+        return Comparator.compare_trees(gnmi_data, cli_data)
+
+Comparator.units = UnitConverter()
+
+'''
+ --> Declare the ListComparator class which compares tables (lists of rows, like the OSPF adjacencies or a BGP RIB) row by row.
+     Rows are matched by a key: the fields set for the table in `keys` (e.g. {"adjacencies": "neighbor_id"}), else the first field
+     of KEY_CANDIDATES found in the first row of both sides, else the position of the row. Matched rows are compared with
+     compare_nested and the differences are named like gNMI paths, e.g. "adjacencies[neighborid=1.1.1.1]/state".
+        - Up to `spill_rows` rows (both sides together) the tables are joined in memory: the CLI rows are put in a dictionary by
+          key (hash join) and every gNMI row looks its partner up there. The differences follow the order of the gNMI rows.
+        - Larger tables (or rows given as iterators) are joined by a sorted merge: each side is sorted in runs of `run_rows` rows
+          written to temporary files, the runs are merged back and both sorted streams are walked side by side, so only one run
+          is held in memory. The differences follow the order of the keys.
+     Lists which are not lists of rows (e.g. a list of strings) are compared as one value, like any other leaf.
+'''
+class ListComparator:
+
+    KEY_CANDIDATES = ("name", "id", "neighborid", "neighboraddress", "prefix", "address", "index")
+    BLOCK_ROWS = 1024
+
+    def __init__(self, keys=None, spill_rows=200000, run_rows=50000, spill_dir=None):
+        self.keys = {}
+        self.default_keys = {}  # The keys declared by the CLI templates (Key values), used when no key is set
+        for field, key_fields in (keys or {}).items():
+            self.set_key(field, key_fields)
+        self.spill_rows = spill_rows
+        self.run_rows = run_rows
+        self.spill_dir = spill_dir
+        self.spills = 0
+
+    '''
+    The settings of the comparator (table keys and spill settings) as plain data, sent to the worker processes which rebuild it
+    with from_settings (the worker processes do not inherit Comparator.lists under the spawn and forkserver start methods).
+    '''
+    def settings(self):
+        return {"keys": dict(self.keys), "spill_rows": self.spill_rows, "run_rows": self.run_rows, "spill_dir": self.spill_dir}
+
+    @staticmethod
+    def from_settings(settings):
+        return ListComparator(settings["keys"], settings["spill_rows"], settings["run_rows"], settings["spill_dir"])
+
+    '''
+    This method sets the key of a table: one field name, a comma separated list of field names or a list of field names.
+    '''
+    def set_key(self, field, key_fields):
+        if isinstance(key_fields, str):
+            key_fields = key_fields.split(",")
+        self.keys[Comparator.normalize_key(field)] = tuple(Comparator.normalize_key(key.strip()) for key in key_fields)
+
+    def set_default_key(self, field, key_fields):
+        field = Comparator.normalize_key(field)
+        if field not in self.default_keys:
+            self.default_keys[field] = tuple(Comparator.normalize_key(key) for key in key_fields)
+
+    '''
+    This method returns the (normalized) key fields of a table, or None when the rows are matched by position.
+    '''
+    def choose_key(self, field, gnmi_row, cli_row):
+        field = Comparator.normalize_key(field)
+        key_fields = self.keys.get(field, self.default_keys.get(field))
+        if key_fields is not None:
+            return key_fields
+        if not (isinstance(gnmi_row, dict) and isinstance(cli_row, dict)):
+            return None
+        gnmi_fields = {Comparator.normalize_key(key) for key in gnmi_row}
+        cli_fields = {Comparator.normalize_key(key) for key in cli_row}
+        for candidate in ListComparator.KEY_CANDIDATES:
+            if candidate in gnmi_fields and candidate in cli_fields:
+                return (candidate,)
+        return None
+
+    '''
+    This method yields (match key, label, row) for every row of one side: the match key is built from the normalized key values
+    (so "1K" and 1000 match), the label is the position of the row or its key values as they are written in the row.
+    The rows of a table usually spell their fields the same way, so the raw names of the key fields are looked up once and only
+    looked up again when a row spells them differently. The key values are normalized BLOCK_ROWS rows at a time (one column).
+    '''
+    @staticmethod
+    def keyed_rows(rows, key_fields):
+        if key_fields is None:
+            for index, row in enumerate(rows):
+                yield index, index, row
+            return
+        raw_keys = None
+        rows = iter(rows)
+        while True:
+            block = list(itertools.islice(rows, ListComparator.BLOCK_ROWS))
+            if not block:
+                return
+            labels = []
+            for row in block:
+                if raw_keys is None or any(key not in row for key in raw_keys):
+                    raw_names = {Comparator.normalize_key(key): key for key in row}
+                    raw_keys = [raw_names.get(key) for key in key_fields]
+                labels.append([row.get(key) for key in raw_keys])
+            matches = iter(Comparator.normalize_values([value for values in labels for value in values]))
+            for values, row in zip(labels, block):
+                yield repr(tuple(next(matches) for _ in values)), values, row
+
+    '''
+    This method returns the name of a row in the differences: "field[index]" or "field[key=value]..." (like a gNMI path).
+    '''
+    @staticmethod
+    def row_name(field, key_fields, label):
+        if key_fields is None:
+            return "{}[{}]".format(field, label)
+        return field + "".join("[{}={}]".format(key, value) for key, value in zip(key_fields, label))
+
+    '''
+    This method compares two tables and returns the differences (same format as compare_nested).
+    The rows are compared in blocks which hold thousands of small containers for a moment (see diff_rows): garbage collection is
+    paused during the join, otherwise every block would trigger collection passes over the whole table which find nothing to collect.
+    '''
+    def diff(self, field, gnmi_rows, cli_rows):
+        if isinstance(gnmi_rows, list) and isinstance(cli_rows, list):
+            if not all(isinstance(row, dict) for row in gnmi_rows) or not all(isinstance(row, dict) for row in cli_rows):
+                return ListComparator.diff_value(field, gnmi_rows, cli_rows)
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            if isinstance(gnmi_rows, list) and isinstance(cli_rows, list) and len(gnmi_rows) + len(cli_rows) <= self.spill_rows:
+                return self.hash_join(field, gnmi_rows, cli_rows)
+            return self.merge_join(field, gnmi_rows, cli_rows)
+        finally:
+            if collecting:
+                gc.enable()
+
+    @staticmethod
+    def diff_value(field, gnmi_value, cli_value):
+        gnmi_value, = Comparator.normalize_values([gnmi_value])
+        cli_value, = Comparator.normalize_values([cli_value])
+        if gnmi_value == cli_value:
+            return {}
+        return {field: Comparator.different_values(field, gnmi_value, cli_value)}
+
+    '''
+    This method adds the differences of a block of (label, gnmi row, cli row) pairs to `differences` (either row can be None when
+    it has no partner). The matched rows of the block are compared together (see Comparator.compare_many).
+    '''
+    @staticmethod
+    def diff_rows(differences, field, key_fields, block):
+        # Most rows of a table are equal as they are, only the others need to be normalized
+        matched = [(gnmi_row, cli_row) for _, gnmi_row, cli_row in block
+                   if gnmi_row is not None and cli_row is not None and gnmi_row != cli_row]
+        row_differences = iter(Comparator.compare_many(matched))
+        for label, gnmi_row, cli_row in block:
+            if gnmi_row == cli_row:
+                continue
+            name = ListComparator.row_name(field, key_fields, label)
+            if cli_row is None:
+                differences[name] = Comparator.missing_in_cli(name, gnmi_row)
+            elif gnmi_row is None:
+                differences[name] = Comparator.missing_in_gnmi(name, cli_row)
+            else:
+                for key, difference in next(row_differences).items():
+                    difference["explaine"] = name + "/" + difference["explaine"]
+                    differences[name + "/" + key] = difference
+
+    '''
+    This method joins two tables held in memory: O(n + m) time, the CLI rows are indexed by key (with duplicate keys the last row
+    wins, like duplicate keys of a dictionary).
+    '''
+    def hash_join(self, field, gnmi_rows, cli_rows):
+        key_fields = self.choose_key(field, gnmi_rows[0] if gnmi_rows else None, cli_rows[0] if cli_rows else None)
+        cli_index = {match: (label, row) for match, label, row in self.keyed_rows(cli_rows, key_fields)}
+
+        differences = {}
+        block = []
+        for match, label, gnmi_row in self.keyed_rows(gnmi_rows, key_fields):
+            partner = cli_index.pop(match, None)
+            block.append((label, gnmi_row, None if partner is None else partner[1]))
+            if len(block) >= ListComparator.BLOCK_ROWS:
+                ListComparator.diff_rows(differences, field, key_fields, block)
+                block = []
+        block.extend((label, None, cli_row) for label, cli_row in cli_index.values())
+        ListComparator.diff_rows(differences, field, key_fields, block)
+        return differences
+
+    '''
+    This method joins two tables of any size (lists or iterators of rows) by a sorted merge, spilling sorted runs to disk.
+    '''
+    def merge_join(self, field, gnmi_rows, cli_rows):
+        gnmi_rows, cli_rows = iter(gnmi_rows), iter(cli_rows)
+        gnmi_first, cli_first = next(gnmi_rows, None), next(cli_rows, None)
+        key_fields = self.choose_key(field, gnmi_first, cli_first)
+        if gnmi_first is not None:
+            gnmi_rows = itertools.chain([gnmi_first], gnmi_rows)
+        if cli_first is not None:
+            cli_rows = itertools.chain([cli_first], cli_rows)
+        self.spills += 1
+        METRICS.count("table_spills")
+
+        differences = {}
+        with tempfile.TemporaryDirectory(prefix="gnmi-cli-", dir=self.spill_dir) as directory:
+            gnmi_sorted = self.sorted_rows(self.keyed_rows(gnmi_rows, key_fields), os.path.join(directory, "gnmi"))
+            cli_sorted = self.sorted_rows(self.keyed_rows(cli_rows, key_fields), os.path.join(directory, "cli"))
+            gnmi_entry, cli_entry = next(gnmi_sorted, None), next(cli_sorted, None)
+            block = []
+            while gnmi_entry is not None or cli_entry is not None:
+                if cli_entry is None or (gnmi_entry is not None and gnmi_entry[0] < cli_entry[0]):
+                    block.append((gnmi_entry[1], gnmi_entry[2], None))
+                    gnmi_entry = next(gnmi_sorted, None)
+                elif gnmi_entry is None or cli_entry[0] < gnmi_entry[0]:
+                    block.append((cli_entry[1], None, cli_entry[2]))
+                    cli_entry = next(cli_sorted, None)
+                else:
+                    block.append((gnmi_entry[1], gnmi_entry[2], cli_entry[2]))
+                    gnmi_entry, cli_entry = next(gnmi_sorted, None), next(cli_sorted, None)
+                if len(block) >= ListComparator.BLOCK_ROWS:
+                    ListComparator.diff_rows(differences, field, key_fields, block)
+                    block = []
+            ListComparator.diff_rows(differences, field, key_fields, block)
+        return differences
+
+    '''
+    This method sorts (match key, label, row) entries by match key with at most `run_rows` entries in memory: every full run is
+    sorted and pickled to "<prefix>.<n>" in blocks of BLOCK_ROWS entries, then the runs are merged (heapq.merge holds one block of
+    each run at a time).
+    '''
+    def sorted_rows(self, entries, prefix):
+        run_files = []
+        run = []
+        for entry in entries:
+            run.append(entry)
+            if len(run) >= self.run_rows:
+                run_files.append(self.write_run(run, "{}.{}".format(prefix, len(run_files))))
+                run = []
+        if not run_files:
+            run.sort(key=lambda entry: entry[0])
+            return iter(run)
+        if run:
+            run_files.append(self.write_run(run, "{}.{}".format(prefix, len(run_files))))
+        return heapq.merge(*(self.read_run(run_file) for run_file in run_files), key=lambda entry: entry[0])
+
+    @staticmethod
+    def write_run(run, run_file):
+        run.sort(key=lambda entry: entry[0])
+        with open(run_file, "wb") as file:
+            for start in range(0, len(run), ListComparator.BLOCK_ROWS):
+                pickle.dump(run[start:start + ListComparator.BLOCK_ROWS], file, pickle.HIGHEST_PROTOCOL)
+        return run_file
+
+    @staticmethod
+    def read_run(run_file):
+        with open(run_file, "rb") as file:
+            while True:
+                try:
+                    block = pickle.load(file)
+                except EOFError:
+                    return
+                yield from block
+
+Comparator.lists = ListComparator()
+
+'''
+ --> Declare the ComparisonPlan class which holds everything compare_nested works out from the keys of one level of a gNMI path:
+        - the key alignment (see Comparator.align): the normalized key of every gNMI key and the CLI key it is compared with,
+          which keys are leaves (compared by value), tables (compared row by row) and nested levels (with their own child plan),
+          and the CLI keys missing in gNMI,
+        - the unit rules (the UnitConverter in use) and precision rules (Comparator.adjust_precision) applied to the leaves.
+     A plan is valid as long as the keys (in order) and the unit rules do not change, then executing it produces exactly the same
+     differences as compare_nested without normalizing any key again.
+'''
+class ComparisonPlan:
+
+    class Stale(Exception):
+        """Raised when the data no longer has the shape the plan was compiled for."""
+
+    def __init__(self, gnmi_data, cli_data):
+        self.gnmi_keys = tuple(gnmi_data)
+        self.cli_keys = tuple(cli_data)
+        self.units = Comparator.units
+        self.entries, self.extras = Comparator.align(gnmi_data, cli_data)
+        self.leaves = [(gnmi_key, cli_key) for _, gnmi_key, cli_key, kind in self.entries if kind == Comparator.LEAF]
+        self.children = {}
+
+    '''
+    This method checks if the plan can be used for the given data (same keys in the same order and same unit rules).
+    '''
+    def matches(self, gnmi_data, cli_data):
+        return (self.units is Comparator.units and len(gnmi_data) == len(self.gnmi_keys) and len(cli_data) == len(self.cli_keys)
+                and tuple(gnmi_data) == self.gnmi_keys and tuple(cli_data) == self.cli_keys)
+
+    '''
+    This method compares the data with the plan and returns the differences (same format as compare_nested).
+    It raises ComparisonPlan.Stale if a value changed between a nested level, a table and a leaf since the plan was compiled.
+    '''
+    def execute(self, gnmi_data, cli_data):
+        for _, gnmi_key, cli_key, kind in self.entries:
+            if kind != Comparator.MISSING and Comparator.kind(gnmi_data[gnmi_key], cli_data[cli_key]) != kind:
+                raise ComparisonPlan.Stale()
+        gnmi_values = [Comparator.adjust_precision(value) for value in self.units.convert_many(
+            [gnmi_data[gnmi_key] for gnmi_key, _ in self.leaves])]
+        cli_values = [Comparator.adjust_precision(value) for value in self.units.convert_many(
+            [cli_data[cli_key] for _, cli_key in self.leaves])]
+        return Comparator.level_differences(gnmi_data, cli_data, self.entries, self.extras, zip(gnmi_values, cli_values),
+                                            lambda key, gnmi_key, cli_key: self.execute_child(key, gnmi_data[gnmi_key], cli_data[cli_key]))
+
+    def execute_child(self, key, gnmi_data, cli_data):
+        child = self.children.get(key)
+        if child is None or not child.matches(gnmi_data, cli_data):
+            child = self.children[key] = ComparisonPlan(gnmi_data, cli_data)
+        return child.execute(gnmi_data, cli_data)
+
+'''
+ --> Declare the ComparisonPlanCache class which keeps the compiled ComparisonPlan of the most recently compared gNMI paths.
+     When more than `maxsize` paths are cached the least recently used plan is dropped.
+'''
+class ComparisonPlanCache:
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.plans = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    '''
+    This method returns the plan of a gNMI path, compiling a new one when none is cached or the cached one no longer matches.
+    '''
+    def get(self, gnmi_path, gnmi_data, cli_data):
+        plan = self.plans.get(gnmi_path)
+        if plan is not None and plan.matches(gnmi_data, cli_data):
+            self.hits += 1
+            self.plans.move_to_end(gnmi_path)
+            return plan
+
+        self.misses += 1
+        plan = self.plans[gnmi_path] = ComparisonPlan(gnmi_data, cli_data)
+        self.plans.move_to_end(gnmi_path)
+        while len(self.plans) > self.maxsize:
+            self.plans.popitem(last=False)
+        return plan
+
+    '''
+    This method compares the data of a gNMI path with its plan, the plan is compiled again if the data changed shape.
+    '''
+    def compare(self, gnmi_path, gnmi_data, cli_data):
+        try:
+            return self.get(gnmi_path, gnmi_data, cli_data).execute(gnmi_data, cli_data)
+        except ComparisonPlan.Stale:
+            self.plans.pop(gnmi_path, None)
+            return self.get(gnmi_path, gnmi_data, cli_data).execute(gnmi_data, cli_data)
+
+    def clear(self):
+        self.plans.clear()
+
+Comparator.plans = ComparisonPlanCache()
+
+'''
+ --> Declare the ComparisonCache class which remembers the differences and the report of every (gNMI data, CLI output) pair it has
+     compared, so a pair seen again (the same interface on another device, a state that did not change between two polls) is
+     answered without comparing anything:
+        - The key is a BLAKE2 hash of both inputs (their repr(), which tells 1, 1.0 and '1' apart and keeps the key order the
+          differences follow) and of the comparator settings (unit mode, table keys), the gNMI path is not part of the key.
+        - The most recently used `maxsize` results are kept in memory, with a `directory` they are also pickled to disk
+          ('<directory>/<2 hex>/<hash>.pickle', written to a temporary file first) and shared by processes and later runs.
+     The cached differences are shared, callers must not modify them.
+'''
+class ComparisonCache:
+
+    VERSION = 1
+    COUNTERS = ("hits", "disk_hits", "misses")
+
+    def __init__(self, maxsize=4096, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = collections.OrderedDict()  # key -> (differences, report)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def settings():
+        return repr((ComparisonCache.VERSION, Comparator.units.mode, sorted(Comparator.lists.keys.items()),
+                     sorted(Comparator.lists.default_keys.items()), ListComparator.KEY_CANDIDATES))
+
+    def key(self, gnmi_data, cli_data):
+        digest = hashlib.blake2b(self.settings().encode(), digest_size=16)
+        digest.update(b"\0" + repr(gnmi_data).encode() + b"\0" + repr(cli_data).encode())
+        return digest.hexdigest()
+
+    '''
+    This method returns (differences, report) for a pair of dictionaries, from the cache or by comparing them (with `comparator`,
+    e.g. an IncrementalComparator, or else with the plan of the gNMI path when one is given, see Comparator.compare_path) and
+    rendering the report.
+    '''
+    def compare(self, gnmi_path, gnmi_data, cli_data, comparator=None):
+        key = self.key(gnmi_data, cli_data)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            METRICS.count("result_cache", outcome="hit")
+            self.entries.move_to_end(key)
+            return entry
+
+        entry = self.read(key) if self.directory else None
+        if entry is not None:
+            self.disk_hits += 1
+            METRICS.count("result_cache", outcome="disk_hit")
+        else:
+            self.misses += 1
+            METRICS.count("result_cache", outcome="miss")
+            if comparator is not None:
+                differences = comparator.compare_path(gnmi_path, gnmi_data, cli_data)
+            else:
+                with METRICS.stage("compare", gnmi_path):
+                    if gnmi_path is None:
+                        differences = Comparator.compare_nested(gnmi_data, cli_data)
+                    else:
+                        differences = Comparator.plans.compare(gnmi_path, gnmi_data, cli_data)
+            with METRICS.stage("report", gnmi_path):
+                entry = (differences, ReportGenerator.generate_report(differences))
+            if self.directory:
+                self.write(key, entry)
+
+        self.entries[key] = entry
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return entry
+
+    def entry_file(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pickle")
+
+    def read(self, key):
+        try:
+            with open(self.entry_file(key), "rb") as file:
+                return pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+
+    def write(self, key, entry):
+        entry_file = self.entry_file(key)
+        temporary = "{}.{}.tmp".format(entry_file, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(entry_file), exist_ok=True)
+            with open(temporary, "wb") as file:
+                pickle.dump(entry, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, entry_file)
+        except (OSError, pickle.PicklingError, TypeError):
+            pass  # The disk tier is only an optimization
+
+    def clear(self):
+        self.entries.clear()
+
+    def counters(self):
+        return {name: getattr(self, name) for name in ComparisonCache.COUNTERS}
+
+    '''
+    This method adds the counters of another cache (e.g. of a worker process, see BatchRunner.run) to the statistics.
+    '''
+    def merge(self, counters):
+        for name, value in counters.items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "size": len(self.entries),
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0}
+
+'''
+ --> Declare the IncrementalComparator class which re-verifies gNMI paths polled again and again at a cost that follows what changed.
+     Every nested level of both sides gets a content hash built from the hashes of the levels below it (a Merkle tree). For every
+     gNMI path the hashes and the differences of each level are kept from the previous run: a level whose gNMI and CLI hashes did
+     not change reuses its previous differences without being compared, only the changed levels are compared again.
+     The state can be saved to a JSON file and loaded by the next run. The differences are the same as compare_nested.
+     The state of a gNMI path is only reused with the comparison settings it was built with (unit rules and table keys, see
+     ComparisonCache.settings): the table keys of the CLI templates are only known once their command output was read.
+'''
+class IncrementalComparator:
+
+    STATE_VERSION = 2
+
+    def __init__(self, state_file=None):
+        self.state_file = state_file
+        self.states = {}  # gnmi path -> state of its top level
+        self.reused = 0
+        self.compared = 0
+        if state_file:
+            self.load()
+
+    '''
+    This method loads the state saved by a previous run, it is ignored if it was saved by another version.
+    '''
+    def load(self):
+        try:
+            with open(self.state_file, "r") as file:
+                saved = json.load(file)
+            if saved.get("version") == IncrementalComparator.STATE_VERSION:
+                self.states = saved["paths"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            self.states = {}
+
+    '''
+    This method saves the state (written to a temporary file first, so a crash never leaves a truncated state, which is removed
+    when the write fails).
+    '''
+    def save(self):
+        temporary = self.state_file + ".tmp"
+        try:
+            with open(temporary, "w") as file:
+                json.dump({"version": IncrementalComparator.STATE_VERSION, "paths": self.states}, file)
+            os.replace(temporary, self.state_file)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    '''
+    This method returns the hash tree of a dictionary: (hash, {key: hash tree of the nested dictionary}).
+    The hash of a level covers its keys (in order), its leaf values and the hashes of its nested levels. repr() tells 1, 1.0 and
+    '1' apart, so a level without nested levels is hashed from its repr() in one call.
+    '''
+    @staticmethod
+    def hash_tree(data):
+        children = {}
+        for key, value in data.items():
+            if isinstance(value, dict):
+                children[key] = IncrementalComparator.hash_tree(value)
+        if children:
+            data = [(key, children[key][0]) if key in children else (key, value) for key, value in data.items()]
+        return hashlib.blake2b(repr(data).encode(), digest_size=16).hexdigest(), children
+
+    '''
+    This method compares the gNMI data and CLI output of a gNMI path, reusing the previous differences of the unchanged levels.
+    '''
+    def compare_path(self, gnmi_path, gnmi_data, cli_data):
+        if not (isinstance(gnmi_data, dict) and isinstance(cli_data, dict)):
+            return {"Error": "Invalid input formats; expected dictionaries."}
+        settings = hashlib.blake2b(ComparisonCache.settings().encode(), digest_size=16).hexdigest()
+        previous = self.states.get(gnmi_path)
+        if previous is not None and previous.get("settings") != settings:
+            previous = None  # Compared with other unit rules or table keys, the differences may not hold any more
+        with METRICS.stage("compare", gnmi_path):
+            state = self._compare_level(gnmi_data, cli_data, self.hash_tree(gnmi_data), self.hash_tree(cli_data), previous)
+        state["settings"] = settings
+        self.states[gnmi_path] = state
+        return dict(state["differences"])
+
+    def _compare_level(self, gnmi_data, cli_data, gnmi_hash, cli_hash, previous):
+        (gnmi_digest, gnmi_children), (cli_digest, cli_children) = gnmi_hash, cli_hash
+        if previous is not None and previous["gnmi"] == gnmi_digest and previous["cli"] == cli_digest:
+            self.reused += 1
+            return previous
+        self.compared += 1
+        previous_children = previous["children"] if previous is not None else {}
+
+        entries, extras = Comparator.align(gnmi_data, cli_data)
+        leaves = [(gnmi_data[gnmi_key], cli_data[cli_key]) for _, gnmi_key, cli_key, kind in entries if kind == Comparator.LEAF]
+        leaves = zip(Comparator.normalize_values([gnmi_value for gnmi_value, _ in leaves]),
+                     Comparator.normalize_values([cli_value for _, cli_value in leaves]))
+
+        children = {}
+
+        def nested(key, gnmi_key, cli_key):
+            child = children[key] = self._compare_level(gnmi_data[gnmi_key], cli_data[cli_key], gnmi_children[gnmi_key],
+                                                        cli_children[cli_key], previous_children.get(key))
+            return child["differences"]
+
+        # Tables are part of the hash of their level, they are compared again whenever the level changed
+        differences = Comparator.level_differences(gnmi_data, cli_data, entries, extras, leaves, nested)
+        return {"gnmi": gnmi_digest, "cli": cli_digest, "differences": differences, "children": children}
+
+########################################################################################################################################
+#                                                              Make the Report                                                         #
+########################################################################################################################################
+
+'''
+ --> Declare the ReportRenderer class which writes the differences of gNMI paths to a stream, one piece at a time, so a report of
+     thousands of differences is never built as one string:
+        - format: 'text' (the ReportGenerator layout), 'csv' (one row per difference) or 'json' (one JSON line per gNMI path),
+        - limit: at most this many differences of a gNMI path are written (0 = all), the others are only counted,
+        - top / prefix_depth: size of the summary sections and number of gNMI path elements used to group the differences.
+     Unless `summarize` is False, every difference written or skipped is added to the summary (write_summary): counts by mismatch type and by path prefix
+     (keys removed, e.g. '/interfaces/interface') and the `top` largest numeric deltas.
+'''
+class ReportRenderer:
 
-                elif file_format == "json":
-                    with open(f"{file_name}.json", "w") as jsonfile:
-                        json.dump(output_history, jsonfile, indent=4)
-                    print(f"History saved as {file_name}.json")
-                    break
+    FORMATS = ("text", "csv", "json")
+    CSV_HEADER = ["Path", "Status", "Field", "GNMI", "CLI", "Explanation"]
 
-                else:
-                    print("Invalid file format. Please choose txt, csv, or json.")
+    def __init__(self, stream=None, format="text", limit=0, top=10, prefix_depth=2, summarize=True):
+        if format not in ReportRenderer.FORMATS:
+            raise ValueError(f"Unknown report format '{format}', expected one of {', '.join(ReportRenderer.FORMATS)}.")
+        self.stream = stream if stream is not None else sys.stdout
+        self.format = format
+        self.limit = limit
+        self.top = top
+        self.prefix_depth = prefix_depth
+        self.summarize = summarize
+        self.writer = csv.writer(self.stream) if format == "csv" else None
+        self._header = False
+        self.types = collections.Counter()
+        self.prefixes = collections.Counter()
+        self.paths = 0
+        self.total = 0
+        self.omitted = 0
+        self._deltas = []  # min-heap of (delta, sequence, entry)
+        self._sequence = 0
 
-            elif save_option == "n":
-                print("Exiting without saving history.")
-                break
+    '''
+    This method returns the mismatch type of a difference.
+    '''
+    @staticmethod
+    def mismatch_type(difference):
+        if difference["CLI"] is None:
+            return "missing in CLI"
+        if difference["GNMI"] is None:
+            return "missing in gNMI"
+        return "different value"
+
+    '''
+    This method returns the absolute numeric delta of a difference, or None when one of its values is not a number.
+    '''
+    @staticmethod
+    def numeric_delta(difference):
+        gnmi_value, cli_value = difference["GNMI"], difference["CLI"]
+        if isinstance(gnmi_value, (int, float)) and isinstance(cli_value, (int, float)) \
+                and not isinstance(gnmi_value, bool) and not isinstance(cli_value, bool):
+            return abs(cli_value - gnmi_value)
+        return None
+
+    def prefix(self, gnmi_path, field):
+        if gnmi_path is None:
+            return field.split("[", 1)[0].split("/", 1)[0]
+        try:
+            elements = PathTrie.parse_path(gnmi_path)
+        except ValueError:
+            return gnmi_path
+        return "/" + "/".join(name for name, _ in elements[:self.prefix_depth])
+
+    def count(self, gnmi_path, field, difference):
+        self.total += 1
+        self.types[ReportRenderer.mismatch_type(difference)] += 1
+        self.prefixes[self.prefix(gnmi_path, field)] += 1
+        delta = ReportRenderer.numeric_delta(difference)
+        if delta is not None and self.top > 0:
+            self._sequence -= 1  # Equal deltas keep the order in which they were found
+            entry = (delta, self._sequence, (gnmi_path, field, difference["GNMI"], difference["CLI"]))
+            if len(self._deltas) < self.top:
+                heapq.heappush(self._deltas, entry)
+            elif entry > self._deltas[0]:
+                heapq.heapreplace(self._deltas, entry)
+
+    def write_row(self, row):
+        if not self._header:
+            self.writer.writerow(ReportRenderer.CSV_HEADER)
+            self._header = True
+        self.writer.writerow(row)
+
+    '''
+    This method writes the differences of one gNMI path (without a trailing newline in the text format). Every CSV row and JSON
+    line carries the status of the path ("match" or "mismatch" from the differences unless given), a path without differences
+    is one CSV row with an empty field.
+    '''
+    def write(self, differences, gnmi_path=None, status=None):
+        self.paths += 1
+        status = status or ("mismatch" if differences else "match")
+        if self.format == "json":
+            self.stream.write('{"path": ' + json.dumps(gnmi_path) + ', "status": ' + json.dumps(status) + ', "differences": [')
+        elif self.format == "csv" and not differences:
+            self.write_row([gnmi_path or "", status, "", "", "", ""])
+        shown = 0
+        for field, difference in differences.items():
+            if self.summarize:
+                self.count(gnmi_path, field, difference)
+            if self.limit and shown >= self.limit:
+                continue
+            if self.format == "text":
+                self.stream.write("\nField: {}\n GNMI: {}\n CLI: {}\nExplaine the difference: {}".format(
+                    field, difference["GNMI"], difference["CLI"], difference["explaine"]))
+            elif self.format == "csv":
+                self.write_row([gnmi_path or "", status, field, difference["GNMI"], difference["CLI"], difference["explaine"]])
+            else:
+                self.stream.write((", " if shown else "") + json.dumps(dict(difference, field=field), default=str))
+            shown += 1
+        omitted = len(differences) - shown
+        self.omitted += omitted
+        if self.format == "json":
+            self.stream.write('], "omitted": {}}}\n'.format(omitted))
+        elif omitted and self.format == "text":
+            self.stream.write("\n... {} more differences not shown".format(omitted))
+        return shown
+
+    '''
+    This method writes one result of verify_path: a status line and the differences (or the error) in the text format, the rows
+    of the differences in the CSV format (a single row for a match or an error) and one JSON line in the JSON format.
+    '''
+    def write_result(self, result):
+        differences = result.get("differences") or {}
+        if self.format == "text":
+            self.stream.write("{} {}\n".format("[{}]".format(result["status"].upper()).ljust(10), result["path"]))
+            if result["status"] == "mismatch":
+                self.write(differences, result["path"])
+                self.stream.write("\n")
+            elif result["status"] != "match":
+                self.stream.write(result["report"] + "\n")
+        elif self.format == "csv":
+            if result["status"] == "error":
+                self.write_row([result["path"], "error", "", "", "", result["report"]])
+            else:
+                self.write(differences, result["path"], result["status"])
+        elif result["status"] == "error":
+            self.stream.write(json.dumps({"path": result["path"], "status": "error", "error": result["report"]}) + "\n")
+        else:
+            self.write(differences, result["path"], result["status"])
+
+    def largest_deltas(self):
+        return [{"path": path, "field": field, "GNMI": gnmi_value, "CLI": cli_value, "delta": delta}
+                for delta, _, (path, field, gnmi_value, cli_value) in sorted(self._deltas, reverse=True)]
+
+    def summary(self):
+        return {"paths": self.paths, "differences": self.total, "omitted": self.omitted, "types": dict(self.types),
+                "prefixes": dict(self.prefixes.most_common(self.top)), "largest_deltas": self.largest_deltas()}
+
+    '''
+    This method writes the summary of everything written so far.
+    '''
+    def write_summary(self):
+        if self.format == "json":
+            self.stream.write(json.dumps({"summary": self.summary()}, default=str) + "\n")
+        elif self.format == "csv":
+            for mismatch_type, count in self.types.most_common():
+                self.write_row(["", "summary", "type: " + mismatch_type, count, "", ""])
+            for prefix, count in self.prefixes.most_common(self.top):
+                self.write_row([prefix, "summary", "prefix", count, "", ""])
+            for entry in self.largest_deltas():
+                self.write_row([entry["path"] or "", "summary", "delta: " + entry["field"], entry["GNMI"], entry["CLI"], entry["delta"]])
+        else:
+            self.stream.write("\n - Summary: {} differences in {} paths ({} not shown)\n".format(self.total, self.paths, self.omitted))
+            self.stream.write(" - By mismatch type:\n")
+            self.stream.writelines("     {:>8}  {}\n".format(count, name) for name, count in self.types.most_common())
+            self.stream.write(" - By path prefix:\n")
+            self.stream.writelines("     {:>8}  {}\n".format(count, name) for name, count in self.prefixes.most_common(self.top))
+            if self._deltas:
+                self.stream.write(" - Largest numeric deltas:\n")
+                self.stream.writelines("     {:>14}  {} {}: GNMI {} / CLI {}\n".format(
+                    entry["delta"], entry["path"] or "", entry["field"], entry["GNMI"], entry["CLI"])
+                    for entry in self.largest_deltas())
+
+    '''
+    This method returns the differences of one gNMI path rendered as a string.
+    '''
+    @staticmethod
+    def render(differences, format="text", limit=0, gnmi_path=None):
+        stream = io.StringIO()
+        ReportRenderer(stream, format, limit, summarize=False).write(differences, gnmi_path)
+        return stream.getvalue()
+
+'''
+ --> Declare a class to generate the output report
+'''
+class ReportGenerator:
+    @staticmethod
+    def generate_report(differences):
+        """Generate a discrepancy report in the specified format."""
+        if not differences:
+            return "No discrepancies found, all values match."
+        return ReportRenderer.render(differences)
+            
+    '''
+    Ask the user if they want to save the test history and in which format, and return an open HistorySink (or None).
+    Every result is then appended to the file as soon as it is produced (see HistorySink).
+    '''
+    @staticmethod
+    def open_history():
+        while True:
+            save_option = input("Do you want to save your test history? [y/n]: ")
+            if save_option.lower() == "y":
+                file_format = input("Choose a file format to save (txt/csv/jsonl): ").lower()
+                if file_format == "json":
+                    file_format = "jsonl"
+                if file_format not in HistorySink.FORMATS:
+                    print("Invalid file format. Please choose txt, csv, or jsonl.")
+                    continue
+                file_name = input("Enter the file name (without extension): ")
+                sink = HistorySink(f"{file_name}.{file_format}")
+                print(f"History will be saved as {sink.path}")
+                return sink
+            elif save_option.lower() == "n":
+                print("Test history will not be saved.")
+                return None
             else:
                 print("Invalid input. Please enter 'y' or 'n'.")
 
+    @staticmethod
+    def save_history(output_history):
+        """Ask user if they want to save the history and in which format."""
+        sink = ReportGenerator.open_history()
+        if sink is not None:
+            with sink:
+                for entry in output_history:
+                    for path, report in entry.items():
+                        sink.write(path, report)
+            print(f"History saved as {sink.path}")
+
+'''
+ --> Declare the HistorySink class which appends every comparison result to the history file as soon as it is produced, instead of
+     keeping the whole history in memory until the end of the session (a crash only loses the results still in the write buffer).
+        - Formats (from the file extension): "jsonl" (one JSON object per line), "csv" (Path, Comparison Report) or "txt" (one
+          indented JSON object per result, like the original history files).
+        - Writes are buffered, the file is flushed and fsync'ed every `fsync_every` results or `fsync_interval` seconds.
+        - When `rotate_bytes` is set, a file that grows past it is closed and compressed to '<file>.<n>.gz' and a new file is started.
+     HistorySink.iter_records reads a history file (plain or compressed) back one result at a time, in constant memory.
+'''
+class HistorySink:
+
+    FORMATS = ("jsonl", "csv", "txt")
+    CSV_HEADER = ["Path", "Comparison Report"]
+
+    def __init__(self, path, buffer_size=64 * 1024, fsync_every=100, fsync_interval=5.0, rotate_bytes=None):
+        self.path = path
+        self.format = HistorySink.detect_format(path)
+        self.buffer_size = buffer_size
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.rotate_bytes = rotate_bytes
+        self.records = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._open()
+
+    '''
+    This method returns the history format of a file name ('history.csv', 'history.jsonl.3.gz' ...).
+    '''
+    @staticmethod
+    def detect_format(path):
+        for part in reversed(os.path.basename(path).split(".")[1:]):
+            if part.lower() in HistorySink.FORMATS:
+                return part.lower()
+            if part.lower() == "json":
+                return "jsonl"
+        raise ValueError(f"Unknown history format for '{path}', expected a .txt, .csv or .jsonl file.")
+
+    def _open(self):
+        self.file = open(self.path, "a", newline="" if self.format == "csv" else None, buffering=self.buffer_size)
+        if self.format == "csv":
+            self.writer = csv.writer(self.file)
+            if self.file.tell() == 0:
+                self.writer.writerow(HistorySink.CSV_HEADER)
+
+    '''
+    This method appends the report of one gNMI path.
+    '''
+    def write(self, gnmi_path, report):
+        if self.format == "jsonl":
+            self.file.write(json.dumps({gnmi_path: report}) + "\n")
+        elif self.format == "csv":
+            self.writer.writerow([gnmi_path, report])
+        else:
+            self.file.write(json.dumps({gnmi_path: report}, indent=4) + "\n")
+        self.records += 1
+        self._unsynced += 1
+
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+        if self.rotate_bytes and self.file.tell() >= self.rotate_bytes:
+            self.rotate()
+
+    '''
+    This method writes the buffered results to the disk.
+    '''
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    '''
+    This method compresses the current file to the next free '<file>.<n>.gz' name and starts a new empty file.
+    '''
+    def rotate(self):
+        self.sync()
+        self.file.close()
+        number = 1
+        while os.path.exists(f"{self.path}.{number}.gz"):
+            number += 1
+        with open(self.path, "rb") as source, gzip.open(f"{self.path}.{number}.gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(self.path)
+        self._open()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    '''
+    This method yields the results of a history file one at a time as {gnmi_path: report} dictionaries.
+    Files ending with '.gz' are decompressed on the fly.
+    '''
+    @staticmethod
+    def iter_records(path):
+        file_format = HistorySink.detect_format(path)
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", newline="" if file_format == "csv" else None) as file:
+            if file_format == "csv":
+                reader = csv.reader(file)
+                next(reader, None)
+                for row in reader:
+                    if len(row) == 2:
+                        yield {row[0]: row[1]}
+            elif file_format == "jsonl":
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                # Every txt record is an indented JSON object, only its closing brace starts a line
+                lines = []
+                for line in file:
+                    lines.append(line)
+                    if line.startswith("}"):
+                        yield json.loads("".join(lines))
+                        lines = []
+
+'''
+ --> Declare the FleetReport class which merges the results of many devices (see FleetRunner) into one fleet-level summary:
+        - the totals of every device (matched, mismatched and error paths, or the reason the device failed),
+        - the fleet totals,
+        - the `worst` mismatching paths of the whole fleet (the most differences first) with their ReportGenerator report.
+     Only the totals and the worst paths are kept, so the summary of hundreds of devices stays small.
+'''
+class FleetReport:
+
+    def __init__(self, worst=10):
+        self.worst = worst
+        self.devices = {}  # device name -> totals
+        self._worst = []  # min-heap of (differences, sequence, entry)
+        self._sequence = 0
+
+    '''
+    This method adds the result of one device: {"device", "status" ("ok" or "failed"), "error", "seconds", "results"}.
+    '''
+    def add(self, device_result):
+        totals = {"status": device_result["status"], "error": device_result.get("error"), "seconds": device_result.get("seconds", 0.0),
+                  "match": 0, "mismatch": 0, "error_paths": 0}
+        for result in device_result.get("results") or []:
+            totals["error_paths" if result["status"] == "error" else result["status"]] += 1
+            if result["status"] == "mismatch":
+                self._sequence -= 1  # Equal counts keep the order in which they were added
+                entry = {"device": device_result["device"], "path": result["path"], "differences": len(result["differences"]),
+                         "report": result["report"]}
+                heapq.heappush(self._worst, (entry["differences"], self._sequence, entry))
+                if len(self._worst) > self.worst:
+                    heapq.heappop(self._worst)
+        self.devices[device_result["device"]] = totals
+        return totals
+
+    def worst_paths(self):
+        return [entry for _, _, entry in sorted(self._worst, reverse=True)]
+
+    def totals(self):
+        devices = self.devices.values()
+        return {"devices": len(self.devices), "failed": sum(totals["status"] == "failed" for totals in devices),
+                "match": sum(totals["match"] for totals in devices), "mismatch": sum(totals["mismatch"] for totals in devices),
+                "error_paths": sum(totals["error_paths"] for totals in devices)}
+
+    def to_dict(self):
+        return {"totals": self.totals(), "devices": self.devices, "worst_paths": self.worst_paths()}
+
+    def save(self, file_name):
+        with open(file_name, "w") as file:
+            json.dump(self.to_dict(), file, indent=4)
+
+    '''
+    This method returns the fleet summary as text: one line per device, the fleet totals and the worst mismatching paths.
+    '''
+    def format(self):
+        lines = ["\n{:<24}{:>8}{:>10}{:>12}{:>9}{:>10}".format("Device", "Status", "Matched", "Mismatched", "Errors", "Seconds")]
+        for name, totals in sorted(self.devices.items()):
+            lines.append("{:<24}{:>8}{:>10}{:>12}{:>9}{:>10.2f}".format(name, totals["status"].upper(), totals["match"],
+                                                                        totals["mismatch"], totals["error_paths"], totals["seconds"]))
+            if totals["error"]:
+                lines.append("    " + totals["error"])
+        fleet = self.totals()
+        lines.append("\n - Fleet: {} devices ({} failed), {} paths matched, {} mismatched, {} errors".format(
+            fleet["devices"], fleet["failed"], fleet["match"], fleet["mismatch"], fleet["error_paths"]))
+        worst = self.worst_paths()
+        if worst:
+            lines.append(" - Worst mismatching paths:")
+            for entry in worst:
+                lines.append("     {} differences  {}  {}".format(entry["differences"], entry["device"], entry["path"]))
+        return "\n".join(lines)
+
+########################################################################################################################################
+#                                                         Batch Verification                                                           #
+########################################################################################################################################
+
+'''
+This function runs the full verification pipeline for one gNMI path on native Python objects:
+    GNMI.fetch_tree -> CLI.execute_structured -> Comparator.compare_path -> ReportGenerator.generate_report
+It returns a plain dictionary (so it can be sent back from a worker process) with the status of the path:
+    "match", "mismatch" or "error" (unknown path or invalid data).
+'''
+def verify_path(gNMI, cli, gnmi_path, comparator=None):
+    cli_commands, cli_data = cli.execute_structured(gnmi_path)
+    return verify_outputs(gnmi_path, gNMI.fetch_tree(gnmi_path), cli_commands, cli_data, comparator)
+
+'''
+This function compares the gNMI data and the CLI outputs already fetched for a gNMI path and returns the result dictionary of
+verify_path. The comparison uses Comparator.compare_path unless another comparator (e.g. an IncrementalComparator) is given.
+'''
+def verify_outputs(gnmi_path, gnmi_data, cli_commands, cli_data, comparator=None):
+    result = {"path": gnmi_path, "status": "error", "commands": cli_commands, "differences": None, "report": None}
+
+    if gnmi_data is None and cli_data is None:
+        result["report"] = "GNMI Path '{}' not found in Both gNMI data and CLI data.".format(gnmi_path)
+    elif gnmi_data is None:
+        result["report"] = "GNMI Path '{}' not found in gNMI data.".format(gnmi_path)
+    elif cli_data is None:
+        result["report"] = "GNMI Path '{}' not found in CLI commands.".format(gnmi_path)
+    elif Comparator.results is not None and isinstance(gnmi_data, dict) and isinstance(cli_data, dict):
+        result["differences"], result["report"] = Comparator.results.compare(gnmi_path, gnmi_data, cli_data, comparator)
+        result["status"] = "mismatch" if result["differences"] else "match"
+    else:
+        comparison = (comparator or Comparator).compare_path(gnmi_path, gnmi_data, cli_data)
+        if isinstance(comparison.get("Error"), str):
+            result["report"] = comparison["Error"]
+        else:
+            result["differences"] = comparison
+            with METRICS.stage("report", gnmi_path):
+                result["report"] = ReportGenerator.generate_report(comparison)
+            result["status"] = "mismatch" if comparison else "match"
+    METRICS.count("results", status=result["status"])
+    return result
+
+'''
+Same as verify_path, with the CLI commands run concurrently by an AsyncCLIExecutor. A path whose commands timed out or failed gets
+an error result.
+'''
+async def verify_path_async(executor, gNMI, gnmi_path, comparator=None):
+    try:
+        cli_commands, cli_data = await executor.execute_structured(gnmi_path)
+    except asyncio.TimeoutError:
+        result = verify_outputs(gnmi_path, None, None, None)
+        result["report"] = "CLI commands of GNMI Path '{}' timed out.".format(gnmi_path)
+        return result
+    except Exception as error:
+        result = verify_outputs(gnmi_path, None, None, None)
+        result["report"] = "CLI commands of GNMI Path '{}' failed: {}".format(gnmi_path, error)
+        return result
+    return verify_outputs(gnmi_path, gNMI.fetch_tree(gnmi_path), cli_commands, cli_data, comparator)
+
+'''
+Each worker process keeps its own GNMI and CLI objects, they are created once by the pool initializer and reused for every path
+the worker receives.
+'''
+_worker_state = {}
+
+def _init_batch_worker(json_file, lazy=False, cache_ttl=0.0, comparator=None, metrics=False, snapshot=False, results=None,
+                       tables=None, units=None):
+    METRICS.enabled = metrics
+    if units is not None:
+        Comparator.set_unit_mode(units)
+    if tables is not None:
+        Comparator.lists = ListComparator.from_settings(tables)
+    if results is not None:
+        Comparator.results = ComparisonCache(*results)  # Worker processes share the disk tier only
+    _worker_state["gnmi"] = open_gnmi(json_file, lazy, snapshot)
+    _worker_state["cli"] = CLI(cache=CLIOutputCache(cache_ttl) if cache_ttl > 0 else None)
+    _worker_state["comparator"] = comparator
+    _worker_state["counters"] = {}
+
+'''
+This function returns the counters of the caches of a worker process which changed since the previous call, they are merged into
+the caches of the parent process by BatchRunner.run (so the statistics cover every worker).
+'''
+def _drain_cache_counters():
+    caches = {"cli": _worker_state["cli"].cache, "results": Comparator.results}
+    drained = {}
+    for name, cache in caches.items():
+        if cache is None:
+            continue
+        counters, sent = cache.counters(), _worker_state["counters"].get(name, {})
+        drained[name] = {counter: value - sent.get(counter, 0) for counter, value in counters.items()}
+        _worker_state["counters"][name] = counters
+    return drained
+
+def _verify_in_worker(gnmi_path):
+    return verify_path(_worker_state["gnmi"], _worker_state["cli"], gnmi_path, _worker_state["comparator"])
+
+def _verify_in_pool_worker(gnmi_path):
+    result = _verify_in_worker(gnmi_path)
+    if METRICS.enabled:
+        result["metrics"] = METRICS.drain()  # Merged into the metrics of the parent process by BatchRunner.run
+    counters = _drain_cache_counters()
+    if counters:
+        result["counters"] = counters
+    return result
+
+'''
+ --> Declare the BatchRunner class which verifies a list of gNMI paths without any user interaction.
+     The paths are spread across a configurable number of worker processes, the results are yielded either in the same order as
+     the input paths (ordered) or as soon as each one is ready (streaming).
+'''
+class BatchRunner:
+
+    '''
+    The constructor stores the gNMI data file and the pool settings:
+        - workers: number of worker processes (1 runs everything in the current process).
+        - ordered: keep the results in the input order, otherwise stream them as they complete.
+        - chunksize: number of paths sent to a worker at once.
+        - lazy: use the offset-indexed loader (IndexedGNMI) instead of parsing the whole gNMI data file in every worker.
+        - snapshot: load the gNMI data from its binary snapshot (SnapshotGNMI) when the data file did not change.
+        - cache_ttl: keep CLI outputs for this many seconds (CLIOutputCache, one per worker process), 0 disables the cache.
+        - incremental: state file of an IncrementalComparator, only the parts that changed since the previous run are compared
+          again. The state is shared by all the paths, so the paths are then verified in the current process.
+    The `cache` attribute holds the CLIOutputCache of the current process, or the sum of the statistics of the worker caches.
+    '''
+    def __init__(self, json_file, workers=None, ordered=True, chunksize=16, lazy=False, cache_ttl=0.0, incremental=None,
+                 snapshot=False):
+        self.json_file = json_file
+        self.lazy = lazy
+        self.snapshot = snapshot
+        self.cache_ttl = cache_ttl
+        self.cache = None
+        self.comparator = IncrementalComparator(incremental) if incremental else None
+        self.workers = 1 if incremental else (workers or multiprocessing.cpu_count())
+        self.ordered = ordered
+        self.chunksize = chunksize
+
+    '''
+    This method yields one result dictionary (see verify_path) for every gNMI path.
+    '''
+    def run(self, gnmi_paths):
+        gnmi_paths = list(gnmi_paths)
+        if self.workers <= 1 or len(gnmi_paths) <= 1:
+            _init_batch_worker(self.json_file, self.lazy, self.cache_ttl, self.comparator, METRICS.enabled, self.snapshot)
+            self.cache = _worker_state["cli"].cache
+            for gnmi_path in gnmi_paths:
+                yield _verify_in_worker(gnmi_path)
+            if self.comparator is not None:
+                self.comparator.save()
+            return
+
+        results = Comparator.results
+        self.cache = CLIOutputCache(self.cache_ttl) if self.cache_ttl > 0 else None  # Sums the statistics of the worker caches
+        initargs = (self.json_file, self.lazy, self.cache_ttl, None, METRICS.enabled, self.snapshot,
+                    (results.maxsize, results.directory) if results is not None else None, Comparator.lists.settings(),
+                    Comparator.units.mode)
+        with multiprocessing.Pool(self.workers, initializer=_init_batch_worker, initargs=initargs) as pool:
+            if self.ordered:
+                results = pool.imap(_verify_in_pool_worker, gnmi_paths, self.chunksize)
+            else:
+                results = pool.imap_unordered(_verify_in_pool_worker, gnmi_paths, self.chunksize)
+            for result in results:
+                if "metrics" in result:
+                    METRICS.merge(result.pop("metrics"))
+                counters = result.pop("counters", {})
+                if "cli" in counters and self.cache is not None:
+                    self.cache.merge(counters["cli"])
+                if "results" in counters and Comparator.results is not None:
+                    Comparator.results.merge(counters["results"])
+                yield result
+
+    '''
+    This method verifies every gNMI path in the current process with the AsyncCLIExecutor: the CLI commands of all the paths are
+    in flight at the same time (limited by the session pool), the results are returned in the input order or in completion order.
+    '''
+    def run_async(self, gnmi_paths, latency=0.0, max_sessions=8, timeout=10.0):
+        gNMI = open_gnmi(self.json_file, self.lazy, self.snapshot)
+        cli = CLI(cache=CLIOutputCache(self.cache_ttl) if self.cache_ttl > 0 else None)
+        self.cache = cli.cache
+
+        async def verify_all():
+            pool = SessionPool(lambda: LocalTransport(cli, latency), max_sessions, timeout)
+            executor = AsyncCLIExecutor(cli, pool)
+            try:
+                tasks = [verify_path_async(executor, gNMI, gnmi_path, self.comparator) for gnmi_path in gnmi_paths]
+                if self.ordered:
+                    return await asyncio.gather(*tasks)
+                return [await task for task in asyncio.as_completed(tasks)]
+            finally:
+                await executor.close()
+
+        results = asyncio.run(verify_all())
+        if self.comparator is not None:
+            self.comparator.save()
+        return results
+
+    '''
+    This method reads the gNMI paths to verify from a text file (one path per line, empty lines and lines starting with '#' are
+    ignored).
+    '''
+    @staticmethod
+    def read_paths(paths_file):
+        try:
+            with open(paths_file, "r") as file:
+                return [line.strip() for line in file if line.strip() and not line.strip().startswith("#")]
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File '{paths_file}' not found.")
+
+'''
+This function runs the batch mode from the parsed command line options, prints a line for every path (and the report of every
+mismatch) followed by a summary, and returns the exit status: 0 when every path matches, 1 otherwise.
+'''
+def run_batch(args):
+    METRICS.enabled = bool(args.metrics_prom or args.profile)
+    queries = list(args.paths or [])
+    if args.paths_file:
+        queries.extend(BatchRunner.read_paths(args.paths_file))
+
+    # A query which is not a valid gNMI path (e.g. an unclosed '[') is reported as an error result, the others are still verified
+    invalid, patterns = [], {}
+    for query in queries:
+        try:
+            patterns[query] = PathTrie.is_pattern(query)
+        except ValueError as error:
+            invalid.append({"path": query, "status": "error", "commands": [], "differences": None, "report": str(error)})
+    needs_data = args.all or any(patterns.values())
+    gNMI = open_gnmi(args.data, args.lazy, args.snapshot) if needs_data else None
+    gnmi_paths = []
+    for query, is_pattern in patterns.items():
+        # Wildcard queries ('[name=*]', '*', '...') are expanded into every matching gNMI path in the data
+        gnmi_paths.extend(gNMI.expand_paths(query) if is_pattern else [query])
+    if args.all:
+        gnmi_paths.extend(gNMI.data.keys())
+    gnmi_paths = list(dict.fromkeys(gnmi_paths))  # Overlapping queries verify every path once, in the order first given
+
+    history = open_history_sink(args) if args.history else None
+    renderer = open_report_renderer(args)
+    runner = BatchRunner(args.data, workers=args.workers, ordered=not args.unordered, lazy=args.lazy, cache_ttl=args.cli_cache_ttl,
+                         incremental=args.incremental, snapshot=args.snapshot)
+    counts = {"match": 0, "mismatch": 0, "error": 0}
+
+    start = time.perf_counter()
+    if args.async_cli:
+        results = runner.run_async(gnmi_paths, args.cli_latency, args.cli_sessions, args.cli_timeout)
+    else:
+        results = runner.run(gnmi_paths)
+    for result in itertools.chain(invalid, results):
+        counts[result["status"]] += 1
+        if history is not None:
+            history.write(result["path"], result["report"])
+        print_result(result, args.quiet, renderer)
+    elapsed = time.perf_counter() - start
+    if history is not None:
+        history.close()
+    if args.report_summary:
+        renderer.write_summary()
+
+    total = sum(counts.values())
+    rate = total / elapsed if elapsed > 0 else float(total)
+    print("\n - Checked {} paths: {} matched, {} mismatched, {} errors in {:.3f}s ({:.1f} paths/sec)".format(
+        total, counts["match"], counts["mismatch"], counts["error"], elapsed, rate))
+    if runner.cache is not None:
+        stats = runner.cache.stats()
+        print(" - CLI cache: {} hits, {} misses, {} deduplicated ({:.0%} hit ratio)".format(
+            stats["hits"], stats["misses"], stats["deduplicated"], stats["hit_ratio"]))
+    if runner.comparator is not None:
+        print(" - Incremental comparison: {} levels compared, {} unchanged levels reused".format(
+            runner.comparator.compared, runner.comparator.reused))
+    if Comparator.results is not None:
+        stats = Comparator.results.stats()
+        print(" - Result cache: {} hits, {} disk hits, {} misses ({:.0%} hit ratio)".format(
+            stats["hits"], stats["disk_hits"], stats["misses"], stats["hit_ratio"]))
+    if args.metrics_prom:
+        METRICS.export_prometheus(args.metrics_prom)
+        print(f" - Metrics saved as {args.metrics_prom}")
+    if args.profile:
+        METRICS.export_profile(args.profile, args.slowest)
+        print(f" - Profile saved as {args.profile}")
+    return 0 if counts["mismatch"] == 0 and counts["error"] == 0 else 1
+
+'''
+This function prints the status line of a result, and its report unless the path matched.
+'''
+def print_result(result, quiet=False, renderer=None):
+    if result["status"] == "match" and quiet:
+        return
+    if renderer is not None:
+        renderer.write_result(result)
+        return
+    print("{} {}".format("[{}]".format(result["status"].upper()).ljust(10), result["path"]))
+    if result["status"] != "match":
+        print(result["report"])
+
+'''
+This function returns the ReportRenderer of the report options given on the command line.
+'''
+def open_report_renderer(args):
+    limit = args.report_limit
+    if limit is None:
+        limit = 200 if sys.stdout.isatty() else 0  # Keep huge reports from flooding the terminal
+    return ReportRenderer(sys.stdout, args.report_format, limit, args.report_top)
+
+'''
+This function opens the history file given on the command line (the format comes from its extension).
+'''
+def open_history_sink(args):
+    rotate_bytes = int(args.history_rotate_mb * 1024 * 1024) if args.history_rotate_mb else None
+    return HistorySink(args.history, rotate_bytes=rotate_bytes)
+
+'''
+This function defines the command line options. Without any path option the program starts the interactive mode.
+'''
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="gNMI-CLI Path Verification and Data Comparison Tool")
+    parser.add_argument("--data", default="gNMI_Data.json", help="gNMI data file (default: gNMI_Data.json)")
+    parser.add_argument("--paths", nargs="+", metavar="PATH",
+                        help="gNMI paths to verify in batch mode, wildcards like '[name=*]' and '...' are expanded")
+    parser.add_argument("--paths-file", help="file with one gNMI path per line to verify in batch mode")
+    parser.add_argument("--all", action="store_true", help="verify every path found in the gNMI data file")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--unordered", action="store_true", help="print results as soon as they are ready")
+    parser.add_argument("--lazy", action="store_true", help="index the gNMI data file and parse only the requested paths")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="keep a binary snapshot of the parsed gNMI data next to it (FILE.snap), unchanged files load instantly")
+    parser.add_argument("--async-cli", action="store_true",
+                        help="run the CLI commands of all paths concurrently in one process instead of using worker processes")
+    parser.add_argument("--cli-latency", type=float, default=0.0, help="simulated CLI round-trip time in seconds (--async-cli)")
+    parser.add_argument("--cli-sessions", type=int, default=8, help="maximum concurrent CLI sessions per device (--async-cli)")
+    parser.add_argument("--cli-timeout", type=float, default=10.0, help="CLI command timeout in seconds (--async-cli)")
+    parser.add_argument("--cli-cache-ttl", type=float, default=0.0,
+                        help="reuse CLI command outputs for this many seconds, each distinct command runs once (default: off)")
+    parser.add_argument("--incremental", metavar="STATE_FILE",
+                        help="keep subtree hashes and differences in STATE_FILE and only compare what changed since the last run")
+    parser.add_argument("--history", metavar="FILE",
+                        help="append every result to FILE as it is produced (.jsonl, .csv or .txt), skips the save prompt")
+    parser.add_argument("--history-rotate-mb", type=float, default=None,
+                        help="compress the history file to FILE.<n>.gz and start a new one when it grows past this size")
+    parser.add_argument("--subscribe", metavar="SOURCE",
+                        help="apply gNMI notifications (JSON lines) from SOURCE ('-', a file, 'unix:PATH' or 'tcp:HOST:PORT') "
+                             "and verify the changed paths continuously")
+    parser.add_argument("--follow", action="store_true", help="keep reading the --subscribe file as new lines are appended")
+    parser.add_argument("--verify-interval", type=float, default=1.0,
+                        help="seconds between two verifications of the changed paths (--subscribe, default: 1.0)")
+    parser.add_argument("--inventory", metavar="FILE",
+                        help="verify every device of a JSON inventory (own gNMI data, CLI transport and paths per device)")
+    parser.add_argument("--device-concurrency", type=int, default=8,
+                        help="devices verified at the same time by each worker process (--inventory, default: 8)")
+    parser.add_argument("--worst", type=int, default=10, help="worst mismatching paths listed in the fleet summary (default: 10)")
+    parser.add_argument("--fleet-report", metavar="FILE", help="save the fleet summary as JSON (--inventory)")
+    parser.add_argument("--list-key", action="append", default=[], metavar="FIELD=KEY[,KEY]",
+                        help="match the rows of the table FIELD by these fields (default: name, id, neighbor_id, prefix ... or position)")
+    parser.add_argument("--spill-rows", type=int, default=200000,
+                        help="tables with more rows are compared by a sorted merge spilled to disk (default: 200000)")
+    parser.add_argument("--units", choices=(UnitConverter.SI, UnitConverter.IEC), default=UnitConverter.IEC,
+                        help="convert KB/MB/GB/TB with powers of 1000 (si) or 1024 (iec) (default: iec)")
+    parser.add_argument("--result-cache", action="store_true",
+                        help="remember the differences and report of every (gNMI data, CLI output) pair already compared")
+    parser.add_argument("--result-cache-size", type=int, default=4096, help="results kept in memory (default: 4096)")
+    parser.add_argument("--result-cache-dir", metavar="DIR", help="also keep the results on disk in DIR (implies --result-cache)")
+    parser.add_argument("--metrics-prom", metavar="FILE", help="time every stage and save the metrics in Prometheus text format")
+    parser.add_argument("--profile", metavar="FILE", help="time every stage and save a JSON profile of the run")
+    parser.add_argument("--slowest", type=int, default=10, help="number of slowest paths listed in the profile (default: 10)")
+    parser.add_argument("--report-format", choices=ReportRenderer.FORMATS, default="text",
+                        help="print the results as text, CSV rows or JSON lines (default: text)")
+    parser.add_argument("--report-limit", type=int, default=None, metavar="N",
+                        help="print at most N differences per path, 0 prints all (default: 200 on a terminal, all otherwise)")
+    parser.add_argument("--report-summary", action="store_true",
+                        help="print the differences by mismatch type and by path prefix, and the largest numeric deltas")
+    parser.add_argument("--report-top", type=int, default=10, metavar="N",
+                        help="entries of every summary section (default: 10)")
+    parser.add_argument("--quiet", action="store_true", help="only print mismatches, errors and the summary")
+    return parser.parse_args(argv)
+
+'''
+This function sets up the table comparison (Comparator.lists) from the command line options, before any worker is started.
+'''
+def configure_tables(args):
+    Comparator.lists = ListComparator(spill_rows=args.spill_rows)
+    for option in args.list_key:
+        field, separator, key_fields = option.partition("=")
+        if not separator or not field or not key_fields:
+            raise SystemExit(f"Invalid --list-key '{option}', expected FIELD=KEY or FIELD=KEY1,KEY2")
+        Comparator.lists.set_key(field, key_fields)
+
+########################################################################################################################################
+#                                                          Streaming Telemetry                                                         #
+########################################################################################################################################
+
+'''
+ --> Declare the TelemetryStream class which keeps the gNMI data up to date from a stream of gNMI notifications (like the
+     responses of a gNMI Subscribe) and re-verifies the changed paths on a schedule, without reloading the data file.
+     Every line of the stream is one notification in JSON:
+        {"timestamp": ..., "prefix": "/interfaces/interface[name=eth0]/state",
+         "update": [{"path": "counters/in_octets", "val": 1600000}], "delete": ["counters/out_errors"]}
+     Paths are strings or gNMI Path objects ({"elem": [{"name": ..., "key": {...}}]}), values are plain JSON or gNMI TypedValues
+     ({"int_val": 5}, {"json_val": {...}} ...). The deletes of a notification are applied before its updates (see GNMI.apply_update
+     and GNMI.apply_delete), each one in O(path depth), and the gNMI paths they changed are marked dirty. Every `interval` seconds
+     the dirty paths are verified again (once each, however many updates they got) and the results are yielded.
+'''
+class TelemetryStream:
+
+    TYPED_VALUES = ("json_val", "json_ietf_val", "string_val", "int_val", "uint_val", "bool_val", "float_val", "double_val",
+                    "ascii_val")
+
+    def __init__(self, gnmi, cli, comparator=None, interval=1.0, clock=time.monotonic):
+        self.gnmi = gnmi
+        self.cli = cli
+        self.comparator = comparator
+        self.interval = interval
+        self.clock = clock
+        self.dirty = {}  # gnmi path -> None, in the order the paths changed
+        self.notifications = 0
+        self.rejected = 0
+
+    '''
+    This method opens a notification source and returns an iterable of lines:
+        - "-": the standard input (e.g. a pipe from a collector),
+        - "unix:PATH" or "tcp:HOST:PORT": a local socket standing in for the gNMI connection,
+        - anything else: a JSON-lines file (or a named pipe), with follow=True new lines are read as they are appended.
+    '''
+    @staticmethod
+    def open_source(source, follow=False):
+        if source == "-":
+            return sys.stdin
+        if source.startswith("unix:"):
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.connect(source[len("unix:"):])
+            return connection.makefile("r")
+        if source.startswith("tcp:"):
+            host, _, port = source[len("tcp:"):].rpartition(":")
+            return socket.create_connection((host or "localhost", int(port))).makefile("r")
+        return TelemetryStream.follow_file(source) if follow else open(source, "r")
+
+    @staticmethod
+    def follow_file(file_name, poll=0.2):
+        with open(file_name, "r") as file:
+            pending = ""
+            while True:
+                line = file.readline()
+                if not line:
+                    time.sleep(poll)
+                    continue
+                pending += line
+                if pending.endswith("\n"):  # A line being written is only used once it is complete
+                    yield pending
+                    pending = ""
+
+    '''
+    This method returns a path of a notification (a string, a gNMI Path object or nothing) as a string, it raises ValueError when
+    the path is neither.
+    '''
+    @staticmethod
+    def path_string(path):
+        if path is None or isinstance(path, str):
+            return path or ""
+        if not isinstance(path, dict) or not isinstance(path.get("elem", []), list):
+            raise ValueError(f"invalid path {path!r}")
+        elements = []
+        for element in path.get("elem", []):
+            if not isinstance(element, dict) or not isinstance(element.get("name"), str) \
+                    or not isinstance(element.get("key") or {}, dict):
+                raise ValueError(f"invalid path element {element!r}")
+            keys = element.get("key") or {}
+            elements.append(element["name"] + "".join("[{}={}]".format(key, value) for key, value in keys.items()))
+        return "/".join(elements)
+
+    @staticmethod
+    def join_path(prefix, path):
+        prefix, path = TelemetryStream.path_string(prefix), TelemetryStream.path_string(path)
+        if not path:
+            return prefix
+        if not prefix:
+            return path if path.startswith("/") else "/" + path
+        return prefix.rstrip("/") + "/" + path.lstrip("/")
+
+    @staticmethod
+    def decode_value(value):
+        if isinstance(value, dict) and len(value) == 1:
+            typed, decoded = next(iter(value.items()))
+            if typed in TelemetryStream.TYPED_VALUES:
+                return json.loads(decoded) if typed in ("json_val", "json_ietf_val") and isinstance(decoded, str) else decoded
+        return value
+
+    '''
+    This method applies one notification (a dictionary) to the gNMI data and marks the changed gNMI paths dirty.
+    The shape of the notification and every path in it are checked first. A change which still fails (e.g. an update below a
+    leaf) raises ValueError after the changes before it are undone (see GNMI.rollback), so a rejected notification changes nothing.
+    '''
+    def apply(self, notification):
+        prefix = self.path_string(notification.get("prefix"))
+        deletes, updates = notification.get("delete") or [], notification.get("update") or []
+        if not isinstance(deletes, list) or not isinstance(updates, list):
+            raise ValueError("'delete' and 'update' must be lists")
+        if not all(isinstance(update, dict) for update in updates):
+            raise ValueError("every update must be a JSON object")
+        deletes = [self.join_path(prefix, path) for path in deletes]
+        updates = [(self.join_path(prefix, update.get("path")), self.decode_value(update.get("val", update.get("value"))))
+                   for update in updates]
+        for gnmi_path in itertools.chain(deletes, (gnmi_path for gnmi_path, _ in updates)):
+            PathTrie.parse_path(gnmi_path)
+
+        changed, undo = [], []
+        try:
+            for gnmi_path in deletes:
+                changed.extend(self.gnmi.apply_delete(gnmi_path, undo))
+            for gnmi_path, value in updates:
+                changed.extend(self.gnmi.apply_update(gnmi_path, value, undo))
+        except (ValueError, KeyError, TypeError):
+            self.gnmi.rollback(undo)
+            raise
+        self.mark(changed)
+        self.notifications += 1
+
+    '''
+    This method applies one line of the stream, a line which is not a valid notification is counted as rejected and skipped.
+    '''
+    def apply_line(self, line):
+        line = line.strip()
+        if not line:
+            return
+        try:
+            notification = json.loads(line)
+            if not isinstance(notification, dict):
+                raise ValueError("a notification must be a JSON object")
+            if notification.get("sync_response"):
+                return
+            self.apply(notification)
+        except (ValueError, KeyError, TypeError) as error:
+            self.rejected += 1
+            print(f" - Warning: notification rejected ({error}): {line[:200]}", file=sys.stderr)
+
+    def mark(self, gnmi_paths):
+        for gnmi_path in gnmi_paths:
+            self.dirty[gnmi_path] = None
+        METRICS.count("telemetry_updates", len(gnmi_paths))
+
+    '''
+    This method verifies every dirty path again and yields the results (see verify_path).
+    '''
+    def verify_dirty(self):
+        dirty, self.dirty = self.dirty, {}
+        for gnmi_path in dirty:
+            yield verify_path(self.gnmi, self.cli, gnmi_path, self.comparator)
+
+    '''
+    This method reads the stream until it ends and yields the results of every verification round. The lines are read by a
+    background thread, so a quiet stream does not delay the rounds and a busy one is applied as fast as it arrives.
+    '''
+    def run(self, lines):
+        received = queue.Queue(maxsize=10000)
+
+        def read():
+            try:
+                for line in lines:
+                    received.put(line)
+            finally:
+                received.put(None)
+
+        threading.Thread(target=read, name="telemetry-reader", daemon=True).start()
+        next_round = self.clock() + self.interval
+        while True:
+            try:
+                line = received.get(timeout=max(0.0, next_round - self.clock()))
+            except queue.Empty:
+                line = ""
+            if line is None:
+                break
+            if line:
+                self.apply_line(line)
+            if self.clock() >= next_round:
+                yield from self.verify_dirty()
+                next_round = self.clock() + self.interval
+        yield from self.verify_dirty()
+
+'''
+This function runs the streaming mode: the data file is loaded once, then kept up to date from the notification source and the
+changed paths are verified again every --verify-interval seconds until the stream ends (or Ctrl+C).
+'''
+def run_subscribe(args):
+    METRICS.enabled = bool(args.metrics_prom or args.profile)
+    cache = CLIOutputCache(default_ttl=args.cli_cache_ttl) if args.cli_cache_ttl > 0 else None
+    comparator = IncrementalComparator(args.incremental)
+    stream = TelemetryStream(open_gnmi(args.data, snapshot=args.snapshot), CLI(cache=cache), comparator, args.verify_interval)
+    history = open_history_sink(args) if args.history else None
+    renderer = open_report_renderer(args)
+    counts = {"match": 0, "mismatch": 0, "error": 0}
+
+    start = time.perf_counter()
+    try:
+        for result in stream.run(TelemetryStream.open_source(args.subscribe, args.follow)):
+            counts[result["status"]] += 1
+            if history is not None:
+                history.write(result["path"], result["report"])
+            print_result(result, args.quiet, renderer)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if history is not None:
+            history.close()
+        if args.incremental:
+            comparator.save()
+
+    if args.report_summary:
+        renderer.write_summary()
+    print("\n - Applied {} notifications ({} rejected) in {:.3f}s, {} verifications: {} matched, {} mismatched, {} errors".format(
+        stream.notifications, stream.rejected, time.perf_counter() - start, sum(counts.values()), counts["match"],
+        counts["mismatch"], counts["error"]))
+    print(" - Incremental comparison: {} levels compared, {} unchanged levels reused".format(comparator.compared, comparator.reused))
+    if Comparator.results is not None:
+        stats = Comparator.results.stats()
+        print(" - Result cache: {} hits, {} disk hits, {} misses ({:.0%} hit ratio)".format(
+            stats["hits"], stats["disk_hits"], stats["misses"], stats["hit_ratio"]))
+    if args.metrics_prom:
+        METRICS.export_prometheus(args.metrics_prom)
+    if args.profile:
+        METRICS.export_profile(args.profile, args.slowest)
+    return 0 if counts["mismatch"] == 0 and counts["error"] == 0 else 1
+
+########################################################################################################################################
+#                                                          Fleet Verification                                                          #
+########################################################################################################################################
+
+'''
+ --> Declare the Device class which describes one device of the inventory: where its gNMI data comes from, how its CLI commands
+     are run and which paths are verified on it. The inventory is a JSON file (relative file names are relative to it):
+        {"defaults": {"max_sessions": 4, "timeout": 10.0, "paths": ["/interfaces/..."]},
+         "devices": [{"name": "r1", "data": "r1/gNMI_Data.json", "outputs": "r1/cli_outputs.json"},
+                     {"name": "r2", "data": "r2/gNMI_Data.json", "transport": "command", "command": "ssh admin@r2 {command}",
+                      "max_sessions": 2}]}
+     Every device field may be set in "defaults":
+        - data: the gNMI data file, lazy: use the offset-indexed loader (IndexedGNMI), snapshot: use its binary snapshot
+          (SnapshotGNMI).
+        - transport: a name of TRANSPORTS, "local" answers from `outputs` (a JSON file of command outputs, structured or raw text,
+          default: the simulated CLI outputs) after `latency` (+ `jitter`) seconds, "command" runs `command` (see CommandTransport).
+        - max_sessions and timeout: the concurrency limit and the command timeout of the device (see SessionPool).
+        - paths: the gNMI paths to verify (wildcards are expanded), all the paths of the data when not set.
+'''
+class Device:
+
+    TRANSPORTS = {
+        "local": lambda device, cli: LocalTransport(cli, device.latency, device.jitter),
+        "command": lambda device, cli: CommandTransport(cli, device.command)
+    }
+    FIELDS = {"data": None, "lazy": False, "snapshot": False, "transport": "local", "outputs": None, "command": None, "latency": 0.0,
+              "jitter": 0.0, "max_sessions": 4, "timeout": 10.0, "paths": None}
+
+    def __init__(self, name, **fields):
+        unknown = set(fields) - set(Device.FIELDS)
+        if unknown:
+            raise ValueError("Device '{}': unknown field(s) {}".format(name, ", ".join(sorted(unknown))))
+        self.name = name
+        for field, default in Device.FIELDS.items():
+            setattr(self, field, fields.get(field, default))
+        if not self.data:
+            raise ValueError(f"Device '{name}': no gNMI data file.")
+        if self.transport not in Device.TRANSPORTS:
+            raise ValueError(f"Device '{name}': unknown transport '{self.transport}'.")
+        if self.transport == "command" and not self.command:
+            raise ValueError(f"Device '{name}': the command transport needs a 'command'.")
+
+    '''
+    This method reads an inventory file and returns its devices.
+    '''
+    @staticmethod
+    def load_inventory(inventory_file):
+        try:
+            with open(inventory_file, "r") as file:
+                inventory = json.load(file)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File '{inventory_file}' not found.")
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON format in file '{inventory_file}'.")
+
+        directory = os.path.dirname(os.path.abspath(inventory_file))
+        defaults = inventory.get("defaults", {})
+        devices, names = [], set()
+        for entry in inventory.get("devices", []):
+            fields = dict(defaults, **entry)
+            name = fields.pop("name", None)
+            if not name or name in names:
+                raise ValueError(f"Invalid inventory '{inventory_file}': every device needs a unique name ({name!r}).")
+            names.add(name)
+            for field in ("data", "outputs"):
+                if fields.get(field):
+                    fields[field] = os.path.join(directory, fields[field])
+            devices.append(Device(name, **fields))
+        return devices
+
+    def load_outputs(self):
+        if self.outputs is None:
+            return None
+        with open(self.outputs, "r") as file:
+            return json.load(file)
+
+    def transport_factory(self, cli):
+        return lambda: Device.TRANSPORTS[self.transport](self, cli)
+
+    def resolve_paths(self, gNMI):
+        if not self.paths:
+            return list(gNMI.data.keys())
+        gnmi_paths = []
+        for query in self.paths:
+            gnmi_paths.extend(gNMI.expand_paths(query) if PathTrie.is_pattern(query) else [query])
+        return gnmi_paths
+
+'''
+This function verifies every path of one device and returns the device result (see FleetReport.add). Anything going wrong with
+the device (missing data file, transport that can not connect ...) fails this device only, a command that fails or times out
+only fails its path.
+'''
+async def verify_device(device, cache=None, limit=None):
+    device_result = {"device": device.name, "status": "ok", "error": None, "seconds": 0.0, "results": []}
+    async with (limit or asyncio.Semaphore(1)):
+        start = time.perf_counter()
+        try:
+            gNMI = open_gnmi(device.data, device.lazy, device.snapshot)
+            cli = CLI(outputs=device.load_outputs(), cache=cache, device=device.name)
+            pool = SessionPool(device.transport_factory(cli), device.max_sessions, device.timeout)
+            executor = AsyncCLIExecutor(cli, pool)
+            try:
+                device_result["results"] = list(await asyncio.gather(
+                    *(verify_path_async(executor, gNMI, gnmi_path) for gnmi_path in device.resolve_paths(gNMI))))
+            finally:
+                await executor.close()
+        except Exception as error:
+            device_result["status"] = "failed"
+            device_result["error"] = f"{type(error).__name__}: {error}"
+            METRICS.count("failed_devices")
+        device_result["seconds"] = time.perf_counter() - start
+    return device_result
+
+'''
+This function verifies the devices of one shard in the current process, `device_concurrency` devices at a time.
+'''
+def _verify_shard(shard):
+    devices, device_concurrency, cache_ttl, metrics, tables, units, _ = shard
+    METRICS.enabled = metrics
+    Comparator.set_unit_mode(units)
+    Comparator.lists = ListComparator.from_settings(tables)
+
+    async def verify_all():
+        cache = CLIOutputCache(cache_ttl) if cache_ttl > 0 else None
+        limit = asyncio.Semaphore(device_concurrency)
+        return await asyncio.gather(*(verify_device(device, cache, limit) for device in devices))
+
+    return asyncio.run(verify_all())
+
+def _verify_shard_in_pool(shard):
+    results = shard[-1]
+    Comparator.results = ComparisonCache(*results) if results is not None else None
+    device_results = _verify_shard(shard)
+    counters = Comparator.results.counters() if Comparator.results is not None else None
+    return device_results, (METRICS.drain() if METRICS.enabled else None), counters
+
+'''
+ --> Declare the FleetRunner class which verifies a whole inventory of devices.
+     The devices are dealt round-robin into one shard per worker process. Every worker verifies its shard with one event loop,
+     `device_concurrency` devices at a time, each device limited by its own session pool. The device results are yielded shard by
+     shard as the workers finish. With a result cache (Comparator.results) every worker keeps its own ComparisonCache with the
+     same size and directory, their statistics are added to the cache of the current process.
+'''
+class FleetRunner:
+
+    def __init__(self, devices, workers=None, device_concurrency=8, cache_ttl=0.0):
+        self.devices = list(devices)
+        self.workers = max(1, min(workers or multiprocessing.cpu_count(), len(self.devices)))
+        self.device_concurrency = device_concurrency
+        self.cache_ttl = cache_ttl
+
+    def shards(self):
+        results = Comparator.results
+        results = (results.maxsize, results.directory) if results is not None else None
+        return [(self.devices[index::self.workers], self.device_concurrency, self.cache_ttl, METRICS.enabled,
+                 Comparator.lists.settings(), Comparator.units.mode, results) for index in range(self.workers)]
+
+    def run(self):
+        shards = self.shards()
+        if len(shards) == 1:
+            yield from _verify_shard(shards[0])
+            return
+        with multiprocessing.Pool(len(shards)) as pool:
+            for device_results, metrics, counters in pool.imap_unordered(_verify_shard_in_pool, shards):
+                if metrics is not None:
+                    METRICS.merge(metrics)
+                if counters is not None and Comparator.results is not None:
+                    Comparator.results.merge(counters)
+                yield from device_results
+
+'''
+This function runs the fleet mode: every device of the inventory is verified, a line is printed per device and the merged
+FleetReport at the end. It returns 0 when every path of every device matches, 1 otherwise.
+'''
+def run_fleet(args):
+    METRICS.enabled = bool(args.metrics_prom or args.profile)
+    devices = Device.load_inventory(args.inventory)
+    runner = FleetRunner(devices, args.workers, args.device_concurrency, args.cli_cache_ttl)
+    report = FleetReport(args.worst)
+    history = open_history_sink(args) if args.history else None
+
+    start = time.perf_counter()
+    try:
+        for device_result in runner.run():
+            totals = report.add(device_result)
+            if history is not None:
+                for result in device_result["results"]:
+                    history.write("{}:{}".format(device_result["device"], result["path"]), result["report"])
+            print("{} {}: {} matched, {} mismatched, {} errors in {:.2f}s".format(
+                "[{}]".format(totals["status"].upper()).ljust(10), device_result["device"], totals["match"], totals["mismatch"],
+                totals["error_paths"], totals["seconds"]))
+    finally:
+        if history is not None:
+            history.close()
+
+    print(report.format())
+    print(" - Verified {} devices with {} workers in {:.3f}s".format(len(devices), runner.workers, time.perf_counter() - start))
+    if Comparator.results is not None:
+        stats = Comparator.results.stats()
+        print(" - Result cache: {} hits, {} disk hits, {} misses ({:.0%} hit ratio)".format(
+            stats["hits"], stats["disk_hits"], stats["misses"], stats["hit_ratio"]))
+    if args.fleet_report:
+        report.save(args.fleet_report)
+        print(f" - Fleet report saved as {args.fleet_report}")
+    if args.metrics_prom:
+        METRICS.export_prometheus(args.metrics_prom)
+    if args.profile:
+        METRICS.export_profile(args.profile, args.slowest)
+    fleet = report.totals()
+    return 0 if fleet["failed"] == 0 and fleet["mismatch"] == 0 and fleet["error_paths"] == 0 else 1
+
 ########################################################################################################################################
 #                                                                Main Program                                                          #
 ########################################################################################################################################
 
-def main():
-    gNMI = GNMI("gNMI_Data.json")
+def main(argv=None):
+    args = parse_args(argv)
+    Comparator.set_unit_mode(args.units)
+    configure_tables(args)
+    if args.result_cache or args.result_cache_dir:
+        Comparator.results = ComparisonCache(args.result_cache_size, args.result_cache_dir)
+    if args.subscribe:
+        return run_subscribe(args)
+    if args.inventory:
+        return run_fleet(args)
+    if args.paths or args.paths_file or args.all:
+        return run_batch(args)
+
+    gNMI = open_gnmi(args.data, args.lazy, args.snapshot)
     cli = CLI()
-    output_history = []
 
     print("\n~~~~~~~~~~~~~~~~~~~~~~~~~~~   Welcome in gNMI-CLI Path Verification and Data Comparison Program   ~~~~~~~~~~~~~~~~~~~~~~~~~~~\n")
+    history = open_history_sink(args) if args.history else ReportGenerator.open_history()
     print("\n\n --> If you want to exit the program just enter one of the following `e, E, Exit`\n\n")
     while True:
         
         user_input = input("\nEnter GNMI Path: ")
         
         if user_input.lower() in ["e", "exit"]:
-            ReportGenerator.save_history(output_history)
+            if history is not None:
+                history.close()
+                print(f"History saved as {history.path}")
             print("Exiting...")
             break
 
-        gnmi_data = gNMI.fetch_data(user_input)
-        cli_commands, cli_data = cli.execute_command(user_input)
+        gnmi_data = gNMI.fetch_tree(user_input)
+        cli_commands, cli_data = cli.execute_structured(user_input)
         
 
         if gnmi_data is None or cli_data is None:
@@ -464,19 +4224,19 @@ def main():
                 print("     GNMI Path '{}' not found in CLI commands.".format(user_input))
         else:
             print("\n - gNMI data for gNMI path '{}' is:".format(user_input))
-            print(gnmi_data)
+            print(GNMI.format_tree(gnmi_data))
             print("\n - CLI Commands for gNMI path '{}' is:".format(user_input))
             print(cli_commands)
             print("\n - CLI data for gNMI path '{}' is:".format(user_input))
-            print(cli_data)
-            comparison = Comparator.compare_data(gnmi_data, cli_data)
-            report = ReportGenerator.generate_report(comparison)
+            print(CLI.format_output(cli_data))
+            report = verify_outputs(user_input, gnmi_data, cli_commands, cli_data)["report"]
             print("\n - Comparison result for gNMI path '{}' is: \n{}".format(user_input, report))
-            output_history.append({user_input: report})
+            if history is not None:
+                history.write(user_input, report)
 
 ########################################################################################################################################
 #                                                                Run The Code                                                          #
 ########################################################################################################################################
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,273 @@
+'''
+- Project Title: gNMI-CLI Path Verification and Data Comparison Tool - Benchmark Suite
+
+- Description:
+    Measures the performance of every stage of the verification pipeline (load, fetch, compare, report) on synthetic gNMI dumps
+    and CLI outputs of any size, and flags slowdowns against a saved baseline.
+
+- Usage:
+    python Linux_Second_Project_Benchmark.py --interfaces 2000 --depth 3 --list-length 16 --mismatch-ratio 0.05
+    python Linux_Second_Project_Benchmark.py --save-baseline baseline.json
+    python Linux_Second_Project_Benchmark.py --baseline baseline.json --tolerance 0.25
+'''
+
+########################################################################################################################################
+#                                                      Import Important Libraries                                                      #
+########################################################################################################################################
+
+'''
+Importing 'json', 'os', 'sys', 'time', 'argparse', 'random', 'tempfile' and 'tracemalloc' libraries:
+    - Used to write the synthetic dumps, measure the latency and the peak memory of every stage and save/compare baselines.
+Importing the project module:
+    - The benchmark runs the real classes of the tool (GNMI, IndexedGNMI, SnapshotGNMI, CLI, Comparator, ReportGenerator).
+'''
+import json
+import os
+import sys
+import time
+import argparse
+import random
+import tempfile
+import tracemalloc
+
+from Linux_Second_Project import GNMI, IndexedGNMI, SnapshotGNMI, CLI, Comparator, ReportGenerator
+
+########################################################################################################################################
+#                                                        Synthetic Data Generator                                                      #
+########################################################################################################################################
+
+'''
+ --> Declare the SyntheticDataset class which generates a gNMI dump and the matching CLI outputs.
+     Every interface gets a '/interfaces/interface[name=ethN]/state/counters' path (mapped to 'show interfaces ethN counters' by the
+     CLI command templates) with:
+        - `leaves` counters on every level, nested `depth` levels deep,
+        - a table ('queues') of `list_length` rows,
+     The CLI side uses other key spellings ('in-octets' for 'in_octets'), writes some values with units ('100K') and changes a
+     `mismatch_ratio` share of the leaves, so the comparator does the same work it does on real devices.
+'''
+class SyntheticDataset:
+
+    def __init__(self, interfaces=500, depth=2, list_length=8, mismatch_ratio=0.05, leaves=8, seed=1):
+        self.interfaces = interfaces
+        self.depth = depth
+        self.list_length = list_length
+        self.mismatch_ratio = mismatch_ratio
+        self.leaves = leaves
+        self.random = random.Random(seed)
+        self.gnmi_data = {}
+        self.cli_outputs = {}
+        self.mismatches = 0
+        self.generate()
+
+    '''
+    This method fills gnmi_data ({gnmi path: subtree}) and cli_outputs ({command: output}).
+    '''
+    def generate(self):
+        for index in range(self.interfaces):
+            gnmi_tree, cli_tree = self.level(self.depth)
+            gnmi_tree["queues"] = [{"queue_id": row, "drops": self.random.randint(0, 10 ** 6)} for row in range(self.list_length)]
+            cli_tree["queues"] = [dict(row) for row in gnmi_tree["queues"]]
+            self.gnmi_data[f"/interfaces/interface[name=eth{index}]/state/counters"] = gnmi_tree
+            self.cli_outputs[f"show interfaces eth{index} counters"] = cli_tree
+
+    '''
+    This method returns one level (and the levels below it) for both sides.
+    '''
+    def level(self, depth):
+        gnmi_tree, cli_tree = {}, {}
+        for leaf in range(self.leaves):
+            key = f"counter_{leaf}_octets"
+            value = self.random.randint(0, 10 ** 9)
+            gnmi_tree[key] = value
+            if self.random.random() < self.mismatch_ratio:
+                self.mismatches += 1
+                cli_value = value + self.random.randint(1, 1000)
+            elif value % 1000 == 0:
+                cli_value = f"{value // 1000}K"
+            else:
+                cli_value = value
+            cli_tree[key.replace("_", "-")] = cli_value
+        if depth > 0:
+            gnmi_tree["detail"], cli_tree["detail"] = self.level(depth - 1)
+        return gnmi_tree, cli_tree
+
+    '''
+    This method writes the gNMI dump to a JSON file.
+    '''
+    def write(self, json_file):
+        with open(json_file, "w") as file:
+            json.dump(self.gnmi_data, file)
+
+########################################################################################################################################
+#                                                            Stage Measurement                                                         #
+########################################################################################################################################
+
+'''
+This function returns the p-th percentile (0-100) of a sorted list of latencies.
+'''
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(p / 100.0 * (len(samples) - 1)))))
+    return samples[index]
+
+'''
+This function summarizes the latencies of one stage: throughput (operations per second) and latency percentiles in milliseconds.
+'''
+def summarize(latencies, peak_bytes):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "operations": len(latencies),
+        "throughput": len(latencies) / total if total > 0 else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_mb": peak_bytes / (1024 * 1024)
+    }
+
+'''
+This function runs `operation` on every item and returns the latency of every call, it also measures the peak memory of a second
+pass under tracemalloc (run separately so the tracing overhead does not distort the latencies).
+'''
+def measure(operation, items, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            operation(item)
+            latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    for item in items:
+        operation(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(latencies, peak)
+
+'''
+ --> Declare the Benchmark class which measures every stage of the pipeline on a SyntheticDataset:
+        - load: GNMI.load_data of the whole dump, IndexedGNMI cold (index build) and warm (saved index), SnapshotGNMI cold
+          (snapshot written) and warm (snapshot loaded),
+        - fetch: GNMI.fetch_tree + CLI.execute_structured of every path,
+        - compare: Comparator.compare_path of every path,
+        - report: ReportGenerator.generate_report of every difference set.
+'''
+class Benchmark:
+
+    def __init__(self, dataset, repeat=3):
+        self.dataset = dataset
+        self.repeat = repeat
+
+    def run(self):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            json_file = os.path.join(directory, "gNMI_Data.json")
+            self.dataset.write(json_file)
+
+            results["load"] = measure(lambda _: GNMI(json_file), [None], self.repeat)
+            results["load_indexed_cold"] = measure(lambda _: (self.drop(json_file + ".idx"), IndexedGNMI(json_file)), [None], self.repeat)
+            IndexedGNMI(json_file)
+            results["load_indexed_warm"] = measure(lambda _: IndexedGNMI(json_file), [None], self.repeat)
+            results["load_snapshot_cold"] = measure(lambda _: (self.drop(json_file + ".snap"), SnapshotGNMI(json_file)), [None],
+                                                    self.repeat)
+            SnapshotGNMI(json_file)
+            results["load_snapshot_warm"] = measure(lambda _: SnapshotGNMI(json_file), [None], self.repeat)
+
+            gNMI = GNMI(json_file)
+            cli = CLI(outputs=self.dataset.cli_outputs)
+            paths = list(gNMI.data.keys())
+            fetched = {path: (gNMI.fetch_tree(path), cli.execute_structured(path)[1]) for path in paths}
+            results["fetch"] = measure(lambda path: (gNMI.fetch_tree(path), cli.execute_structured(path)), paths, self.repeat)
+
+            Comparator.plans.clear()
+            results["compare"] = measure(lambda path: Comparator.compare_path(path, *fetched[path]), paths, self.repeat)
+
+            differences = [Comparator.compare_path(path, *fetched[path]) for path in paths]
+            results["report"] = measure(ReportGenerator.generate_report, differences, self.repeat)
+        return results
+
+    @staticmethod
+    def drop(file_name):
+        if os.path.exists(file_name):
+            os.remove(file_name)
+
+########################################################################################################################################
+#                                                              Baselines                                                               #
+########################################################################################################################################
+
+'''
+This function compares the results with a baseline and returns the list of slowdowns: a stage is flagged when its throughput
+dropped, or its p95 latency grew, by more than `tolerance` (0.25 = 25%).
+'''
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for stage, current in results.items():
+        previous = baseline.get(stage)
+        if previous is None:
+            continue
+        if previous["throughput"] > 0 and current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append("{}: throughput {:.1f}/s -> {:.1f}/s".format(stage, previous["throughput"], current["throughput"]))
+        if previous["p95_ms"] > 0 and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append("{}: p95 {:.3f}ms -> {:.3f}ms".format(stage, previous["p95_ms"], current["p95_ms"]))
+    return regressions
+
+def print_results(results):
+    print("\n{:<20}{:>10}{:>14}{:>12}{:>12}{:>12}{:>12}".format("Stage", "Ops", "Ops/sec", "p50 ms", "p95 ms", "p99 ms", "Peak MB"))
+    for stage, result in results.items():
+        print("{:<20}{:>10}{:>14.1f}{:>12.3f}{:>12.3f}{:>12.3f}{:>12.2f}".format(
+            stage, result["operations"], result["throughput"], result["p50_ms"], result["p95_ms"], result["p99_ms"], result["peak_mb"]))
+
+########################################################################################################################################
+#                                                                Main Program                                                          #
+########################################################################################################################################
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the gNMI-CLI verification stages on synthetic data")
+    parser.add_argument("--interfaces", type=int, default=500, help="number of interface paths (default: 500)")
+    parser.add_argument("--depth", type=int, default=2, help="nesting depth of every path (default: 2)")
+    parser.add_argument("--list-length", type=int, default=8, help="rows of the table of every path (default: 8)")
+    parser.add_argument("--leaves", type=int, default=8, help="counters on every level (default: 8)")
+    parser.add_argument("--mismatch-ratio", type=float, default=0.05, help="share of mismatching leaves (default: 0.05)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes per stage (default: 3)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed of the generator (default: 1)")
+    parser.add_argument("--save-baseline", metavar="FILE", help="save the results as the new baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare the results with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline (default: 0.25)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    dataset = SyntheticDataset(args.interfaces, args.depth, args.list_length, args.mismatch_ratio, args.leaves, args.seed)
+    print(" - Synthetic dataset: {} paths, depth {}, {} rows per table, {} mismatching leaves".format(
+        len(dataset.gnmi_data), args.depth, args.list_length, dataset.mismatches))
+
+    results = Benchmark(dataset, args.repeat).run()
+    print_results(results)
+
+    parameters = {key: getattr(args, key) for key in ("interfaces", "depth", "list_length", "leaves", "mismatch_ratio", "seed")}
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump({"parameters": parameters, "results": results}, file, indent=4)
+        print(f"\n - Baseline saved as {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        if baseline.get("parameters") != parameters:
+            print("\n - Warning: the baseline was measured with other parameters: {}".format(baseline.get("parameters")))
+        regressions = find_regressions(results, baseline.get("results", {}), args.tolerance)
+        if regressions:
+            print("\n - Slowdowns against the baseline:")
+            for regression in regressions:
+                print("     " + regression)
+            return 1
+        print("\n - No slowdown against the baseline.")
+    return 0
+
+########################################################################################################################################
+#                                                                Run The Code                                                          #
+########################################################################################################################################
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,551 @@
+'''
+- Description:
+    Tests of the pure-logic parts of the gNMI-CLI verification tool (one section per component).
+
+- Usage:
+    python -m pytest -q
+'''
+
+########################################################################################################################################
+#                                                      Import Important Libraries                                                      #
+########################################################################################################################################
+
+import copy
+import io
+import json
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+
+import pytest
+
+from Linux_Second_Project import (PathTrie, UnitConverter, Comparator, ListComparator, CLITemplate, CLIRecords, ComparisonPlanCache,
+                                  IncrementalComparator, GNMIIndex, GNMI, TelemetryStream, CLIOutputCache, CLI, ComparisonCache,
+                                  Device, FleetRunner, ReportRenderer, ReportGenerator, verify_outputs)
+
+'''
+Every test starts from the default comparator settings (the tests below change the table keys, the unit mode and the caches).
+'''
+@pytest.fixture(autouse=True)
+def default_comparator():
+    Comparator.lists = ListComparator()
+    Comparator.set_unit_mode(UnitConverter.IEC)
+    Comparator.plans = ComparisonPlanCache()
+    Comparator.results = None
+    yield
+    Comparator.lists = ListComparator()
+    Comparator.set_unit_mode(UnitConverter.IEC)
+    Comparator.plans = ComparisonPlanCache()
+
+'''
+This function returns a random nested level: leaves with units, nested levels and tables of keyed rows.
+'''
+def random_level(rnd, depth=0):
+    level = {}
+    for index in range(rnd.randint(1, 6)):
+        choice = rnd.random()
+        if depth < 2 and choice < 0.2:
+            level[f"nested_{index}"] = random_level(rnd, depth + 1)
+        elif depth < 2 and choice < 0.3:
+            level[f"table_{index}"] = [{"name": f"row{row}", "value": rnd.randint(0, 5)} for row in rnd.sample(range(20), rnd.randint(0, 8))]
+        else:
+            level[f"leaf_{index}"] = rnd.choice([rnd.randint(0, 10), f"{rnd.randint(1, 9)}K", f"{rnd.randint(1, 99)}%", "up", 1.5])
+    return level
+
+'''
+This function returns a changed copy of a level (values changed, keys renamed, dropped or added) as the CLI side.
+'''
+def mutate(rnd, level):
+    changed = {}
+    for key, value in level.items():
+        choice = rnd.random()
+        if choice < 0.1:
+            continue
+        cli_key = key.replace("_", "-") if rnd.random() < 0.5 else key.upper()
+        if isinstance(value, dict):
+            changed[cli_key] = mutate(rnd, value)
+        elif isinstance(value, list):
+            rows = [dict(row, value=rnd.randint(0, 5)) if rnd.random() < 0.3 else dict(row) for row in value if rnd.random() < 0.9]
+            rnd.shuffle(rows)
+            changed[cli_key] = rows
+        else:
+            changed[cli_key] = rnd.choice([value, value, 3, "down"]) if choice < 0.3 else value
+    if rnd.random() < 0.2:
+        changed["extra"] = 1
+    return changed
+
+
+########################################################################################################################################
+#                                                               Path Trie                                                              #
+########################################################################################################################################
+
+def test_parse_path_keeps_slashes_inside_keys_and_sorts_keys():
+    assert PathTrie.parse_path("/a/b[prefix=10.0.0.0/8]/c") == (("a", ()), ("b", (("prefix", "10.0.0.0/8"),)), ("c", ()))
+    assert PathTrie.parse_path("/x[b=2][a=1]") == PathTrie.parse_path("/x[a=1][b=2]")
+    with pytest.raises(ValueError):
+        PathTrie.parse_path("/interfaces/interface[name=eth0/state")
+
+def test_is_pattern_finds_every_wildcard():
+    assert PathTrie.is_pattern("/interfaces/interface[name=*]/state")
+    assert PathTrie.is_pattern("/*/cpu/state") and PathTrie.is_pattern("/system/...")
+    assert not PathTrie.is_pattern("/interfaces/interface[name=eth0]/state")
+    with pytest.raises(ValueError):
+        PathTrie.is_pattern("/interfaces/interface[name=*/state")
+
+def test_match_prefers_exact_entries_and_binds_wildcards():
+    trie = PathTrie([("/interfaces/interface[name=*]/state", "pattern"), ("/interfaces/interface[name=lo]/state", "exact")])
+    assert trie.match("/interfaces/interface[name=eth3]/state") == ("pattern", {"name": "eth3"})
+    assert trie.match("/interfaces/interface[name=lo]/state") == ("exact", {})
+    assert trie.match("/interfaces/interface[name=eth3]/config") is None
+
+def test_expand_wildcards_and_descendants():
+    paths = ["/interfaces/interface[name=eth0]/state", "/interfaces/interface[name=eth1]/state",
+             "/interfaces/interface[name=eth0]/state/counters", "/system/cpu/state"]
+    trie = PathTrie((path, index) for index, path in enumerate(paths))
+    assert [path for path, _ in trie.expand("/interfaces/interface[name=*]/state")] == paths[:2]
+    assert sorted(path for path, _ in trie.expand("/interfaces/...")) == sorted(paths[:3])
+    assert [path for path, _ in trie.expand("/*/cpu/state")] == paths[3:]
+    assert trie.expand("/interfaces/interface[name=eth9]/state") == []
+
+def test_entries_rebuild_the_same_trie():
+    rnd = random.Random(1)
+    paths = [f"/a{rnd.randint(0, 3)}/b[name=n{rnd.randint(0, 5)}]/c{rnd.randint(0, 2)}" for _ in range(40)]
+    trie = PathTrie((path, path.upper()) for path in paths)
+    restored = PathTrie.from_entries(trie.entries())
+    assert len(restored) == len(trie)
+    for query in ("/a1/b[name=*]/c0", "/...", "/*/b[name=n2]/*"):
+        assert restored.expand(query) == trie.expand(query)
+
+def test_longest_prefix_returns_the_remaining_elements():
+    trie = PathTrie([("/system/cpu/state", 1), ("/system", 2)])
+    stored, value, remaining = trie.longest_prefix("/system/cpu/state/usage/user")
+    assert (stored, value) == ("/system/cpu/state", 1)
+    assert remaining == (("usage", ()), ("user", ()))
+    assert trie.longest_prefix("/interfaces") is None
+
+########################################################################################################################################
+#                                                            Unit Conversion                                                           #
+########################################################################################################################################
+
+@pytest.mark.parametrize("mode", [UnitConverter.SI, UnitConverter.IEC])
+def test_convert_many_agrees_with_convert(mode):
+    units = UnitConverter(mode)
+    rnd = random.Random(2)
+    samples = ["1K", " 2.5 GB", "3KiB", "10ms", "2h", "5%", "-1.5M", ".5T", "1e3s", "nan%", "inf%", "-inf K", "1_000K",
+               "Infinity%", "NaN MB", "items", "abc%", "7", "", "5 %", "1KK", "5ss", "K5K", "1%%", "2 K K", "3GBB", 12, 1.5, None, True]
+    values = [rnd.choice(samples) for _ in range(UnitConverter.BATCH_THRESHOLD * 4)]
+    assert units.convert_many(values) == [units.convert(value) for value in values]
+
+def test_differences_do_not_depend_on_the_size_of_a_level():
+    for size in (3, UnitConverter.BATCH_THRESHOLD + 44):
+        gnmi_data = {f"k{index}": ["1KK", "1K", "2%%"][index % 3] for index in range(size)}
+        cli_data = {f"k{index}": [1000, 1000, 2.0][index % 3] for index in range(size)}
+        assert sorted(Comparator.compare_nested(gnmi_data, cli_data)) == sorted(f"k{index}" for index in range(size) if index % 3 != 1)
+
+def test_table_rows_are_compared_like_single_levels():
+    gnmi_rows = [{"name": f"eth{index}", "in": ["1K", "1KK", "5s"][index % 3], "x": {"mtu": "9K"}} for index in range(3000)]
+    cli_rows = [{"Name": f"eth{index}", "IN": 1000, "x": {"MTU": [9000, 9001][index % 2]}} for index in range(3000)]
+    rows = Comparator.compare_nested({"ports": gnmi_rows}, {"ports": cli_rows})
+    expected = {}
+    for gnmi_row, cli_row in zip(gnmi_rows, cli_rows):
+        name = "ports[name={}]".format(gnmi_row["name"])
+        expected.update({name + "/" + key: dict(difference, explaine=name + "/" + difference["explaine"])
+                         for key, difference in Comparator.compare_nested(gnmi_row, cli_row).items()})
+    assert rows == expected
+
+def test_byte_suffixes_follow_the_mode():
+    assert UnitConverter(UnitConverter.SI).convert("1GB") == 10 ** 9
+    assert UnitConverter(UnitConverter.IEC).convert("1GB") == 2 ** 30
+    assert UnitConverter(UnitConverter.SI).convert("1GiB") == 2 ** 30
+    assert UnitConverter().convert("50%") == 50.0
+    with pytest.raises(ValueError):
+        UnitConverter("binary")
+
+########################################################################################################################################
+#                                                             CLI Templates                                                            #
+########################################################################################################################################
+
+def test_template_record_filldown_required_and_list():
+    template = CLITemplate("""Value Filldown area (\\S+)
+Value Required neighbor (\\d+\\.\\d+\\.\\d+\\.\\d+)
+Value List flags (\\w)
+Value count (\\d+)
+
+Start
+  ^Area ${area}
+  ^Flag ${flags}
+  ^${neighbor}\\s+${count} -> Record
+""")
+    text = "Area 0\nFlag A\nFlag B\n1.1.1.1  5\nnoise\n2.2.2.2  7\nArea 1\n3.3.3.3  9\n"
+    assert list(template.parse(text)) == [
+        {"area": 0, "neighbor": "1.1.1.1", "flags": ["A", "B"], "count": 5},
+        {"area": 0, "neighbor": "2.2.2.2", "count": 7},
+        {"area": 1, "neighbor": "3.3.3.3", "count": 9},
+    ]
+
+def test_template_states_continue_clear_and_eof():
+    template = CLITemplate("""Value name (\\w+)
+Value speed (\\d+\\.\\d+)
+
+Start
+  ^Interfaces -> Table
+
+Table
+  ^${name}\\s -> Continue
+  ^\\w+\\s+${speed} -> Record
+  ^drop -> Clear
+  ^end -> End
+
+EOF
+""")
+    text = "header\nInterfaces\neth0 1.5\neth1 2.0\neth2\ndrop\nend\neth3 3.0\n"
+    assert list(template.parse(text.splitlines())) == [{"name": "eth0", "speed": 1.5}, {"name": "eth1", "speed": 2.0}]
+
+def test_template_error_action_and_invalid_templates():
+    template = CLITemplate("Value x (\\d+)\n\nStart\n  ^${x} -> Record\n  ^% -> Error\n")
+    with pytest.raises(CLITemplate.Error):
+        list(template.parse("1\n% Invalid input\n"))
+    with pytest.raises(CLITemplate.Error):
+        CLITemplate("Value x (\\d+)\n\nOther\n  ^${x}\n")
+    with pytest.raises(CLITemplate.Error):
+        CLITemplate("Value x (\\d+)\n\nStart\n  ^${y}\n")
+    with pytest.raises(CLITemplate.Error):
+        CLITemplate("Value Sorted x (\\d+)\n\nStart\n  ^${x}\n")
+
+def test_raw_cli_outputs_parse_like_structured_outputs():
+    structured = CLI()
+    raw = CLI(outputs={"show memory": "Total memory: 4096000\nAvailable memory: 1000000\n"})
+    assert raw.get_cli_output("show memory") == [structured.get_cli_output("show memory")]
+
+def test_large_table_outputs_are_streamed_with_the_template_key(monkeypatch):
+    monkeypatch.setattr(CLI, "STREAM_BYTES", 16)
+    text = "Neighbor ID     State\n1.1.1.1  full\n2.2.2.2  down\n"
+    cli = CLI(outputs={"show ospf neighbors": text})
+    records = cli.get_cli_output("show ospf neighbors")
+    assert isinstance(records, CLIRecords)
+    assert list(records) == list(records) == cli.parse_output("show ospf neighbors", text)
+    assert Comparator.lists.default_keys == {"adjacencies": ("neighborid",)}
+    gnmi_rows = [{"neighbor_id": "2.2.2.2", "state": "full"}, {"neighbor_id": "1.1.1.1", "state": "full"}]
+    assert list(Comparator.compare_nested({"adjacencies": gnmi_rows}, {"adjacencies": records})) == ["adjacencies[neighborid=2.2.2.2]/state"]
+
+def test_streamed_tables_become_plain_records_in_differences(tmp_path):
+    source = tempfile.SpooledTemporaryFile()
+    source.write(b"Neighbor ID     State\n1.1.1.1  full\n")
+    records = CLIRecords(CLITemplate.load(os.path.join(CLI.TEMPLATE_DIR, "show_ospf_neighbors.textfsm")), source)
+    state_file = str(tmp_path / "state.json")
+    incremental = IncrementalComparator(state_file)
+    differences = incremental.compare_path("/p", {"adjacencies": {"count": 1}}, {"adjacencies": records, "extra": records})
+    assert differences["adjacencies"]["CLI"] == differences["extra"]["CLI"] == [{"neighbor_id": "1.1.1.1", "state": "full"}]
+    assert pickle.loads(pickle.dumps(differences)) == differences
+    incremental.save()
+    assert os.listdir(tmp_path) == ["state.json"]
+
+########################################################################################################################################
+#                                                              Table Joins                                                             #
+########################################################################################################################################
+
+@pytest.mark.parametrize("seed", range(5))
+def test_hash_join_and_merge_join_find_the_same_differences(seed, tmp_path):
+    rnd = random.Random(seed)
+    gnmi_rows = [{"name": f"eth{index}", "in_octets": rnd.randint(0, 3), "mtu": "1K"} for index in rnd.sample(range(300), 200)]
+    cli_rows = [{"Name": row["name"], "in-octets": rnd.choice([row["in_octets"], 9]), "mtu": 1000}
+                for row in gnmi_rows if rnd.random() < 0.9]
+    cli_rows += [{"Name": f"new{index}", "in-octets": 0, "mtu": 1000} for index in range(5)]
+    rnd.shuffle(cli_rows)
+    tables = ListComparator(run_rows=17, spill_dir=str(tmp_path))
+    hashed = tables.hash_join("interfaces", gnmi_rows, cli_rows)
+    merged = tables.merge_join("interfaces", iter(gnmi_rows), iter(cli_rows))
+    assert hashed == merged
+    assert any(name.startswith("interfaces[name=new") for name in hashed)
+    assert not list(tmp_path.iterdir())  # The spilled runs are removed
+
+def test_table_key_precedence():
+    tables = ListComparator({"Adjacencies": "neighbor-id"})
+    tables.set_default_key("adjacencies", ["state"])
+    tables.set_default_key("routes", ["prefix", "next_hop"])
+    assert tables.choose_key("adjacencies", {}, {}) == ("neighborid",)
+    assert tables.choose_key("routes", {}, {}) == ("prefix", "nexthop")
+    assert tables.choose_key("ports", {"index": 1, "id": 2}, {"ID": 2, "index": 1}) == ("id",)
+    assert tables.choose_key("ports", {"a": 1}, {"a": 1}) is None
+    assert ListComparator.from_settings(tables.settings()).keys == tables.keys
+
+def test_lists_of_values_are_compared_as_one_value():
+    assert Comparator.compare_nested({"tags": ["a", "b"]}, {"tags": ["a", "b"]}) == {}
+    assert list(Comparator.compare_nested({"tags": ["a", "b"]}, {"tags": ["b", "a"]})) == ["tags"]
+
+########################################################################################################################################
+#                                                             Offset Index                                                             #
+########################################################################################################################################
+
+@pytest.mark.parametrize("window", [1, 7, 64, GNMIIndex.WINDOW_BYTES])
+def test_build_index_finds_every_member_in_any_window(window):
+    rnd = random.Random(window)
+    data = {f"/p{index}[name=é{index}]" if index % 3 == 0 else f"/p{index}": random_level(rnd) for index in range(30)}
+    data["/numbers"] = {"value": 838976.7699642365, "small": 1.5e-300, "text": "漢字" * 10}
+    for raw in (json.dumps(data).encode(), json.dumps(data, ensure_ascii=False, indent=2).encode()):
+        offsets = GNMIIndex.build_index(raw, window)
+        assert list(offsets) == list(data)
+        for gnmi_path, (offset, length) in offsets.items():
+            assert json.loads(raw[offset:offset + length]) == data[gnmi_path]
+
+@pytest.mark.parametrize("raw", [b'{"a": 1', b'{"a" 1}', b'{"a": 1 "b": 2}', b'[1]', b"", b'{"a": "\xff"}', b'{"a": 12'])
+def test_build_index_rejects_invalid_data(raw):
+    for window in (3, GNMIIndex.WINDOW_BYTES):
+        with pytest.raises(ValueError):
+            GNMIIndex.build_index(raw, window)
+
+########################################################################################################################################
+#                                                        Streaming Notifications                                                       #
+########################################################################################################################################
+
+@pytest.fixture
+def telemetry(tmp_path):
+    json_file = tmp_path / "data.json"
+    json_file.write_text(json.dumps({"/interfaces/interface[name=eth0]/state": {"counters": {"in_octets": 1}},
+                                     "/system/memory/state": {"total_memory": 4, "available_memory": 1},
+                                     "/afts": {"routes": [{"prefix": f"10.0.0.{index}/32", "metric": index} for index in range(5)]}}))
+    return TelemetryStream(GNMI(str(json_file)), CLI())
+
+def test_notifications_update_the_data_in_place(telemetry):
+    telemetry.apply_line(json.dumps({"prefix": {"elem": [{"name": "interfaces"}, {"name": "interface", "key": {"name": "eth0"}}]},
+                                     "update": [{"path": "state/counters/in_octets", "val": {"int_val": 5}}]}))
+    telemetry.apply_line(json.dumps({"prefix": "/system/memory/state", "delete": ["available_memory"]}))
+    assert telemetry.gnmi.data["/interfaces/interface[name=eth0]/state"]["counters"]["in_octets"] == 5
+    assert telemetry.gnmi.data["/system/memory/state"] == {"total_memory": 4}
+    assert list(telemetry.dirty) == ["/interfaces/interface[name=eth0]/state", "/system/memory/state"]
+    assert (telemetry.notifications, telemetry.rejected) == (2, 0)
+
+@pytest.mark.parametrize("line", ['{"update": ["x"]}', '{"prefix": 5, "update": [{"path": "a", "val": 1}]}',
+                                  '{"prefix": {"elem": ["x"]}}', '{"update": {"a": 1}}', '[1]', 'not json',
+                                  '{"prefix": "/system/memory/state", "update": [{"path": "a", "val": 1}, "b"]}'])
+def test_malformed_notifications_are_rejected_without_changes(telemetry, line, capsys):
+    before = json.dumps(telemetry.gnmi.data)
+    telemetry.apply_line(line)
+    assert telemetry.rejected == 1
+    assert json.dumps(telemetry.gnmi.data) == before
+    assert "rejected" in capsys.readouterr().err
+
+@pytest.mark.parametrize("notification", [
+    {"prefix": "/system/memory/state", "delete": ["total_memory"], "update": [{"path": "available_memory/x", "val": 1}]},
+    {"prefix": "/system/memory/state", "delete": ["total_memory", "a[b=1"]},
+    {"prefix": "/afts", "delete": ["routes[prefix=10.0.0.1/32]", "/system"],
+     "update": [{"path": "routes[prefix=9.9.9.9/32]", "val": {"metric": 1}}, {"path": "routes[prefix=10.0.0.2/32]", "val": 5}]},
+])
+def test_failing_notifications_change_nothing(telemetry, notification):
+    before = copy.deepcopy(telemetry.gnmi.data)
+    with pytest.raises(ValueError):
+        telemetry.apply(notification)
+    assert telemetry.gnmi.data == before
+    assert sorted(telemetry.gnmi.path_trie().expand("/...")) == sorted((gnmi_path, None) for gnmi_path in before)
+    assert not telemetry.dirty and telemetry.notifications == 0
+    telemetry.gnmi.apply_update("/afts/routes[prefix=10.0.0.3/32]/metric", 30)
+    assert telemetry.gnmi.data["/afts"]["routes"][3] == {"prefix": "10.0.0.3/32", "metric": 30}
+
+def test_rows_are_found_by_key_after_changes(telemetry):
+    gnmi = telemetry.gnmi
+    rows = gnmi.data["/afts"]["routes"]
+    rows.append({"prefix": "10.0.0.2/32", "metric": 22})  # A duplicate key, the first row is the one updated
+    gnmi.apply_update("/afts/routes[prefix=10.0.0.4/32]", {"metric": 40})
+    gnmi.apply_delete("/afts/routes[prefix=10.0.0.1/32]")
+    gnmi.apply_update("/afts/routes[prefix=10.0.0.9/32]/metric", 9)
+    gnmi.apply_update("/afts/routes[prefix=10.0.0.0/32]/prefix", "10.0.0.8/32")  # A key field changes
+    gnmi.apply_update("/afts/routes[prefix=10.0.0.8/32]", {"metric": 80})
+    assert gnmi.apply_delete("/afts/routes[prefix=10.0.0.0/32]") == []
+    gnmi.apply_delete("/afts/routes[prefix=10.0.0.2/32]")
+    gnmi.apply_update("/afts/routes[prefix=10.0.0.2/32]", {"metric": 2})
+    assert rows == [{"prefix": "10.0.0.8/32", "metric": 80}, {"prefix": "10.0.0.3/32", "metric": 3},
+                    {"prefix": "10.0.0.4/32", "metric": 40}, {"prefix": "10.0.0.2/32", "metric": 2},
+                    {"prefix": "10.0.0.9/32", "metric": 9}]
+
+########################################################################################################################################
+#                                                           CLI Output Cache                                                           #
+########################################################################################################################################
+
+@pytest.mark.parametrize("ttl", [0, 10])
+def test_concurrent_requests_share_one_fetch(ttl):
+    cache = CLIOutputCache(ttl)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"a": 1}
+
+    threads = [threading.Thread(target=cache.get, args=("r1", "show x", fetch)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert (cache.misses, cache.deduplicated) == (1, 4)
+
+def test_waiters_receive_the_error_of_the_fetch():
+    cache = CLIOutputCache(0)
+    errors = []
+
+    def fetch():
+        time.sleep(0.05)
+        raise RuntimeError("down")
+
+    def request():
+        try:
+            cache.get("r1", "show x", fetch)
+        except RuntimeError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+    assert not cache._inflight
+
+def test_cache_counters_merge():
+    parent, worker = CLIOutputCache(10), CLIOutputCache(10)
+    worker.get("r1", "show x", lambda: 1)
+    worker.get("r1", "show x", lambda: 1)
+    parent.merge(worker.counters())
+    assert (parent.stats()["hits"], parent.stats()["misses"]) == (1, 1)
+
+########################################################################################################################################
+#                                                                Reports                                                               #
+########################################################################################################################################
+
+def differences_of(count):
+    return {f"k{index}": {"GNMI": index, "CLI": index * 2 if index % 3 else None, "explaine": f"k{index} differs"}
+            for index in range(count)}
+
+def test_generate_report_lists_every_difference():
+    report = ReportGenerator.generate_report(differences_of(5))
+    assert report.count("\nField: ") == 5
+    assert report.startswith("\nField: k0\n GNMI: 0\n CLI: None\nExplaine the difference: k0 differs")
+    assert ReportGenerator.generate_report({}) == "No discrepancies found, all values match."
+
+def test_renderer_truncates_and_summarizes():
+    stream = io.StringIO()
+    renderer = ReportRenderer(stream, limit=2, top=2)
+    renderer.write(differences_of(10), "/interfaces/interface[name=eth0]/state")
+    assert stream.getvalue().count("\nField: ") == 2
+    assert "8 more differences not shown" in stream.getvalue()
+    summary = renderer.summary()
+    assert summary["types"] == {"missing in CLI": 4, "different value": 6}
+    assert summary["prefixes"] == {"/interfaces/interface": 10}
+    assert [entry["delta"] for entry in summary["largest_deltas"]] == [8, 7]
+
+def test_every_json_line_and_csv_row_has_a_status():
+    results = [{"path": "/a", "status": "match", "differences": {}, "report": "ok"},
+               {"path": "/b", "status": "mismatch", "differences": differences_of(2), "report": "..."},
+               {"path": "/c", "status": "error", "differences": None, "report": "not found"}]
+    stream = io.StringIO()
+    renderer = ReportRenderer(stream, "json")
+    for result in results:
+        renderer.write_result(result)
+    assert [json.loads(line)["status"] for line in stream.getvalue().splitlines()] == ["match", "mismatch", "error"]
+
+    stream = io.StringIO()
+    renderer = ReportRenderer(stream, "csv")
+    for result in results:
+        renderer.write_result(result)
+    rows = stream.getvalue().splitlines()
+    assert rows[0] == ",".join(ReportRenderer.CSV_HEADER)
+    assert [row.split(",")[:2] for row in rows[1:]] == [["/a", "match"], ["/b", "mismatch"], ["/b", "mismatch"], ["/c", "error"]]
+
+########################################################################################################################################
+#                                                           Comparison Plans                                                           #
+########################################################################################################################################
+
+@pytest.mark.parametrize("seed", range(20))
+def test_plans_agree_with_compare_nested(seed):
+    rnd = random.Random(seed)
+    gnmi_data = random_level(rnd)
+    for _ in range(4):
+        cli_data = mutate(rnd, gnmi_data)
+        expected = Comparator.compare_nested(gnmi_data, cli_data)
+        assert Comparator.plans.compare("/path", gnmi_data, cli_data) == expected
+        assert Comparator.plans.compare("/path", gnmi_data, cli_data) == expected  # The compiled plan
+
+def test_plans_follow_a_change_of_shape():
+    gnmi_data, cli_data = {"a": {"b": 1}, "c": [{"name": "x", "v": 1}], "d": "1K"}, {"A": {"b": 2}, "c": [{"name": "x", "v": 2}], "d": 1000}
+    Comparator.plans.compare("/path", gnmi_data, cli_data)
+    for changed in ({"A": 5, "c": [{"name": "x", "v": 2}], "d": 1000}, {"A": {"b": 2}, "c": {"v": 1}, "d": {"e": 1}}):
+        assert Comparator.plans.compare("/path", gnmi_data, changed) == Comparator.compare_nested(gnmi_data, changed)
+
+def test_duplicate_normalized_keys_keep_the_last_value_at_the_first_position():
+    gnmi_data, cli_data = {"in_octets": 1, "x": 1, "in-octets": 2}, {"InOctets": 1, "X": 2}
+    expected = Comparator.compare_nested(gnmi_data, cli_data)
+    assert list(expected) == ["inoctets", "x"] and expected["inoctets"]["GNMI"] == 2.0
+    assert Comparator.plans.compare("/path", gnmi_data, cli_data) == expected
+    assert IncrementalComparator().compare_path("/path", gnmi_data, cli_data) == expected
+
+########################################################################################################################################
+#                                                          Incremental State                                                           #
+########################################################################################################################################
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_comparator_agrees_with_compare_nested(seed):
+    rnd = random.Random(seed)
+    incremental = IncrementalComparator()
+    gnmi_data = random_level(rnd)
+    for _ in range(4):
+        cli_data = mutate(rnd, gnmi_data)
+        expected = Comparator.compare_nested(gnmi_data, cli_data)
+        assert incremental.compare_path("/path", gnmi_data, cli_data) == expected
+        assert incremental.compare_path("/path", gnmi_data, cli_data) == expected  # Every level reused
+    assert incremental.reused > 0
+
+def test_incremental_state_round_trips_through_its_file(tmp_path):
+    state_file = str(tmp_path / "state.json")
+    gnmi_data, cli_data = {"a": {"b": 1, "c": "2K"}, "d": 3}, {"A": {"B": 2, "c": 2048}, "d": 3}
+    first = IncrementalComparator(state_file)
+    expected = first.compare_path("/p", gnmi_data, cli_data)
+    first.save()
+    second = IncrementalComparator(state_file)
+    assert second.compare_path("/p", gnmi_data, cli_data) == expected
+    assert (second.compared, second.reused) == (0, 1)
+
+@pytest.mark.parametrize("change", ["units", "keys", "default_keys"])
+def test_incremental_state_is_not_reused_with_other_settings(tmp_path, change):
+    state_file = str(tmp_path / "state.json")
+    gnmi_data, cli_data = {"adj": [{"a": 1, "b": "x", "size": "1KB"}]}, {"adj": [{"a": 1, "b": "y", "size": 1000}]}
+    Comparator.lists.set_key("adj", "a")
+    first = IncrementalComparator(state_file)
+    first.compare_path("/p", gnmi_data, cli_data)
+    first.save()
+
+    if change == "units":
+        Comparator.set_unit_mode(UnitConverter.SI)
+    elif change == "keys":
+        Comparator.lists = ListComparator({"adj": "b"})
+    else:
+        Comparator.lists.set_default_key("other", ["id"])
+    second = IncrementalComparator(state_file)
+    assert second.compare_path("/p", gnmi_data, cli_data) == Comparator.compare_nested(gnmi_data, cli_data)
+    assert (second.compared, second.reused) == (1, 0)
+
+########################################################################################################################################
+#                                                             Result Cache                                                             #
+########################################################################################################################################
+
+def test_result_cache_is_used_with_an_incremental_comparator():
+    Comparator.results = ComparisonCache(16)
+    comparator = IncrementalComparator()
+    gnmi_data, cli_data = {"a": {"b": 1}, "c": "1K"}, {"a": {"b": 2}, "c": 1024}
+    first = verify_outputs("/p", gnmi_data, None, cli_data, comparator)
+    second = verify_outputs("/p", copy.deepcopy(gnmi_data), None, copy.deepcopy(cli_data), comparator)
+    assert first["differences"] == second["differences"] == Comparator.compare_nested(gnmi_data, cli_data)
+    assert (Comparator.results.hits, Comparator.results.misses) == (1, 1)
+    assert comparator.compared > 0
+
+def test_fleet_workers_report_their_result_cache(tmp_path):
+    json_file = tmp_path / "data.json"
+    json_file.write_text(json.dumps({"/system/memory/state": {"total_memory": 4}}))
+    devices = [Device(name, data=str(json_file), paths=["/system/memory/state"]) for name in ("r1", "r2", "r3", "r4")]
+    Comparator.results = ComparisonCache(16)
+    results = list(FleetRunner(devices, workers=2, device_concurrency=1).run())
+    assert len(results) == 4
+    stats = Comparator.results.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)  # One miss per worker, their shard has two identical devices